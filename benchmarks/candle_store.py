@@ -0,0 +1,100 @@
+"""Benchmark of time range reads from the candle cache and the candle store.
+
+A synthetic 1m history is written to a candle cache and a memory-mapped
+candle store, and random one-day ranges are then read by new instances, as a
+backtest does at startup. The ranges are read from the store both as data
+frames and as zero-copy record views.
+
+Usage:
+    python benchmarks/candle_store.py [--days 365] [--reads 100]
+        [--file-format pickle]
+"""
+import argparse
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from libcryptomarket.candle.cache import CandleCache
+from libcryptomarket.candle.store import CandleStore
+
+START_TIME = datetime(2018, 1, 1)
+
+
+def synthetic_candles(days):
+    """Return a synthetic 1m history of the days.
+    """
+    start_times = pd.date_range(START_TIME, periods=days * 1440, freq='1min')
+    prices = np.random.uniform(0.01, 0.1, len(start_times))
+    return pd.DataFrame({
+        'start_time': start_times,
+        'end_time': start_times + pd.Timedelta(minutes=1),
+        'open': prices,
+        'high': prices * 1.01,
+        'low': prices * 0.99,
+        'close': prices,
+        'volume': np.random.uniform(0, 100, len(start_times)),
+    })
+
+
+def read_ranges(new_source, method, days, reads):
+    """Read random one-day ranges with a new instance each and return the
+    mean latency.
+    """
+    random.seed(0)
+    start = perf_counter()
+    for _ in range(reads):
+        start_time = START_TIME + timedelta(days=random.randrange(days))
+        getattr(new_source(), method)(
+            'poloniex', 'BTC_ETH', '1m', start_time,
+            start_time + timedelta(days=1))
+
+    return (perf_counter() - start) / reads
+
+
+def main():
+    """Main.
+    """
+    parser = argparse.ArgumentParser(description=(
+        'Benchmark time range reads of the candle cache and store.'))
+    parser.add_argument('--days', action='store', dest='days', type=int,
+                        default=365, help='Number of days of 1m candles.')
+    parser.add_argument('--reads', action='store', dest='reads', type=int,
+                        default=100, help='Number of ranges read.')
+    parser.add_argument('--file-format', action='store', dest='file_format',
+                        default='pickle', help='File format of the cache.')
+    args = parser.parse_args()
+
+    data = synthetic_candles(args.days)
+    end_time = START_TIME + timedelta(days=args.days)
+    path = tempfile.mkdtemp()
+
+    try:
+        sources = [
+            ('cache', lambda: CandleCache(path + '/cache', args.file_format)),
+            ('store', lambda: CandleStore(path + '/store')),
+        ]
+        for name, new_source in sources:
+            start = perf_counter()
+            new_source().write('poloniex', 'BTC_ETH', '1m', data, START_TIME,
+                               end_time)
+            write_time = perf_counter() - start
+
+            print('{:<6} {} candles, write {:.3f}s'.format(
+                name, len(data), write_time))
+            for method in ['read', 'view']:
+                if hasattr(new_source(), method):
+                    latency = read_ranges(
+                        new_source, method, args.days, args.reads)
+                    print('{:<6} {:<4} {:.3f}ms'.format(
+                        name, method, latency * 1000))
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Benchmark of cold and pooled connections against a local stand-in server.
+
+A local HTTP server stands in for the Poloniex public API. Every symbol is
+queried by a new exchange instance, either with a session of its own (cold),
+which opens a new connection for its first page, or with the shared
+keep-alive session of the exchange (pooled).
+
+The stand-in server delays every new connection by --connect-delay seconds
+to simulate the TCP and TLS handshakes to a remote host, which are almost
+free on the loopback interface.
+
+Usage:
+    python benchmarks/connection_pool.py [--symbols 20]
+        [--connect-delay 0.05]
+"""
+import argparse
+import gzip
+import json
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Thread
+from time import perf_counter, sleep
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+import libcryptomarket
+from libcryptomarket.candle.ratelimit import set_rate_limiter
+from libcryptomarket.candle.session import close_sessions
+
+START_TIME = datetime(2018, 1, 1)
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """Local stand-in of the Poloniex public API.
+    """
+    daemon_threads = True
+    connect_delay = 0.0
+    connection_count = 0
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Handler of the chart data requests, keeping the connections alive.
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        self.server.connection_count += 1
+        sleep(self.server.connect_delay)
+
+    def do_GET(self):
+        params = dict((key, values[0]) for key, values in
+                      parse_qs(urlparse(self.path).query).items())
+        period = int(params['period'])
+        start = -(-int(params['start']) // period) * period
+        body = json.dumps([{
+            'date': date, 'high': 0.051, 'low': 0.049, 'open': 0.05,
+            'close': 0.05, 'volume': 10.0, 'quoteVolume': 200.0,
+            'weightedAverage': 0.05,
+        } for date in range(start, int(params['end']) + 1, period)]).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def fetch_symbols(url, symbols, cold):
+    """Query a page of every symbol with a new exchange instance and return
+    the latencies.
+    """
+    latencies = []
+    for symbol in symbols:
+        config = {'urls': {'api': {'public': url}}}
+        if cold:
+            config['session'] = requests.Session()
+
+        exchange = libcryptomarket.poloniex(config)
+        exchange.set_markets(dict(
+            (symbol, {'id': 'BTC_' + symbol.split('/')[0], 'symbol': symbol,
+                      'base': symbol.split('/')[0], 'quote': 'BTC'})
+            for symbol in symbols))
+
+        start = perf_counter()
+        exchange.fetch_candles(symbol, START_TIME,
+                               START_TIME + timedelta(days=1), '5m')
+        latencies.append(perf_counter() - start)
+
+    return latencies
+
+
+def main():
+    """Main.
+    """
+    parser = argparse.ArgumentParser(description=(
+        'Benchmark cold and pooled connections.'))
+    parser.add_argument('--symbols', action='store', dest='symbols',
+                        type=int, default=20, help='Number of symbols.')
+    parser.add_argument('--connect-delay', action='store',
+                        dest='connect_delay', type=float, default=0.05,
+                        help='Delay of every new connection in seconds.')
+    args = parser.parse_args()
+
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    server.connect_delay = args.connect_delay
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}/public'.format(server.server_address[1])
+
+    symbols = ['C{}/BTC'.format(i) for i in range(args.symbols)]
+    set_rate_limiter('poloniex', rate=1e9, capacity=1e9)
+
+    for name, cold in [('cold', True), ('pooled', False)]:
+        close_sessions()
+        connection_count = server.connection_count
+        latencies = fetch_symbols(url, symbols, cold=cold)
+        print('{:<8} {:>3} connections, mean {:.2f}ms, total {:.3f}s'.format(
+            name, server.connection_count - connection_count,
+            sum(latencies) / len(latencies) * 1000, sum(latencies)))
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+"""Offline throughput benchmark of the candle fetch pipeline.
+
+The candle requests are served by a replay stand-in, either from a recording
+of the exchange or from synthetic responses in the exchange format, so that
+no request is sent to the exchange. Pages/s, rows/s, parse time and peak
+memory are reported for fetch_candles, fetch_latest_candles and the export
+of request-candles.
+
+Usage:
+    python benchmarks/fetch_candles.py [--exchange poloniex] [--days 30]
+        [--latency 0.0] [--recording recording.json]
+
+    # Record the responses of the exchange to replay them later
+    python benchmarks/fetch_candles.py --exchange poloniex --record \
+        recording.json
+"""
+import argparse
+import math
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+from time import perf_counter
+
+import numpy as np
+
+import libcryptomarket
+from libcryptomarket.candle import FREQUENCY_TO_SEC_DICT
+from libcryptomarket.candle.ratelimit import set_rate_limiter
+from libcryptomarket.candle.replay import CandleRecorder, CandleReplay
+from libcryptomarket.cli import candles as cli
+
+START_TIME = datetime(2018, 1, 1)
+
+FREQUENCY = '5m'
+
+SYMBOLS = ['ETH/BTC', 'LTC/BTC', 'XMR/BTC', 'ZEC/BTC']
+
+
+def synthetic_epochs(exchange, start_time, end_time, frequency):
+    """Return the candle start times of a synthetic page.
+    """
+    period = FREQUENCY_TO_SEC_DICT[frequency]
+    start = math.ceil(start_time.timestamp() / period) * period
+    end = end_time.timestamp() - period
+    epochs = np.arange(start, end + 1, period, dtype=np.int64)
+    return epochs[:exchange._candles_page_size]
+
+
+def synthetic_responses(exchange):
+    """Return a function of the synthetic raw responses of the exchange.
+    """
+    def poloniex(symbol, start_time, end_time, frequency):
+        epochs = synthetic_epochs(exchange, start_time, end_time, frequency)
+        prices = np.random.uniform(0.01, 0.1, len(epochs))
+        return [{
+            'date': int(epoch),
+            'high': price * 1.01,
+            'low': price * 0.99,
+            'open': price,
+            'close': price,
+            'volume': 10.0,
+            'quoteVolume': 100.0,
+            'weightedAverage': price,
+        } for epoch, price in zip(epochs, prices)]
+
+    def bitfinex(symbol, start_time, end_time, frequency):
+        epochs = synthetic_epochs(exchange, start_time, end_time, frequency)
+        prices = np.random.uniform(0.01, 0.1, len(epochs))
+        return [[int(epoch) * 1000, price, price, price * 1.01, price * 0.99,
+                 10.0] for epoch, price in zip(epochs, prices)]
+
+    def gdax(symbol, start_time, end_time, frequency):
+        epochs = synthetic_epochs(exchange, start_time, end_time, frequency)
+        prices = np.random.uniform(0.01, 0.1, len(epochs))
+        return [[int(epoch), price * 0.99, price * 1.01, price, price, 10.0]
+                for epoch, price in reversed(list(zip(epochs, prices)))]
+
+    return locals()[exchange.id]
+
+
+def synthetic_markets(exchange):
+    """Return synthetic markets of the symbols.
+    """
+    markets = {}
+    for symbol in SYMBOLS:
+        base, quote = symbol.split('/')
+        if exchange.id == 'poloniex':
+            market_id = '{}_{}'.format(quote, base)
+        elif exchange.id == 'gdax':
+            market_id = '{}-{}'.format(base, quote)
+        else:
+            market_id = 't{}{}'.format(base, quote)
+
+        markets[symbol] = {'id': market_id, 'symbol': symbol, 'base': base,
+                           'quote': quote}
+
+    return markets
+
+
+def run(exchange, func):
+    """Run the benchmark and return the elapsed time, number of rows, parse
+    time and peak memory.
+
+    The peak memory is measured in a second run, as tracing the allocations
+    slows the first one down.
+    """
+    parse = exchange._parse_single_candles
+    parse_times = []
+
+    def timed_parse(*args, **kwargs):
+        start = perf_counter()
+        data = parse(*args, **kwargs)
+        parse_times.append(perf_counter() - start)
+        return data
+
+    exchange._parse_single_candles = timed_parse
+    start = perf_counter()
+    try:
+        rows = func()
+    finally:
+        elapsed = perf_counter() - start
+        del exchange._parse_single_candles
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return elapsed, rows, sum(parse_times), peak_memory
+
+
+def export(exchange, args, output):
+    """Export the candles with request-candles and return the number of
+    rows.
+    """
+    cli_args = argparse.Namespace(
+        exchanges=[exchange.id], symbols=SYMBOLS, frequency=FREQUENCY,
+        output=output, format='csv', compression=None, chunk_size=100000)
+
+    # Serve the exchange created by request-candles with the stand-in
+    factory = getattr(libcryptomarket, exchange.id)
+    setattr(libcryptomarket, exchange.id, lambda: exchange)
+    try:
+        cli.export(cli_args, START_TIME,
+                   START_TIME + timedelta(days=args.days))
+    finally:
+        setattr(libcryptomarket, exchange.id, factory)
+
+    with open(output) as f:
+        return sum(1 for _ in f) - 1
+
+
+def main():
+    """Main.
+    """
+    parser = argparse.ArgumentParser(description=(
+        'Benchmark the candle fetch pipeline offline.'))
+    parser.add_argument('--exchange', action='store', dest='exchange',
+                        choices=['poloniex', 'bitfinex', 'gdax'],
+                        default='poloniex', help='Exchange name.')
+    parser.add_argument('--days', action='store', dest='days', type=int,
+                        default=30, help='Number of days of candles.')
+    parser.add_argument('--latency', action='store', dest='latency',
+                        type=float, default=0.0,
+                        help='Latency of every response in seconds.')
+    parser.add_argument('--max-workers', action='store', dest='max_workers',
+                        type=int, default=4,
+                        help='Number of concurrent requests.')
+    parser.add_argument('--recording', action='store', dest='recording',
+                        help='Recording to replay instead of synthetic '
+                             'responses.')
+    parser.add_argument('--record', action='store', dest='record',
+                        help='Query the exchange and record its responses '
+                             'to the path.')
+    args = parser.parse_args()
+
+    exchange = getattr(libcryptomarket, args.exchange)()
+    end_time = START_TIME + timedelta(days=args.days)
+    latest_end_time = START_TIME + timedelta(days=1)
+
+    if args.record:
+        recorder = CandleRecorder(exchange)
+        for symbol in SYMBOLS:
+            exchange.fetch_candles(symbol, START_TIME, end_time, FREQUENCY)
+        exchange.fetch_candles(SYMBOLS[0], START_TIME, end_time, FREQUENCY,
+                               max_workers=args.max_workers)
+        exchange.fetch_latest_candles(
+            SYMBOLS, FREQUENCY, 100, end_time=latest_end_time)
+        recorder.save(args.record)
+        print('Recorded {} responses to {}'.format(
+            len(recorder.responses), args.record))
+        return
+
+    if args.recording:
+        replay = CandleReplay.load(args.recording, latency=args.latency)
+    else:
+        replay = CandleReplay(
+            responses=synthetic_responses(exchange),
+            markets=synthetic_markets(exchange),
+            latency=args.latency)
+    replay.install(exchange)
+
+    # Measure the pipeline itself rather than the rate limit
+    set_rate_limiter(exchange.id, rate=1e9, capacity=1e9)
+
+    output = os.path.join(tempfile.mkdtemp(), 'candles.csv')
+    benchmarks = [
+        ('fetch_candles', lambda: len(exchange.fetch_candles(
+            SYMBOLS[0], START_TIME, end_time, FREQUENCY))),
+        ('fetch_candles[max_workers]', lambda: len(exchange.fetch_candles(
+            SYMBOLS[0], START_TIME, end_time, FREQUENCY,
+            max_workers=args.max_workers))),
+        ('fetch_latest_candles', lambda: exchange.fetch_latest_candles(
+            SYMBOLS, FREQUENCY, 100,
+            end_time=latest_end_time).shape[0] * len(SYMBOLS)),
+        ('request-candles', lambda: export(exchange, args, output)),
+    ]
+
+    print('{:<28} {:>8} {:>10} {:>12} {:>10} {:>10}'.format(
+        'benchmark', 'pages/s', 'rows/s', 'parse time', 'elapsed',
+        'peak MB'))
+    for name, func in benchmarks:
+        request_count = replay.request_count
+        elapsed, rows, parse_time, peak_memory = run(exchange, func)
+        page_count = (replay.request_count - request_count) // 2
+        print('{:<28} {:>8,.0f} {:>10,.0f} {:>11.3f}s {:>9.3f}s '
+              '{:>10.1f}'.format(
+                  name, page_count / elapsed,
+                  rows / elapsed, parse_time, elapsed,
+                  peak_memory / 1024.0 / 1024.0))
+
+
+if __name__ == '__main__':
+    main()
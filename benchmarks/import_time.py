@@ -0,0 +1,73 @@
+"""Benchmark of the import time of libcryptomarket.
+
+The package must not import ccxt or pandas until an exchange is requested.
+The script exits with a non-zero status if the import regresses.
+
+Usage:
+    python benchmarks/import_time.py [--repeat 5] [--max-seconds 0.05]
+"""
+import argparse
+import subprocess
+import sys
+
+HEAVY_MODULES = ['ccxt', 'pandas']
+
+IMPORT_SCRIPT = '''
+import sys
+from time import perf_counter
+start = perf_counter()
+import libcryptomarket
+elapsed = perf_counter() - start
+print(elapsed, *[name for name in {heavy_modules!r} if name in sys.modules])
+'''
+
+FIRST_ACCESS_SCRIPT = '''
+from time import perf_counter
+import libcryptomarket
+start = perf_counter()
+libcryptomarket.poloniex
+print(perf_counter() - start)
+'''
+
+
+def run(script):
+    """Run the script in a fresh interpreter and return its output.
+    """
+    return subprocess.check_output(
+        [sys.executable, '-c', script]).decode().split()
+
+
+def main():
+    """Main.
+    """
+    parser = argparse.ArgumentParser(description=(
+        'Benchmark the import time of libcryptomarket.'))
+    parser.add_argument('--repeat', action='store', dest='repeat', type=int,
+                        default=5, help='Number of repeats.')
+    parser.add_argument('--max-seconds', action='store', dest='max_seconds',
+                        type=float, default=0.05,
+                        help='Maximum import time in seconds.')
+    args = parser.parse_args()
+
+    timings = []
+    for _ in range(args.repeat):
+        output = run(IMPORT_SCRIPT.format(heavy_modules=HEAVY_MODULES))
+        timings.append(float(output[0]))
+        imported = output[1:]
+
+        if imported:
+            print('Importing libcryptomarket imports {}'.format(
+                ', '.join(imported)))
+            sys.exit(1)
+
+    print('import libcryptomarket: {:.4f}s'.format(min(timings)))
+    print('first exchange access: {:.4f}s'.format(
+        float(run(FIRST_ACCESS_SCRIPT)[0])))
+
+    if min(timings) > args.max_seconds:
+        print('Import time exceeds {}s'.format(args.max_seconds))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
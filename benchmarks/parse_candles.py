@@ -0,0 +1,77 @@
+"""Benchmark of the candle parsers on a synthetic page.
+
+Usage:
+    python benchmarks/parse_candles.py [--rows 100000] [--repeat 5]
+"""
+import argparse
+from timeit import repeat
+
+import numpy as np
+
+from libcryptomarket.candle.inject import (
+    _poloniex_parse_candles, _bitfinex_parse_candles, _gdax_parse_candles)
+
+START_EPOCH = 1514764800
+
+
+def poloniex_page(rows):
+    """Return a synthetic Poloniex page.
+    """
+    prices = np.random.uniform(0.01, 0.1, rows)
+    return [{
+        'date': START_EPOCH + 60 * i,
+        'high': price * 1.01,
+        'low': price * 0.99,
+        'open': price,
+        'close': price,
+        'volume': 10.0,
+        'quoteVolume': 100.0,
+        'weightedAverage': price,
+    } for i, price in enumerate(prices)]
+
+
+def bitfinex_page(rows):
+    """Return a synthetic Bitfinex page.
+    """
+    prices = np.random.uniform(0.01, 0.1, rows)
+    return [[(START_EPOCH + 60 * i) * 1000, price, price, price * 1.01,
+             price * 0.99, 10.0] for i, price in enumerate(prices)]
+
+
+def gdax_page(rows):
+    """Return a synthetic GDAX page, which is in descending time order.
+    """
+    prices = np.random.uniform(0.01, 0.1, rows)
+    return [[START_EPOCH + 60 * i, price * 0.99, price * 1.01, price, price,
+             10.0] for i, price in reversed(list(enumerate(prices)))]
+
+
+BENCHMARKS = [
+    ('poloniex', _poloniex_parse_candles, poloniex_page, 'BTC_ETH'),
+    ('bitfinex', _bitfinex_parse_candles, bitfinex_page, 'tETHBTC'),
+    ('gdax', _gdax_parse_candles, gdax_page, 'ETH-BTC'),
+]
+
+
+def main():
+    """Main.
+    """
+    parser = argparse.ArgumentParser(description=(
+        'Benchmark the candle parsers.'))
+    parser.add_argument('--rows', action='store', dest='rows', type=int,
+                        default=100000, help='Number of rows in a page.')
+    parser.add_argument('--repeat', action='store', dest='repeat', type=int,
+                        default=5, help='Number of repeats.')
+    args = parser.parse_args()
+
+    for name, func, page, symbol in BENCHMARKS:
+        data = page(args.rows)
+        timings = repeat(
+            lambda: func(None, data, symbol=symbol, frequency='1m'),
+            number=1, repeat=args.repeat)
+        print('{:<10} {:>12,.0f} rows/s ({:.4f}s per page of {} rows)'.format(
+            name, args.rows / min(timings), min(timings), args.rows))
+
+
+if __name__ == '__main__':
+    main()
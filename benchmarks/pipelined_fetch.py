@@ -0,0 +1,134 @@
+"""Throughput benchmark of serial and pipelined candle fetches.
+
+A local HTTP server stands in for the Poloniex public API, returning at most
+a page of candles per request, and delays every response by --latency
+seconds. A long period of candles is queried serially, where the next page
+is requested after the current one is parsed, and with the next pages
+requested ahead by a background thread (--prefetch).
+
+The rows of the responses are serialized once at startup, so that the
+stand-in server takes little CPU time from the fetch.
+
+Usage:
+    python benchmarks/pipelined_fetch.py [--days 365] [--latency 0.05]
+        [--prefetch 2]
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Thread
+from time import perf_counter, sleep
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+import libcryptomarket
+from libcryptomarket.candle.ratelimit import set_rate_limiter
+from libcryptomarket.candle.stats import get_stats
+
+START_TIME = datetime(2017, 1, 1)
+
+FREQUENCY = '5m'
+
+PERIOD = 300
+
+PAGE_SIZE = 10000
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """Local stand-in of the Poloniex public API.
+    """
+    daemon_threads = True
+    latency = 0.0
+    start = 0
+    rows = []
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Handler of the chart data requests, delaying every response.
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        params = dict((key, values[0]) for key, values in
+                      parse_qs(urlparse(self.path).query).items())
+        first = max(0, -(-(int(params['start']) - self.server.start) //
+                         PERIOD))
+        last = max(first, min(
+            first + PAGE_SIZE,
+            (int(params['end']) - self.server.start) // PERIOD + 1))
+        body = b'[' + b','.join(self.server.rows[first:last]) + b']'
+
+        sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def synthetic_rows(start, count):
+    """Return the serialized rows of the synthetic candles.
+    """
+    prices = np.random.uniform(0.01, 0.1, count)
+    return [json.dumps({
+        'date': start + i * PERIOD, 'high': price * 1.01,
+        'low': price * 0.99, 'open': price, 'close': price, 'volume': 10.0,
+        'quoteVolume': 100.0, 'weightedAverage': price,
+    }).encode() for i, price in enumerate(prices)]
+
+
+def main():
+    """Main.
+    """
+    parser = argparse.ArgumentParser(description=(
+        'Benchmark serial and pipelined candle fetches.'))
+    parser.add_argument('--days', action='store', dest='days', type=int,
+                        default=365, help='Number of days of 5m candles.')
+    parser.add_argument('--latency', action='store', dest='latency',
+                        type=float, default=0.05,
+                        help='Latency of every response in seconds.')
+    parser.add_argument('--prefetch', action='store', dest='prefetch',
+                        type=int, default=2,
+                        help='Number of pages requested ahead.')
+    args = parser.parse_args()
+
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    server.latency = args.latency
+    server.start = int((START_TIME - datetime(1970, 1, 1)).total_seconds())
+    server.rows = synthetic_rows(server.start, args.days * 86400 // PERIOD)
+    Thread(target=server.serve_forever, daemon=True).start()
+
+    exchange = libcryptomarket.poloniex({'urls': {'api': {
+        'public': 'http://127.0.0.1:{}/public'.format(
+            server.server_address[1])}}})
+    exchange.set_markets({'ETH/BTC': {
+        'id': 'BTC_ETH', 'symbol': 'ETH/BTC', 'base': 'ETH', 'quote': 'BTC'}})
+    set_rate_limiter('poloniex', rate=1e9, capacity=1e9)
+    end_time = START_TIME + timedelta(days=args.days)
+
+    for name, prefetch in [('serial', None), ('pipelined', args.prefetch)]:
+        get_stats().reset()
+        start = perf_counter()
+        data = exchange.fetch_candles('ETH/BTC', START_TIME, end_time,
+                                      FREQUENCY, prefetch=prefetch)
+        elapsed = perf_counter() - start
+        stats = get_stats().snapshot()['poloniex']
+
+        print('{:<9} {:>4} pages, {:>7.1f} pages/s, {:>9.0f} rows/s, '
+              'request {:.3f}s, parse {:.3f}s, elapsed {:.3f}s'.format(
+                  name, stats['requests'], stats['requests'] / elapsed,
+                  len(data) / elapsed, stats['request_time'],
+                  stats['parse_time'], elapsed))
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,182 @@
+"""Throughput benchmark of the candle scheduler against local stand-ins.
+
+A local HTTP server stands in for the Poloniex and GDAX public APIs, both
+serving synthetic 5m candles up to now, at most a page per request. The
+scheduler brings the candles of every symbol on both venues up to date in a
+candle store, with a pool of processes and a request budget per venue.
+
+The server records the time of every request, so the busiest second of every
+venue is checked against its budget, which allows a burst of a single
+request.
+
+Usage:
+    python benchmarks/scheduler.py [--days 60] [--symbols 4]
+        [--processes 4] [--budget 20] [--latency 0.02]
+"""
+import argparse
+import json
+import logging
+import math
+import shutil
+import tempfile
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from time import monotonic, perf_counter, sleep
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from libcryptomarket.candle.markets import get_markets_cache
+from libcryptomarket.candle.scheduler import CandleScheduler, candle_jobs
+from libcryptomarket.candle.store import CandleStore
+
+FREQUENCY = '5m'
+
+PERIOD = 300
+
+PAGE_SIZES = {'poloniex': 10000, 'gdax': 300}
+
+CURRENCIES = ['ETH', 'LTC', 'XMR', 'ZEC', 'DASH', 'ETC', 'XRP', 'BCH']
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """Local stand-in of the Poloniex and GDAX public APIs.
+    """
+    daemon_threads = True
+    latency = 0.0
+    request_times = defaultdict(list)
+    lock = Lock()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Handler of the candle requests of both venues.
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = dict((key, values[0])
+                      for key, values in parse_qs(url.query).items())
+
+        if url.path.startswith('/poloniex'):
+            venue = 'poloniex'
+            start = int(params['start'])
+            end = int(params['end']) + PERIOD
+        else:
+            venue = 'gdax'
+            start = int(pd.Timestamp(params['start']).value // 10 ** 9)
+            end = int(pd.Timestamp(params['end']).value // 10 ** 9)
+
+        with self.server.lock:
+            self.server.request_times[venue].append(monotonic())
+
+        now = int(datetime.utcnow().timestamp())
+        start_times = range(-(-start // PERIOD) * PERIOD,
+                            min(end, now - now % PERIOD), PERIOD)
+        start_times = start_times[:PAGE_SIZES[venue]]
+        prices = [0.05 + 0.01 * math.sin(t / 86400.0) for t in start_times]
+
+        if venue == 'poloniex':
+            rows = [{'date': t, 'high': p * 1.01, 'low': p * 0.99, 'open': p,
+                     'close': p, 'volume': 10.0, 'quoteVolume': 100.0,
+                     'weightedAverage': p}
+                    for t, p in zip(start_times, prices)]
+        else:
+            rows = [[t, p * 0.99, p * 1.01, p, p, 100.0]
+                    for t, p in zip(start_times, prices)][::-1]
+        body = json.dumps(rows).encode()
+
+        sleep(self.server.latency)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def busiest_second(request_times):
+    """Return the maximum number of requests within any second.
+    """
+    request_times = sorted(request_times)
+    return max([bisect_left(request_times, t + 1.0) - i
+                for i, t in enumerate(request_times)] or [0])
+
+
+def main():
+    """Main.
+    """
+    parser = argparse.ArgumentParser(description=(
+        'Benchmark the candle scheduler against local stand-in venues.'))
+    parser.add_argument('--days', action='store', dest='days', type=int,
+                        default=60, help='Number of days of 5m candles.')
+    parser.add_argument('--symbols', action='store', dest='symbols',
+                        type=int, default=4, help='Number of symbols.')
+    parser.add_argument('--processes', action='store', dest='processes',
+                        type=int, default=4,
+                        help='Number of worker processes.')
+    parser.add_argument('--budget', action='store', dest='budget',
+                        type=float, default=20.0,
+                        help='Number of requests per second of every venue.')
+    parser.add_argument('--latency', action='store', dest='latency',
+                        type=float, default=0.02,
+                        help='Latency of every response in seconds.')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    server.latency = args.latency
+    Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+
+    currencies = CURRENCIES[:args.symbols]
+    symbols = [currency + '/BTC' for currency in currencies]
+    get_markets_cache().put('poloniex', dict(
+        (currency + '/BTC', {'id': 'BTC_' + currency,
+                             'symbol': currency + '/BTC',
+                             'base': currency, 'quote': 'BTC'})
+        for currency in currencies))
+    get_markets_cache().put('gdax', dict(
+        (currency + '/BTC', {'id': currency + '-BTC',
+                             'symbol': currency + '/BTC',
+                             'base': currency, 'quote': 'BTC'})
+        for currency in currencies))
+
+    path = tempfile.mkdtemp()
+    try:
+        scheduler = CandleScheduler(
+            exchanges={
+                'poloniex': {'urls': {'api': {'public': url + '/poloniex'}}},
+                'gdax': {'urls': {'api': url + '/gdax'}},
+            },
+            jobs=candle_jobs(['poloniex', 'gdax'], symbols, [FREQUENCY]),
+            cache=CandleStore(path),
+            start_time=datetime.utcnow() - timedelta(days=args.days),
+            budgets={'poloniex': args.budget, 'gdax': args.budget},
+            processes=args.processes,
+            report_interval=1.0)
+
+        start = perf_counter()
+        errors = scheduler.run()
+        elapsed = perf_counter() - start
+    finally:
+        shutil.rmtree(path)
+        server.shutdown()
+
+    print('{} jobs, {} errors, elapsed {:.3f}s'.format(
+        len(scheduler.jobs), len(errors), elapsed))
+    for venue, request_times in sorted(server.request_times.items()):
+        print('{:<9} busiest second {} requests, budget {:.2f}/s plus a '
+              'burst of 1'.format(venue, busiest_second(request_times),
+                                  args.budget))
+
+
+if __name__ == '__main__':
+    main()
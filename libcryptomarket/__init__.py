@@ -4,11 +4,62 @@
 
 """Top-level package for libcryptomarket."""
 
-from libcryptomarket.exchange import *
-from libcryptomarket.candle import (
-    candles, latest_candles, FREQUENCY_TO_SEC_DICT)
-import libcryptomarket.candle.inject
+import sys
 
 
 __author__ = """Gavin Chan"""
 __email__ = 'gavincyi@gmail.com'
+
+_CANDLE_ATTRIBUTES = ['candles', 'latest_candles', 'FREQUENCY_TO_SEC_DICT']
+
+_SUBMODULES = ['async_support', 'candle', 'cli', 'exchange']
+
+
+def __getattr__(name):
+    """Return the patched exchange class or candle function on first access.
+
+    Neither ccxt nor pandas is imported until an attribute is requested.
+    The subpackages are imported on first access as well.
+    `__all__` lists the ccxt names, including all the exchanges, and the
+    candle functions, so that star imports resolve them all.
+    """
+    if name == '__all__':
+        import ccxt
+        value = list(ccxt.__all__) + _CANDLE_ATTRIBUTES
+    elif name.startswith('__'):
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    elif name in _SUBMODULES:
+        import importlib
+        value = importlib.import_module('libcryptomarket.' + name)
+    elif name in _CANDLE_ATTRIBUTES:
+        import libcryptomarket.candle
+        value = getattr(libcryptomarket.candle, name)
+    else:
+        import ccxt
+        import libcryptomarket.candle.inject
+
+        try:
+            value = getattr(ccxt, name)
+        except AttributeError:
+            raise AttributeError(
+                "module {!r} has no attribute {!r}".format(__name__, name))
+
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    """Return the module attributes, including the exchanges not accessed
+    yet.
+    """
+    return sorted(set(globals()) | set(__getattr__('__all__')) |
+                  set(_SUBMODULES))
+
+
+if sys.version_info < (3, 7):
+    # Module __getattr__ (PEP 562) is not supported
+    from libcryptomarket.exchange import *
+    from libcryptomarket.candle import (
+        candles, latest_candles, FREQUENCY_TO_SEC_DICT)
+    import libcryptomarket.candle.inject
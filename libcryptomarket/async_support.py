@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+# pylint: disable-msg=W0401
+# flake8: noqa
+
+"""Asyncio exchanges of libcryptomarket."""
+
+from libcryptomarket.exchange.async_support import *
+import libcryptomarket.candle.inject_async
@@ -1,9 +1,10 @@
 from datetime import datetime, timedelta
-from time import sleep
 
 import pandas as pd
 import ccxt
 
+from libcryptomarket.candle.ratelimit import throttle
+
 
 FREQUENCY_TO_SEC_DICT = {
     '1m': 60,
@@ -49,7 +50,6 @@ def candles(source, symbol, start_time, end_time, frequency, **kwargs):
         source += "2"
 
     exchange = getattr(ccxt, source.lower())()
-    describe = exchange.describe()
 
     if func is None:
         raise ValueError("Source {} is not implemented".format(
@@ -61,7 +61,7 @@ def candles(source, symbol, start_time, end_time, frequency, **kwargs):
 
     while (start_time <
            end_time - pd.DateOffset(seconds=FREQUENCY_TO_SEC_DICT[frequency])):
-        sleep(describe['rateLimit'] / 1000)
+        throttle(exchange)
         data = func(source=exchange, symbol=symbol, start_time=start_time,
                     end_time=end_time, frequency=frequency, **kwargs)
 
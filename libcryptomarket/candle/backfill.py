@@ -0,0 +1,191 @@
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import timedelta
+
+import pandas as pd
+
+from libcryptomarket.candle.writer import CandleWriter
+
+
+BackfillUnit = namedtuple(
+    'BackfillUnit',
+    ['exchange', 'symbol', 'frequency', 'start_time', 'end_time'])
+
+
+def backfill_units(exchanges, symbols, frequency, start_time, end_time,
+                   window=timedelta(days=30)):
+    """Return the units of a backfill.
+
+    :param exchanges: `list` list of exchange ids.
+    :param symbols: `list` list of symbols.
+    :param frequency: `str` frequency.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param window: `timedelta` period of every unit.
+    :return: `list` list of `BackfillUnit`.
+    """
+    start_time = pd.Timestamp(start_time)
+    end_time = pd.Timestamp(end_time)
+
+    units = []
+    for exchange in exchanges:
+        for symbol in symbols:
+            window_start_time = start_time
+            while window_start_time < end_time:
+                window_end_time = min(window_start_time + window, end_time)
+                units.append(BackfillUnit(
+                    exchange=exchange,
+                    symbol=symbol,
+                    frequency=frequency,
+                    start_time=window_start_time,
+                    end_time=window_end_time))
+                window_start_time = window_end_time
+
+    return units
+
+
+def _unit_key(unit):
+    """Return the manifest key of the unit.
+    """
+    return (unit.exchange, unit.symbol, unit.frequency,
+            pd.Timestamp(unit.start_time).isoformat(),
+            pd.Timestamp(unit.end_time).isoformat())
+
+
+class BackfillManifest(object):
+    """Append-only checkpoint manifest of the completed backfill units.
+
+    Every completed unit is appended as a json line, so that a crash never
+    loses the units completed before it.
+    """
+
+    def __init__(self, path):
+        """Constructor.
+
+        :param path: `str` manifest path.
+        """
+        self.path = path
+        self._completed = {}
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+
+                    record = json.loads(line)
+                    self._completed[tuple(record['unit'])] = record
+
+    def is_completed(self, unit):
+        """Return whether the unit is completed.
+
+        :param unit: `BackfillUnit` unit.
+        """
+        return _unit_key(unit) in self._completed
+
+    def add(self, unit, path, rows):
+        """Mark the unit as completed.
+
+        :param unit: `BackfillUnit` unit.
+        :param path: `str` output path of the unit, None if it has no rows.
+        :param rows: `int` number of candles of the unit.
+        """
+        record = {'unit': list(_unit_key(unit)), 'path': path, 'rows': rows}
+        with self._lock:
+            with open(self.path, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+            self._completed[_unit_key(unit)] = record
+
+
+def _unit_path(output, unit, file_format):
+    """Return the output path of the unit.
+    """
+    return os.path.join(
+        output, unit.exchange, unit.symbol.replace('/', '-'), unit.frequency,
+        '{}.{}'.format(pd.Timestamp(unit.start_time).strftime('%Y%m%d%H%M%S'),
+                       file_format))
+
+
+def _run_unit(exchange, unit, output, file_format, compression):
+    """Query the unit and write it to its own file.
+
+    The file is written to a temporary path and then renamed, so that no
+    partial file is left behind.
+
+    :return: `tuple` output path and number of candles.
+    """
+    path = _unit_path(output, unit, file_format)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with CandleWriter(path + '.tmp', file_format=file_format,
+                      compression=compression) as writer:
+        for data in exchange.iter_candles(
+                symbol=unit.symbol,
+                start_time=unit.start_time,
+                end_time=unit.end_time,
+                frequency=unit.frequency):
+            writer.write(data, symbol=unit.symbol)
+
+    if writer.row_count == 0:
+        if os.path.exists(path + '.tmp'):
+            os.remove(path + '.tmp')
+        return None, 0
+
+    os.replace(path + '.tmp', path)
+    return path, writer.row_count
+
+
+def run_backfill(exchanges, units, output, manifest, file_format='csv',
+                 compression=None, max_workers=4):
+    """Run the backfill units concurrently and checkpoint them.
+
+    The units already in the manifest are skipped. The requests of every
+    exchange share its process-wide rate limiter, so concurrent units never
+    exceed the exchange rate budget.
+
+    :param exchanges: `dict` exchange id to exchange instance.
+    :param units: `list` list of `BackfillUnit`.
+    :param output: `str` output directory.
+    :param manifest: `BackfillManifest` checkpoint manifest.
+    :param file_format: `str` file format, either "csv", "parquet" or
+                        "feather".
+    :param compression: `str` compression.
+    :param max_workers: `int` number of units queried concurrently.
+    :return: `dict` failed units to their exceptions.
+    """
+    pending = [unit for unit in units if not manifest.is_completed(unit)]
+    logging.info('%d of %d units are pending',
+                 len(pending), len(units))
+
+    for exchange in exchanges.values():
+        exchange.load_markets()
+
+    errors = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = dict(
+            (executor.submit(
+                _run_unit, exchanges[unit.exchange], unit, output,
+                file_format, compression), unit)
+            for unit in pending)
+
+        for i, future in enumerate(as_completed(futures)):
+            unit = futures[future]
+            try:
+                path, rows = future.result()
+            except Exception as e:
+                logging.warning('Failed unit %s: %s', unit, e)
+                errors[unit] = e
+                continue
+
+            manifest.add(unit, path=path, rows=rows)
+            logging.info('[%d/%d] Completed %s %s %s-%s (%d rows)',
+                         i + 1, len(pending), unit.exchange, unit.symbol,
+                         unit.start_time, unit.end_time, rows)
+
+    return errors
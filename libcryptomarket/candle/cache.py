@@ -0,0 +1,216 @@
+import json
+import math
+import os
+
+import pandas as pd
+
+from libcryptomarket.candle import FREQUENCY_TO_SEC_DICT
+from libcryptomarket.candle.transform import candle_gaps, gap_ranges
+
+
+FILE_FORMATS = {
+    'parquet': ('.parquet', pd.read_parquet, 'to_parquet'),
+    'pickle': ('.pkl', pd.read_pickle, 'to_pickle'),
+}
+
+
+def to_epoch(time):
+    """Return the epoch seconds of a time. Naive times are treated as UTC.
+
+    :param time: `datetime` or `pd.Timestamp` time.
+    """
+    time = pd.Timestamp(time)
+    if time.tzinfo is not None:
+        time = time.tz_convert(None)
+
+    return int(time.value // 10 ** 9)
+
+
+def from_epoch(seconds):
+    """Return the naive UTC timestamp of epoch seconds.
+
+    :param seconds: `int` epoch seconds.
+    """
+    return pd.Timestamp(int(seconds), unit='s')
+
+
+def merge_ranges(ranges):
+    """Return the sorted union of half-open ranges.
+
+    :param ranges: `list` list of (start, end) tuples.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if end <= start:
+            continue
+
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+
+    return merged
+
+
+class CandleCache(object):
+    """On-disk candle store keyed by exchange, market id and frequency.
+
+    Each key is stored as a data file holding the candles and a json file
+    holding the time ranges already downloaded, so that callers only need
+    to fetch the ranges not covered yet.
+    """
+
+    def __init__(self, path, file_format='parquet', refetch_gaps=False):
+        """Constructor.
+
+        :param path: `str` root directory of the cache.
+        :param file_format: `str` data file format, either "parquet" or
+                            "pickle". Parquet requires pyarrow or
+                            fastparquet to be installed.
+        :param refetch_gaps: `bool` whether the candles missing within the
+                             covered ranges, e.g. dropped by the exchange,
+                             are queried again. Default is False, as some
+                             exchanges return no candle for the periods
+                             without trades, which would then be queried
+                             on every fetch.
+        """
+        if file_format not in FILE_FORMATS:
+            raise ValueError("File format {} is not supported".format(
+                file_format))
+
+        self.path = path
+        self.file_format = file_format
+        self.refetch_gaps = refetch_gaps
+
+    def _key_path(self, exchange, market_id, frequency):
+        """Return the path prefix of the key.
+        """
+        market_id = str(market_id).replace('/', '-')
+        return os.path.join(self.path, exchange, market_id, frequency)
+
+    def coverage(self, exchange, market_id, frequency):
+        """Return the covered ranges in epoch seconds.
+
+        :param exchange: `str` exchange id.
+        :param market_id: `str` exchange market id.
+        :param frequency: `str` frequency.
+        """
+        path = self._key_path(exchange, market_id, frequency) + '.json'
+        if not os.path.exists(path):
+            return []
+
+        with open(path) as f:
+            return [tuple(value) for value in json.load(f)]
+
+    def missing(self, exchange, market_id, frequency, start_time, end_time):
+        """Return the ranges not covered by the cache.
+
+        Ranges which cannot hold a single candle of the frequency are
+        ignored. If refetch_gaps is set, the ranges of the candles missing
+        within the covered ranges are returned as well.
+
+        :param exchange: `str` exchange id.
+        :param market_id: `str` exchange market id.
+        :param frequency: `str` frequency.
+        :param start_time: `datetime` start time.
+        :param end_time: `datetime` end time.
+        :return: `list` list of (start_time, end_time) tuples.
+        """
+        period = FREQUENCY_TO_SEC_DICT[frequency]
+        start, end = to_epoch(start_time), to_epoch(end_time)
+
+        gaps = []
+        for covered_start, covered_end in self.coverage(
+                exchange, market_id, frequency):
+            if covered_end <= start or covered_start >= end:
+                continue
+
+            if covered_start > start:
+                gaps.append((start, covered_start))
+
+            start = max(start, covered_end)
+
+        if start < end:
+            gaps.append((start, end))
+
+        if self.refetch_gaps:
+            gaps = merge_ranges(gaps + [
+                (to_epoch(gap_start), to_epoch(gap_end))
+                for gap_start, gap_end in self.gaps(
+                    exchange, market_id, frequency, start_time, end_time)])
+
+        return [(from_epoch(gap_start), from_epoch(gap_end))
+                for gap_start, gap_end in gaps
+                if math.ceil(gap_start / period) * period + period <= gap_end]
+
+    def gaps(self, exchange, market_id, frequency, start_time, end_time):
+        """Return the ranges of the candles missing from the cache.
+
+        :param exchange: `str` exchange id.
+        :param market_id: `str` exchange market id.
+        :param frequency: `str` frequency.
+        :param start_time: `datetime` start time.
+        :param end_time: `datetime` end time.
+        :return: `list` list of (start_time, end_time) tuples.
+        """
+        data = self.read(exchange, market_id, frequency, start_time, end_time)
+        return gap_ranges(
+            candle_gaps(data, start_time, end_time, frequency), frequency)
+
+    def read(self, exchange, market_id, frequency, start_time, end_time):
+        """Return the cached candles within the period.
+
+        :param exchange: `str` exchange id.
+        :param market_id: `str` exchange market id.
+        :param frequency: `str` frequency.
+        :param start_time: `datetime` start time.
+        :param end_time: `datetime` end time.
+        """
+        extension, reader, _ = FILE_FORMATS[self.file_format]
+        path = self._key_path(exchange, market_id, frequency) + extension
+        if not os.path.exists(path):
+            return pd.DataFrame()
+
+        data = reader(path)
+        start_time = from_epoch(to_epoch(start_time))
+        end_time = from_epoch(to_epoch(end_time))
+
+        return data[(data['start_time'] >= start_time) &
+                    (data['end_time'] <= end_time)].reset_index(drop=True)
+
+    def write(self, exchange, market_id, frequency, data, start_time,
+              end_time):
+        """Merge the candles into the cache and mark the period as covered.
+
+        Only the candles fully inside the period are stored.
+
+        :param exchange: `str` exchange id.
+        :param market_id: `str` exchange market id.
+        :param frequency: `str` frequency.
+        :param data: `pd.DataFrame` candles.
+        :param start_time: `datetime` start time of the covered period.
+        :param end_time: `datetime` end time of the covered period.
+        """
+        start, end = to_epoch(start_time), to_epoch(end_time)
+        if end <= start:
+            return
+
+        extension, reader, writer = FILE_FORMATS[self.file_format]
+        prefix = self._key_path(exchange, market_id, frequency)
+        os.makedirs(os.path.dirname(prefix), exist_ok=True)
+
+        if len(data) > 0:
+            data = data[(data['start_time'] >= from_epoch(start)) &
+                        (data['end_time'] <= from_epoch(end))]
+
+            if os.path.exists(prefix + extension):
+                data = pd.concat([reader(prefix + extension), data])
+
+            data = data.drop_duplicates(subset=['start_time'], keep='last')
+            data = data.sort_values(['start_time']).reset_index(drop=True)
+            getattr(data, writer)(prefix + extension)
+
+        coverage = merge_ranges(
+            self.coverage(exchange, market_id, frequency) + [(start, end)])
+        with open(prefix + '.json', 'w') as f:
+            json.dump(coverage, f)
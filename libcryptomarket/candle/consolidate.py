@@ -0,0 +1,105 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from libcryptomarket.candle.transform import composite_candles
+
+
+def venue_markets(exchanges, symbol, symbols=None):
+    """Return the market id of a symbol on every venue.
+
+    The symbol is the common symbol of the instrument, e.g. ETH/BTC, which
+    the venues list under their own market ids, e.g. BTC_ETH on Poloniex and
+    ETH-BTC on GDAX.
+
+    :param exchanges: `list` list of exchange instances.
+    :param symbol: `str` common symbol.
+    :param symbols: `dict` exchange id to the symbol of the instrument on the
+                    exchange, if it is listed under another symbol, e.g.
+                    ETH/USD for ETH/USDT. Default is None which uses the
+                    common symbol on all the exchanges.
+    :return: `dict` exchange id to `tuple` of the exchange symbol and market
+             id.
+    """
+    symbols = symbols or {}
+    markets = {}
+    for exchange in exchanges:
+        exchange.load_markets()
+        exchange_symbol = symbols.get(exchange.id, symbol)
+        markets[exchange.id] = (exchange_symbol,
+                                exchange.market_id(exchange_symbol))
+
+    return markets
+
+
+def fetch_consolidated_candles(exchanges, symbol, start_time, end_time,
+                               frequency, symbols=None, return_errors=False,
+                               **kwargs):
+    r"""Return the candles of an instrument on several venues as one panel.
+
+    The venues are queried concurrently, every one under the rate limiter of
+    its exchange, and their candles are aligned on the start times. The
+    panel has a column level of the exchange ids, and a composite key with
+    the volume-weighted candles of all the venues. See `composite_candles`
+    for the composite columns.
+
+    :param exchanges: `list` list of exchange instances.
+    :param symbol: `str` common symbol.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param symbols: `dict` exchange id to the symbol of the instrument on the
+                    exchange. See `venue_markets`.
+    :param return_errors: `bool` whether to return the venue errors instead
+                          of raising the first one. If True, a tuple of the
+                          panel of the succeeded venues and a `dict` of the
+                          failed exchange ids to their exceptions is
+                          returned.
+    :param \**kwargs: Arguments of `fetch_candles` for all the venues.
+    """
+    symbols = symbols or {}
+
+    def fetch_venue(exchange):
+        try:
+            exchange_symbol, market_id = venue_markets(
+                [exchange], symbol, symbols)[exchange.id]
+            logging.debug('Querying %s on %s as %s',
+                          symbol, exchange.id, market_id)
+            return exchange.fetch_candles(
+                symbol=exchange_symbol,
+                start_time=start_time,
+                end_time=end_time,
+                frequency=frequency,
+                **kwargs)
+        except Exception as e:
+            if not return_errors:
+                raise
+            return e
+
+    with ThreadPoolExecutor(max_workers=len(exchanges)) as executor:
+        results = list(executor.map(fetch_venue, exchanges))
+
+    candles = {}
+    base_volumes = {}
+    errors = {}
+    for exchange, data in zip(exchanges, results):
+        if isinstance(data, Exception):
+            errors[exchange.id] = data
+        elif len(data) > 0:
+            candles[exchange.id] = data
+            base_volumes[exchange.id] = exchange._candles_base_volume
+
+    if len(candles) == 0:
+        data = pd.DataFrame()
+    else:
+        candles['composite'] = composite_candles(candles, base_volumes)
+        data = pd.concat(
+            [venue_data.set_index(['start_time', 'end_time'])
+             for venue_data in candles.values()],
+            axis=1, keys=list(candles.keys())).sort_index()
+
+    if return_errors:
+        return data, errors
+    else:
+        return data
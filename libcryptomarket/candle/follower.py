@@ -0,0 +1,213 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from libcryptomarket.candle import FREQUENCY_TO_SEC_DICT
+
+
+class CandleFollower(object):
+    """Live follower of the latest closed candles of the symbols.
+
+    The last closed candles of every symbol are kept in a ring buffer of
+    fixed size. Every tick only queries the candles closed since the
+    previous tick, so that the steady state is a single small request per
+    symbol and candle.
+
+    The ring buffer is stored twice in a row, so that the latest candles are
+    always a contiguous slice and are read as a view without copying.
+    """
+
+    def __init__(self, exchange, symbols, frequency, frequency_count,
+                 max_symbol_workers=None, **kwargs):
+        r"""Constructor.
+
+        :param exchange: `ccxt.Exchange` exchange instance.
+        :param symbols: `list` list of symbols, or `str` symbol name.
+        :param frequency: `str` frequency.
+        :param frequency_count: `int` number of candles kept per symbol.
+        :param max_symbol_workers: `int` number of symbols queried
+                                   concurrently. Default is None which
+                                   queries the symbols one by one.
+        :param \**kwargs:
+            See below
+
+        :Keyword Arguments:
+            * *quote_currency* (``str``) --
+              Quote currency symbol, e.g. BTC.
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+
+        self.exchange = exchange
+        self.symbols = list(symbols)
+        self.frequency = frequency
+        self.frequency_count = frequency_count
+        self.max_symbol_workers = max_symbol_workers
+        self.kwargs = kwargs
+        self.columns = None
+        self.closest_end_time = None
+        self.errors = {}
+
+        self._period = timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency])
+        self._symbol_index = dict(
+            (symbol, i) for i, symbol in enumerate(self.symbols))
+        self._values = None
+        self._start_times = np.full(
+            2 * frequency_count, np.datetime64('NaT'), dtype='datetime64[ns]')
+        self._count = 0
+
+    @property
+    def values(self):
+        """Return the latest candles of all the symbols.
+
+        :return: `np.ndarray` view of shape (symbols, candles, columns),
+                 ordered by start time, or None before the first tick.
+        """
+        if self._values is None:
+            return None
+
+        head = self._count % self.frequency_count
+        return self._values[:, head:head + self.frequency_count]
+
+    @property
+    def start_times(self):
+        """Return the start times of the latest candles.
+
+        :return: `np.ndarray` view of the start times.
+        """
+        head = self._count % self.frequency_count
+        return self._start_times[head:head + self.frequency_count]
+
+    def __getitem__(self, symbol):
+        """Return the latest candles of the symbol.
+
+        :param symbol: `str` symbol.
+        :return: `np.ndarray` view of shape (candles, columns).
+        """
+        return self.values[self._symbol_index[symbol]]
+
+    def tick(self, end_time=None):
+        """Query the candles closed since the previous tick.
+
+        The symbols failed to query are kept in `errors` and their new
+        candles are left as NaN.
+
+        :param end_time: `datetime` end time. Default is None which will use
+                         current time.
+        :return: `int` number of new candles.
+        """
+        if end_time is None:
+            end_time = datetime.utcnow()
+
+        closest_end_time = pd.Timestamp(end_time).floor(self._period)
+        if self.closest_end_time is None:
+            count = self.frequency_count
+        else:
+            count = min(
+                self.frequency_count,
+                (closest_end_time - self.closest_end_time) // self._period)
+
+        if count <= 0:
+            return 0
+
+        start_time = closest_end_time - count * self._period
+
+        def fetch_symbol(symbol):
+            try:
+                return self._fetch_symbol(
+                    symbol, start_time, closest_end_time)
+            except Exception as e:
+                return e
+
+        if self.max_symbol_workers is None:
+            results = [fetch_symbol(symbol) for symbol in self.symbols]
+        else:
+            with ThreadPoolExecutor(
+                    max_workers=self.max_symbol_workers) as executor:
+                results = list(executor.map(fetch_symbol, self.symbols))
+
+        self.errors = {}
+        for symbol, data in zip(self.symbols, results):
+            if isinstance(data, Exception):
+                logging.warning('Failed to follow symbol %s: %s', symbol, data)
+                self.errors[symbol] = data
+            elif self.columns is None and len(data) > 0:
+                self._allocate(data)
+
+        slots = (self._count + np.arange(count)) % self.frequency_count
+        start_times = pd.date_range(
+            start_time, periods=count, freq=self._period).values
+        for slot in (slots, slots + self.frequency_count):
+            self._start_times[slot] = start_times
+            if self._values is not None:
+                self._values[:, slot] = np.nan
+
+        if self._values is not None:
+            for symbol, data in zip(self.symbols, results):
+                if isinstance(data, Exception) or len(data) == 0:
+                    continue
+
+                self._write(self._symbol_index[symbol], data, start_time,
+                            slots)
+
+        self._count += count
+        self.closest_end_time = closest_end_time
+        return count
+
+    def to_frame(self):
+        """Return the latest candles as a panel.
+
+        Unlike `values`, the panel is built on every call.
+
+        :return: `pd.DataFrame` candles indexed by start and end times, with
+                 the symbols and candle columns as columns.
+        """
+        start_times = pd.DatetimeIndex(self.start_times)
+        index = pd.MultiIndex.from_arrays(
+            [start_times, start_times + self._period],
+            names=['start_time', 'end_time'])
+
+        if self._values is None:
+            return pd.DataFrame(index=index)
+
+        columns = pd.MultiIndex.from_product([self.symbols, self.columns])
+        values = self.values.transpose(1, 0, 2).reshape(
+            self.frequency_count, -1)
+        return pd.DataFrame(values, index=index, columns=columns)
+
+    def _fetch_symbol(self, symbol, start_time, end_time):
+        """Return the candles of the symbol closed within the period.
+        """
+        all_data = list(self.exchange.iter_candles(
+            symbol=symbol,
+            start_time=start_time,
+            end_time=end_time,
+            frequency=self.frequency,
+            **self.kwargs))
+
+        if len(all_data) == 0:
+            return pd.DataFrame()
+
+        data = pd.concat(all_data) if len(all_data) > 1 else all_data[0]
+        return data[(data['start_time'] >= start_time) &
+                    (data['end_time'] <= end_time)]
+
+    def _allocate(self, data):
+        """Allocate the ring buffers from the columns of the first candles.
+        """
+        self.columns = [column for column in data.columns
+                        if column not in ('start_time', 'end_time')]
+        self._values = np.full(
+            (len(self.symbols), 2 * self.frequency_count, len(self.columns)),
+            np.nan)
+
+    def _write(self, index, data, start_time, slots):
+        """Write the new candles of a symbol into both halves of its buffer.
+        """
+        offsets = ((data['start_time'] - start_time) // self._period).values
+        values = data.reindex(columns=self.columns).values.astype(float)
+        for slot in (slots, slots + self.frequency_count):
+            self._values[index, slot[offsets]] = values
@@ -1,76 +1,837 @@
-import inspect
-from time import sleep
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from queue import Full, Queue
+from time import perf_counter, sleep
 
 import pandas as pd
 import ccxt
 
-import libcryptomarket.exchange
 from libcryptomarket.candle import FREQUENCY_TO_SEC_DICT
+from libcryptomarket.candle.markets import get_markets_cache
+from libcryptomarket.candle.params import candle_params
+from libcryptomarket.candle.ratelimit import throttle
+from libcryptomarket.candle.retry import (
+    DEFAULT_RETRY_POLICY, IncompleteCandlesError, retry_delay)
+from libcryptomarket.candle.session import _get_session, _set_session
+from libcryptomarket.candle.stats import emit
+from libcryptomarket.candle.transform import (
+    cross_candles, invert_candles, resample_candles, stitch_candles)
 
 
 def _fetch_candles(self, symbol, start_time, end_time, frequency,
-                   **kwargs):
+                   cache=None, max_workers=None, base_frequency=None,
+                   return_partial=False, **kwargs):
     r"""Return candles of a given period and frequency.
 
     :param symbol: `str` symbol.
     :param start_time: `datetime` start time.
     :param end_time: `datetime` end time.
     :param frequency: `str` frequency.
+    :param cache: `CandleCache` candle cache. Default is None which always
+                  queries the exchange. Otherwise, only the ranges not
+                  covered by the cache are queried.
+    :param max_workers: `int` number of concurrent requests. Default is None
+                        which paginates serially. Otherwise, the period is
+                        split into windows of the exchange page size which
+                        are queried concurrently within the rate limit.
+    :param base_frequency: `str` finer frequency to query and resample the
+                           candles from. Default is None which resamples
+                           from the coarsest finer frequency fully covered
+                           by the cache, or supported by the exchange if the
+                           frequency is not.
+    :param return_partial: `bool` whether to return the candles queried
+                           before a page failed all its retries instead of
+                           raising its error. If True, a tuple of the
+                           candles and the start time to resume the query
+                           from, None if complete, is returned.
     :param \**kwargs:
         See below
 
     :Keyword Arguments:
         * *quote_currency* (``str``) --
-          Quote currency symbol, e.g. BTC.
+          Quote currency symbol, e.g. BTC. If it is the base currency of
+          the symbol, the prices are inverted.
+        * *retry* (``RetryPolicy``) --
+          Retry policy of the failed pages. Default is
+          `DEFAULT_RETRY_POLICY`.
+        * *prefetch* (``int``) --
+          Number of pages requested ahead of the page being parsed, by a
+          background thread. Default is None which requests the next page
+          after parsing the current one.
     """
     self.load_markets()
+    start_time, end_time = _naive_utc(start_time), _naive_utc(end_time)
+
+    if base_frequency is None:
+        base_frequency = _resample_base_frequency(
+            self, cache=cache, market_id=self.market_id(symbol),
+            start_time=start_time, end_time=end_time, frequency=frequency)
+
+    if base_frequency is not None and base_frequency != frequency:
+        start_time, end_time = _resample_period(
+            start_time, end_time, frequency)
+        quote_currency = kwargs.pop('quote_currency', None)
+        result = _resample_result(self.fetch_candles(
+            symbol=symbol, start_time=start_time, end_time=end_time,
+            frequency=base_frequency, cache=cache, max_workers=max_workers,
+            base_frequency=base_frequency, return_partial=return_partial,
+            **kwargs), frequency, return_partial)
+        if cache is not None:
+            _write_resampled_candles(
+                self, cache, symbol=symbol, frequency=frequency,
+                result=result, start_time=start_time, end_time=end_time,
+                return_partial=return_partial)
+
+        return _invert_result(
+            result, return_partial,
+            invert=quote_currency == self.market(symbol)['base'])
+
+    quote_currency = kwargs.pop('quote_currency', None)
+    base_currency = self.market(symbol)['base']
 
     # Get the exchange market id
     symbol = self.market_id(symbol)
 
-    # Initialization
+    fetch_start_time = perf_counter()
+    resume_time = None
+    try:
+        if cache is not None:
+            all_data = _fetch_cached_candles(
+                self, cache=cache, symbol=symbol, start_time=start_time,
+                end_time=end_time, frequency=frequency,
+                max_workers=max_workers, **kwargs)
+        else:
+            all_data = _query_candles(
+                self, symbol=symbol, start_time=start_time,
+                end_time=end_time, frequency=frequency,
+                max_workers=max_workers, **kwargs)
+    except IncompleteCandlesError as e:
+        if not return_partial:
+            raise e.error from None
+
+        logging.warning('Returning partial candles of %s: %s', symbol, e)
+        all_data, resume_time = e.pages, e.resume_time
+
+    return _candles_result(
+        self, all_data, symbol=symbol,
+        invert=quote_currency is not None and quote_currency == base_currency,
+        resume_time=resume_time, return_partial=return_partial,
+        fetch_start_time=fetch_start_time)
+
+
+def _candles_result(self, all_data, symbol, invert, resume_time,
+                    return_partial, fetch_start_time):
+    """Return the candles of the queried pages.
+
+    :param all_data: `list` list of candle pages.
+    :param symbol: `str` exchange market id.
+    :param invert: `bool` whether to invert the prices.
+    :param resume_time: `datetime` start time to resume the query from, None
+                        if complete.
+    :param return_partial: `bool` whether to return the resume time.
+    :param fetch_start_time: `float` performance counter at the start of
+                             the fetch.
+    """
+    concat_start_time = perf_counter()
+    if len(all_data) == 0:
+        if resume_time is None:
+            raise ValueError("Start time cannot be after end time.")
+        data = pd.DataFrame()
+    else:
+        data = stitch_candles(all_data)
+    emit('concat', self.id, symbol=symbol, rows=len(data),
+         seconds=perf_counter() - concat_start_time)
+
+    if invert and len(data) > 0:
+        data = invert_candles(data)
+
+    emit('fetch', self.id, symbol=symbol, rows=len(data),
+         seconds=perf_counter() - fetch_start_time)
+
+    if return_partial:
+        return data, resume_time
+    else:
+        return data
+
+
+def _resample_result(result, frequency, return_partial):
+    """Return the resampled result of a fetch.
+
+    The candles of a partial result are only resampled up to the last
+    complete candle of the frequency, which becomes the resume time.
+
+    :param result: `pd.DataFrame` candles, or a tuple of the candles and
+                   the resume time if return_partial is True.
+    :param frequency: `str` frequency.
+    :param return_partial: `bool` whether the result is partial.
+    """
+    if not return_partial:
+        return resample_candles(result, frequency)
+
+    data, resume_time = result
+    if resume_time is not None and len(data) > 0:
+        resume_time = pd.Timestamp(resume_time).floor(
+            timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency]))
+        data = data[data['start_time'] < resume_time]
+
+    return resample_candles(data, frequency), resume_time
+
+
+def _write_resampled_candles(self, cache, symbol, frequency, result,
+                             start_time, end_time, return_partial):
+    """Write the resampled candles to the cache under their frequency.
+
+    Only the ranges missing from the cache within the resampled period are
+    written, so that the candles are served from the cache afterwards
+    without resampling.
+
+    :param cache: `CandleCache` candle cache.
+    :param symbol: `str` symbol.
+    :param frequency: `str` frequency of the resampled candles.
+    :param result: `pd.DataFrame` resampled candles, or a tuple of the
+                   candles and the resume time if return_partial is True.
+    :param start_time: `datetime` start time of the resampled period.
+    :param end_time: `datetime` end time of the resampled period.
+    :param return_partial: `bool` whether the result is partial.
+    """
+    data, resume_time = result if return_partial else (result, None)
+    if resume_time is not None:
+        end_time = min(end_time, pd.Timestamp(resume_time))
+
+    market_id = self.market_id(symbol)
+    for gap_start_time, gap_end_time in cache.missing(
+            self.id, market_id, frequency, start_time, end_time):
+        if gap_start_time >= start_time and gap_end_time <= end_time:
+            cache.write(self.id, market_id, frequency, data=data,
+                        start_time=gap_start_time, end_time=gap_end_time)
+
+
+def _invert_result(result, return_partial, invert):
+    """Return the result of a fetch with its prices inverted if required.
+
+    :param result: `pd.DataFrame` candles, or a tuple of the candles and
+                   the resume time if return_partial is True.
+    :param return_partial: `bool` whether the result is partial.
+    :param invert: `bool` whether to invert the prices.
+    """
+    data, resume_time = result if return_partial else (result, None)
+    if invert and len(data) > 0:
+        data = invert_candles(data)
+
+    return (data, resume_time) if return_partial else data
+
+
+def _query_candles(self, symbol, start_time, end_time, frequency,
+                   max_workers=None, **kwargs):
+    """Return the list of candle pages queried from the exchange.
+
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param max_workers: `int` number of concurrent requests. Default is None
+                        which paginates serially.
+    """
+    page_size = candle_params(self).page_size
+    if max_workers is None or page_size is None:
+        return _paginate_candles(
+            self, symbol=symbol, start_time=start_time, end_time=end_time,
+            frequency=frequency, **kwargs)
+
+    return _fetch_windowed_candles(
+        self, symbol=symbol, start_time=start_time, end_time=end_time,
+        frequency=frequency, max_workers=max_workers, **kwargs)
+
+
+def _paginate_candles(self, symbol, start_time, end_time, frequency,
+                      **kwargs):
+    """Return the list of candle pages queried serially from the exchange.
+
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :raises IncompleteCandlesError: if a page failed all its retries, with
+                                    the pages queried before it.
+    """
     all_data = []
+    try:
+        for data in _iter_pages(
+                self, symbol=symbol, start_time=start_time,
+                end_time=end_time, frequency=frequency, **kwargs):
+            all_data.append(data)
+    except IncompleteCandlesError as e:
+        e.pages = all_data
+        raise
+
+    return all_data
+
+
+def _iter_pages(self, symbol, start_time, end_time, frequency, retry=None,
+                prefetch=None, **kwargs):
+    """Yield the candle pages queried serially from the exchange.
+
+    Every request waits for a token of the exchange rate limiter, and the
+    transient errors are retried.
+
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param retry: `RetryPolicy` retry policy. Default is None which uses
+                  `DEFAULT_RETRY_POLICY`.
+    :param prefetch: `int` number of pages requested ahead of the page being
+                     parsed. Default is None which requests the next page
+                     after parsing the current one.
+    :raises IncompleteCandlesError: if a page failed all its retries.
+    """
+    if prefetch and candle_params(self).page_size is not None:
+        for data in _iter_prefetched_pages(
+                self, symbol=symbol, start_time=start_time,
+                end_time=end_time, frequency=frequency, retry=retry,
+                prefetch=prefetch, **kwargs):
+            yield data
+        return
+
     last_start_time = None
 
-    while (start_time <
-           end_time - pd.DateOffset(seconds=FREQUENCY_TO_SEC_DICT[frequency])):
-        sleep(self.describe()['rateLimit'] / 1000)
-        data = self._fetch_single_candles(
-            symbol=symbol, start_time=start_time, end_time=end_time,
-            frequency=frequency, **kwargs)
+    period = pd.Timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency])
+    while start_time + period <= end_time:
+        try:
+            data = _fetch_page(
+                self, symbol=symbol, start_time=start_time,
+                end_time=end_time, frequency=frequency, retry=retry,
+                **kwargs)
+        except Exception as e:
+            raise IncompleteCandlesError(
+                e, resume_time=pd.Timestamp(start_time)) from e
 
         if len(data) == 0:
             break
 
-        if (last_start_time is not None and
-                data["start_time"].iloc[0] >= last_start_time):
+        data = _drop_overlap(data, last_start_time)
+        if len(data) == 0:
+            # No candle after the previous page
             break
 
-        all_data.append(data)
+        yield data
+        last_start_time = data["start_time"].iloc[-1]
 
         if data["end_time"].iloc[-1] > start_time:
             start_time = data["end_time"].iloc[-1]
         else:
             break
 
-    if len(all_data) == 0:
-        raise ValueError("Start time cannot be after end time.")
-    elif len(all_data) == 1:
-        return all_data[0]
-    else:
-        return pd.concat(all_data)
+
+def _iter_prefetched_pages(self, symbol, start_time, end_time, frequency,
+                           prefetch, retry=None, **kwargs):
+    """Yield the candle pages requested ahead by a background thread.
+
+    The period is split into windows of the exchange page size, so that the
+    next window is known before the current page is parsed. A background
+    thread requests the windows in order into a bounded queue, while the
+    caller parses the responses, so the requests and the parsing overlap. A
+    window whose page ends early is completed by serial pagination.
+
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param prefetch: `int` maximum number of responses waiting to be parsed.
+    :param retry: `RetryPolicy` retry policy. Default is None which uses
+                  `DEFAULT_RETRY_POLICY`.
+    :raises IncompleteCandlesError: if a page failed all its retries.
+    """
+    page_size = candle_params(self).page_size
+    windows = _candle_windows(start_time, end_time, frequency, page_size)
+    responses = Queue(maxsize=prefetch)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                responses.put(item, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def request_windows():
+        for window_start_time, window_end_time in windows:
+            if stopped.is_set():
+                return
+
+            try:
+                response = _fetch_page(
+                    self, symbol=symbol, start_time=window_start_time,
+                    end_time=window_end_time, frequency=frequency,
+                    retry=retry, parse=False)
+            except Exception as e:
+                put((window_start_time, window_end_time, e))
+                return
+
+            put((window_start_time, window_end_time, response))
+
+        put(None)
+
+    thread = threading.Thread(target=request_windows, daemon=True)
+    thread.start()
+
+    last_start_time = None
+    try:
+        while True:
+            item = responses.get()
+            if item is None:
+                break
+
+            window_start_time, window_end_time, response = item
+            if isinstance(response, Exception):
+                raise IncompleteCandlesError(
+                    response, resume_time=window_start_time) from response
+
+            data = _parse_page(self, response, symbol=symbol,
+                               frequency=frequency, **kwargs)
+            if len(data) == 0:
+                # No candle within the window, e.g. during a downtime
+                continue
+
+            if data["end_time"].iloc[-1] < window_end_time:
+                # The page ends before the window, e.g. the exchange returns
+                # fewer candles than its page size
+                data = stitch_candles([data] + list(_iter_pages(
+                    self, symbol=symbol,
+                    start_time=data["end_time"].iloc[-1],
+                    end_time=window_end_time, frequency=frequency,
+                    retry=retry, **kwargs)))
+
+            data = _drop_overlap(data, last_start_time)
+
+            if len(data) == 0:
+                continue
+
+            yield data
+            last_start_time = data["start_time"].iloc[-1]
+    finally:
+        stopped.set()
+
+
+def _drop_overlap(data, last_start_time):
+    """Return the candles of a page after the last candle of the previous
+    page.
+
+    Exchanges with inclusive bounds return the last candle of the previous
+    page again as the first candle of the next one.
+
+    :param data: `pd.DataFrame` candles of the page.
+    :param last_start_time: `datetime` start time of the last candle of the
+                            previous page, None if it is the first page.
+    """
+    if last_start_time is None:
+        return data
+
+    first = data["start_time"].searchsorted(last_start_time, side='right')
+    if first > 0:
+        data = data.iloc[first:].reset_index(drop=True)
+
+    return data
+
+
+def _fetch_page(self, symbol, start_time, end_time, frequency, retry=None,
+                parse=True, **kwargs):
+    """Return a page of candles, retrying the transient errors.
+
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param retry: `RetryPolicy` retry policy. Default is None which uses
+                  `DEFAULT_RETRY_POLICY`.
+    :param parse: `bool` whether to parse the response. If False, the raw
+                  response is returned to be parsed by `_parse_page`.
+    """
+    retry = retry or DEFAULT_RETRY_POLICY
+    attempt = 0
+
+    while True:
+        throttle(self)
+        try:
+            if not parse:
+                return _request_page(
+                    self, symbol=symbol, start_time=start_time,
+                    end_time=end_time, frequency=frequency)
+
+            return self._fetch_single_candles(
+                symbol=symbol, start_time=start_time, end_time=end_time,
+                frequency=frequency, **kwargs)
+        except Exception as e:
+            delay = retry_delay(self, e, attempt, retry)
+            if delay is None:
+                raise
+
+        sleep(delay)
+        attempt += 1
+
+
+def _iter_candles(self, symbol, start_time, end_time, frequency,
+                  chunk_size=None, **kwargs):
+    r"""Yield candles of a given period and frequency as they arrive.
+
+    Only the current page, or chunk, is held in memory, so that very long
+    histories can be written or aggregated incrementally.
+
+    :param symbol: `str` symbol.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param chunk_size: `int` number of candles in every yielded chunk, except
+                       the last one. Default is None which yields the pages
+                       as returned by the exchange.
+    :param \**kwargs:
+        See below
+    :raises IncompleteCandlesError: if a page failed all its retries, after
+                                    the candles before it are yielded.
+
+    :Keyword Arguments:
+        * *quote_currency* (``str``) --
+          Quote currency symbol, e.g. BTC. If it is the base currency of
+          the symbol, the prices are inverted.
+        * *retry* (``RetryPolicy``) --
+          Retry policy of the failed pages. Default is
+          `DEFAULT_RETRY_POLICY`.
+        * *prefetch* (``int``) --
+          Number of pages requested ahead of the page being parsed, by a
+          background thread. Default is None.
+    """
+    self.load_markets()
+    start_time, end_time = _naive_utc(start_time), _naive_utc(end_time)
+
+    quote_currency = kwargs.pop('quote_currency', None)
+    base_currency = self.market(symbol)['base']
+
+    # Get the exchange market id
+    symbol = self.market_id(symbol)
+
+    pages = _iter_pages(
+        self, symbol=symbol, start_time=start_time, end_time=end_time,
+        frequency=frequency, **kwargs)
+    if chunk_size is not None:
+        pages = _rechunk(pages, chunk_size)
+
+    for data in pages:
+        if quote_currency is not None and quote_currency == base_currency:
+            data = invert_candles(data)
+
+        yield data
+
+
+def _rechunk(pages, chunk_size):
+    """Yield the rows of the pages in chunks of a fixed size.
+
+    :param pages: `iterable` candle pages.
+    :param chunk_size: `int` number of rows in every chunk, except the last
+                       one.
+    """
+    buffer = []
+    buffer_size = 0
+    try:
+        for data in pages:
+            buffer.append(data)
+            buffer_size += len(data)
+
+            if buffer_size < chunk_size:
+                continue
+
+            data = pd.concat(buffer) if len(buffer) > 1 else buffer[0]
+            for start in range(0, len(data) - chunk_size + 1, chunk_size):
+                yield data.iloc[start:start + chunk_size]
+
+            remainder = data.iloc[len(data) - len(data) % chunk_size:]
+            buffer = [remainder] if len(remainder) > 0 else []
+            buffer_size = len(remainder)
+    except IncompleteCandlesError:
+        # Yield the buffered rows before the failed page first, so that the
+        # query can resume from it
+        if buffer_size > 0:
+            yield pd.concat(buffer) if len(buffer) > 1 else buffer[0]
+        raise
+
+    if buffer_size > 0:
+        yield pd.concat(buffer) if len(buffer) > 1 else buffer[0]
+
+
+def _fetch_windowed_candles(self, symbol, start_time, end_time, frequency,
+                            max_workers, **kwargs):
+    """Return the list of candle pages queried concurrently by windows.
+
+    The period is split into windows holding at most one page of candles.
+    The windows are queried by a thread pool sharing the exchange rate
+    limiter, and the pages are returned in time order.
+
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param max_workers: `int` number of concurrent requests.
+    """
+    windows = _candle_windows(
+        start_time, end_time, frequency, candle_params(self).page_size)
+
+    def fetch_window(window_start_time, window_end_time):
+        try:
+            all_data = _paginate_candles(
+                self, symbol=symbol, start_time=window_start_time,
+                end_time=window_end_time, frequency=frequency, **kwargs)
+        except IncompleteCandlesError as e:
+            e.pages = [data[data['start_time'] < window_end_time]
+                       for data in e.pages]
+            raise
+
+        return [data[data['start_time'] < window_end_time]
+                for data in all_data]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(fetch_window, *window)
+                   for window in windows]
+
+    return _windowed_pages([future.exception() or future.result()
+                            for future in futures])
+
+
+def _windowed_pages(results):
+    """Return the candle pages of the windows in order.
+
+    :param results: `list` list of the candle pages, or the error, of every
+                    window.
+    :raises IncompleteCandlesError: if a window is incomplete, with the
+                                    pages of the windows before it.
+    """
+    all_data = []
+    for result in results:
+        if isinstance(result, IncompleteCandlesError):
+            result.pages = [data for data in all_data + result.pages
+                            if len(data) > 0]
+            raise result
+        elif isinstance(result, Exception):
+            raise result
+
+        all_data.extend(data for data in result if len(data) > 0)
+
+    return all_data
+
+
+def _candle_windows(start_time, end_time, frequency, page_size):
+    """Return the consecutive windows holding at most a page of candles.
+
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param page_size: `int` maximum number of candles in a window.
+    :return: `list` list of (start_time, end_time) tuples.
+    """
+    window = timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency] * page_size)
+    start_time = pd.Timestamp(start_time)
+    end_time = pd.Timestamp(end_time)
+
+    windows = []
+    while start_time < end_time:
+        windows.append((start_time, min(start_time + window, end_time)))
+        start_time += window
+
+    return windows
+
+
+def _fetch_cached_candles(self, cache, symbol, start_time, end_time,
+                          frequency, max_workers=None, **kwargs):
+    """Return the list of candle pages served by the cache.
+
+    Only the ranges not covered by the cache are queried from the exchange
+    and then written back to the cache. Candles which have not closed yet
+    are never cached.
+
+    :param cache: `CandleCache` candle cache.
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param max_workers: `int` number of concurrent requests.
+    """
+    closed_end_time = _closest_end_time(frequency)
+    period = pd.Timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency])
+
+    for gap_start_time, gap_end_time in cache.missing(
+            self.id, symbol, frequency, start_time, end_time):
+        if gap_start_time + period > gap_end_time:
+            # Not queried as no candle fits in it, so not covered either
+            continue
+
+        try:
+            all_data = _query_candles(
+                self, symbol=symbol, start_time=gap_start_time,
+                end_time=gap_end_time, frequency=frequency,
+                max_workers=max_workers, **kwargs)
+        except IncompleteCandlesError as e:
+            _write_cache_gap(
+                self, cache, symbol, frequency, e.pages, gap_start_time,
+                min(e.resume_time, closed_end_time))
+            data = cache.read(
+                self.id, symbol, frequency, start_time, e.resume_time)
+            e.pages = [data] if len(data) > 0 else []
+            raise
+
+        _write_cache_gap(
+            self, cache, symbol, frequency, all_data, gap_start_time,
+            min(gap_end_time, closed_end_time))
+
+    data = cache.read(self.id, symbol, frequency, start_time, end_time)
+    return [data] if len(data) > 0 else []
+
+
+def _write_cache_gap(self, cache, symbol, frequency, all_data, start_time,
+                     end_time):
+    """Write the candle pages queried for a gap of the cache.
+    """
+    cache.write(
+        self.id, symbol, frequency,
+        data=stitch_candles(all_data),
+        start_time=start_time,
+        end_time=end_time)
+
+
+def _finer_frequencies(frequency):
+    """Return the frequencies the frequency can be resampled from.
+
+    :param frequency: `str` frequency.
+    :return: `list` list of frequencies, from the coarsest to the finest.
+    """
+    period = FREQUENCY_TO_SEC_DICT[frequency]
+    frequencies = [
+        value for value in FREQUENCY_TO_SEC_DICT
+        if isinstance(value, str) and
+        FREQUENCY_TO_SEC_DICT[value] < period and
+        period % FREQUENCY_TO_SEC_DICT[value] == 0]
+
+    return sorted(frequencies, key=FREQUENCY_TO_SEC_DICT.get, reverse=True)
+
+
+def _resample_period(start_time, end_time, frequency):
+    """Return the period of the closed candles of the frequency within the
+    given period.
+
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    """
+    period = timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency])
+    return (_naive_utc(start_time).ceil(period),
+            min(_naive_utc(end_time).floor(period),
+                _closest_end_time(frequency)))
+
+
+def _naive_utc(time):
+    """Return the naive UTC timestamp of a time. Naive times are treated as
+    UTC.
+
+    :param time: `datetime` or `pd.Timestamp` time.
+    """
+    time = pd.Timestamp(time)
+    if time.tzinfo is not None:
+        time = time.tz_convert(None)
+
+    return time
+
+
+def _resample_base_frequency(self, cache, market_id, start_time, end_time,
+                             frequency):
+    """Return the finer frequency to resample the candles from.
+
+    The frequency itself is read from the cache if it is fully covered.
+    Otherwise, the coarsest finer frequency fully covered by the cache is
+    used. Otherwise, if the exchange does not support the frequency, the
+    coarsest finer frequency it supports is used.
+
+    :param cache: `CandleCache` candle cache, or None.
+    :param market_id: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :return: `str` finer frequency, or None to query the frequency itself.
+    """
+    frequencies = _finer_frequencies(frequency)
+
+    if cache is not None:
+        if not cache.missing(self.id, market_id, frequency,
+                             start_time, end_time):
+            return None
+
+        start_time, end_time = _resample_period(
+            start_time, end_time, frequency)
+        if start_time < end_time:
+            for base_frequency in frequencies:
+                if not cache.missing(self.id, market_id, base_frequency,
+                                     start_time, end_time):
+                    return base_frequency
+
+    timeframes = candle_params(self).timeframes
+    if frequency in timeframes:
+        return None
+
+    for base_frequency in frequencies:
+        if base_frequency in timeframes:
+            return base_frequency
+
+    raise ValueError("Frequency {} is not supported by {}".format(
+        frequency, self.id))
+
+
+def _closest_end_time(frequency, end_time=None):
+    """Return the end time of the latest closed candle.
+
+    :param frequency: `str` frequency.
+    :param end_time: `datetime` end time. Default is None which will use
+                     current time.
+    """
+    if end_time is None:
+        end_time = datetime.utcnow()
+
+    return pd.Timestamp(end_time).floor(
+        timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency]))
+
+
+def _set_candle_times(data, frequency, unit):
+    """Convert the epoch start times and add the end times of the candles.
+
+    Both columns are converted as a whole into naive UTC timestamps.
+
+    :param data: `pd.DataFrame` candles with epoch start times.
+    :param frequency: `str` frequency.
+    :param unit: `str` unit of the epoch, e.g. "s" or "ms".
+    """
+    data['start_time'] = pd.to_datetime(data['start_time'], unit=unit)
+    data['end_time'] = data['start_time'] + pd.Timedelta(
+        seconds=FREQUENCY_TO_SEC_DICT[frequency])
+
+    return data
 
 
 def _fetch_latest_candles(self, symbols, frequency, frequency_count,
-                          end_time=None, **kwargs):
-    """Return the latest candles based on the frequency and its count.
+                          end_time=None, max_symbol_workers=None,
+                          return_errors=False, **kwargs):
+    r"""Return the latest candles based on the frequency and its count.
 
     :param symbols: `list` list of symbols, or `str` symbol name.
-    :param frequency: `int` frequency in seconds.
     :param frequency: `str` frequency.
+    :param frequency_count: `int` number of candles.
     :param end_time: `datetime` end time. Default is None which will use
                      current time.
+    :param max_symbol_workers: `int` number of symbols queried concurrently.
+                               Default is None which queries the symbols
+                               one by one.
+    :param return_errors: `bool` whether to return the symbol errors instead
+                          of raising the first one. If True, a tuple of the
+                          candles of the succeeded symbols and a `dict` of
+                          the failed symbols to their exceptions is
+                          returned.
     :param \**kwargs:
         See below
 
@@ -81,152 +842,334 @@ def _fetch_latest_candles(self, symbols, frequency, frequency_count,
     if isinstance(symbols, str):
         symbols = [symbols]
 
-    if end_time is None:
-        end_time = datetime.utcnow()
-
-    closest_end_time = pd.Timestamp(end_time).floor(
-        timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency]))
+    closest_end_time = _closest_end_time(frequency, end_time)
     start_time = closest_end_time - timedelta(
         seconds=FREQUENCY_TO_SEC_DICT[frequency] * frequency_count + 1)
 
+    # Load the markets once before querying the symbols
+    self.load_markets()
+
+    def fetch_symbol(symbol):
+        try:
+            return self.fetch_candles(
+                symbol=symbol,
+                start_time=start_time,
+                end_time=closest_end_time,
+                frequency=frequency,
+                **kwargs)
+        except Exception as e:
+            if not return_errors:
+                raise
+            return e
+
+    if max_symbol_workers is None:
+        results = [fetch_symbol(symbol) for symbol in symbols]
+    else:
+        with ThreadPoolExecutor(max_workers=max_symbol_workers) as executor:
+            results = list(executor.map(fetch_symbol, symbols))
+
+    return _latest_candles_panel(
+        symbols, results, closest_end_time, return_errors)
+
+
+def _latest_candles_panel(symbols, results, closest_end_time, return_errors):
+    """Return the panel of the latest candles of the symbols.
+
+    :param symbols: `list` list of symbols.
+    :param results: `list` list of candles or exceptions of the symbols.
+    :param closest_end_time: `datetime` end time of the latest candle.
+    :param return_errors: `bool` whether to return the symbol errors.
+    """
     all_data = []
-    for symbol in symbols:
-        data = self.fetch_candles(
-            symbol=symbol,
-            start_time=start_time,
-            end_time=closest_end_time,
-            frequency=frequency,
-            **kwargs)
+    keys = []
+    errors = {}
+    for symbol, data in zip(symbols, results):
+        if isinstance(data, Exception):
+            errors[symbol] = data
+            continue
+
         data = data[data['end_time'] <= closest_end_time]
         all_data.append(data.set_index(['start_time', 'end_time']))
+        keys.append(symbol)
 
-    if len(all_data) == 1:
-        return all_data[0]
+    if len(all_data) == 0:
+        data = pd.DataFrame()
+    elif len(symbols) == 1:
+        data = all_data[0]
     else:
-        return pd.concat(all_data, axis=1, keys=symbols)
+        data = pd.concat(all_data, axis=1, keys=keys)
+
+    if return_errors:
+        return data, errors
+    else:
+        return data
+
+
+def _fetch_cross_candles(self, symbol, start_time, end_time, frequency,
+                         via=None, **kwargs):
+    r"""Return synthetic candles of a cross rate from its two legs.
+
+    For example, ETH/USDT candles are built from the ETH/BTC and BTC/USDT
+    candles, which are queried concurrently. The legs listed the other way
+    round, e.g. USDT/BTC, are inverted. See `cross_candles` for the
+    approximation of the high and low prices.
+
+    :param symbol: `str` symbol of the cross rate, e.g. ETH/USDT.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param via: `str` intermediate currency, e.g. BTC. Default is None which
+                uses the first currency among BTC, ETH, USDT and USD, and
+                then the others in alphabetical order, listed against both
+                currencies of the symbol.
+    :param \**kwargs: Arguments of `fetch_candles` for both legs.
+    """
+    self.load_markets()
+    legs = _cross_legs(self, symbol, via)
+
+    def fetch_leg(leg):
+        leg_symbol, quote_currency = leg
+        return self.fetch_candles(
+            symbol=leg_symbol, start_time=start_time, end_time=end_time,
+            frequency=frequency, quote_currency=quote_currency, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=len(legs)) as executor:
+        base_leg, quote_leg = executor.map(fetch_leg, legs)
+
+    return cross_candles(base_leg, quote_leg)
+
+
+def _cross_legs(self, symbol, via=None):
+    """Return the legs of a cross rate.
+
+    :param symbol: `str` symbol of the cross rate.
+    :param via: `str` intermediate currency, or None to find one.
+    :return: `list` list of the symbol and quote currency of the base and
+             quote legs.
+    """
+    base, quote = symbol.split('/')
+
+    def find_leg(leg_base, leg_quote):
+        if '{}/{}'.format(leg_base, leg_quote) in self.markets:
+            return '{}/{}'.format(leg_base, leg_quote), leg_quote
+        elif '{}/{}'.format(leg_quote, leg_base) in self.markets:
+            # Quoting the inverted leg in its base currency inverts it
+            return '{}/{}'.format(leg_quote, leg_base), leg_quote
+        return None
+
+    if via is None:
+        currencies = set(
+            currency for market in self.markets.values()
+            for currency in (market['base'], market['quote']))
+        candidates = [currency for currency in ['BTC', 'ETH', 'USDT', 'USD']
+                      if currency in currencies]
+        candidates += sorted(currencies - set(candidates))
+    else:
+        candidates = [via]
+
+    for candidate in candidates:
+        if candidate in (base, quote):
+            continue
+
+        legs = [find_leg(base, candidate), find_leg(candidate, quote)]
+        if None not in legs:
+            return legs
+
+    raise ValueError("Symbol {} cannot be crossed via {}".format(
+        symbol, via or 'any currency'))
 
 
 ###############################################################################
 # Patch
 ###############################################################################
-for exchange in dir(libcryptomarket.exchange):
-    instance = getattr(ccxt, exchange)
-    try:
-        if inspect.isclass(instance) and issubclass(instance, ccxt.Exchange):
-            setattr(instance, 'fetch_candles', _fetch_candles)
-            setattr(instance, 'fetch_latest_candles', _fetch_latest_candles)
-    except Exception as e:
-        raise e
+def _fetch_single_candles(self, symbol, start_time, end_time, frequency,
+                          **kwargs):
+    """Return a single page of candles queried from the exchange.
+
+    The request and parse times are emitted to the candle stats.
+    """
+    data = _request_page(
+        self, symbol=symbol, start_time=start_time, end_time=end_time,
+        frequency=frequency)
+    return _parse_page(self, data, symbol=symbol, frequency=frequency,
+                       **kwargs)
+
+
+def _request_page(self, symbol, start_time, end_time, frequency):
+    """Return the raw response of a page of candles.
+    """
+    request_start_time = perf_counter()
+    data = self._request_single_candles(
+        symbol=symbol, start_time=start_time, end_time=end_time,
+        frequency=frequency)
+    emit('request', self.id, symbol=symbol, size=_response_size(self),
+         seconds=perf_counter() - request_start_time)
+    return data
+
+
+def _parse_page(self, data, symbol, frequency, **kwargs):
+    """Return the candles of the raw response of a page.
+    """
+    parse_start_time = perf_counter()
+    data = self._parse_single_candles(
+        data, symbol=symbol, frequency=frequency, **kwargs)
+    emit('parse', self.id, symbol=symbol, rows=len(data),
+         seconds=perf_counter() - parse_start_time)
+    return data
+
+
+def _load_markets(self, reload=False):
+    """Load the markets of the exchange, shared by all its instances.
+
+    The markets are served by the markets cache, and only queried from the
+    exchange if missing or expired.
+
+    :param reload: `bool` whether to query the markets from the exchange
+                   even if loaded.
+    """
+    if not reload and not self.markets:
+        cached = get_markets_cache().get(self.id)
+        if cached is not None:
+            return self.set_markets(*cached)
+
+    loaded = bool(self.markets) and not reload
+    markets = _exchange_load_markets(self, reload=reload)
+    if not loaded:
+        get_markets_cache().put(self.id, self.markets,
+                                getattr(self, 'currencies', None))
+
+    return markets
+
+
+def _response_size(self):
+    """Return the size of the last response in bytes, or 0 if unknown.
+
+    The size is taken from the last response of the exchange instance, so
+    it is approximate when the instance is shared by concurrent requests.
+    """
+    response = getattr(self, 'last_http_response', None)
+    return len(response) if isinstance(response, (str, bytes)) else 0
+
+
+# Patch the base class once, instead of every exchange class
+setattr(ccxt.Exchange, 'fetch_candles', _fetch_candles)
+setattr(ccxt.Exchange, 'fetch_latest_candles', _fetch_latest_candles)
+setattr(ccxt.Exchange, 'fetch_cross_candles', _fetch_cross_candles)
+setattr(ccxt.Exchange, 'iter_candles', _iter_candles)
+setattr(ccxt.Exchange, '_fetch_single_candles', _fetch_single_candles)
+
+# Maximum number of candles returned by a single request, None if unknown
+setattr(ccxt.Exchange, '_candles_page_size', None)
+
+# Name of the volume column in the base currency of the symbol
+setattr(ccxt.Exchange, '_candles_base_volume', 'volume')
+
+# Share a keep-alive connection pool among the instances of every exchange
+setattr(ccxt.Exchange, 'session', property(_get_session, _set_session))
+
+# Share the markets among the instances of every exchange
+_exchange_load_markets = ccxt.Exchange.load_markets
+setattr(ccxt.Exchange, 'load_markets', _load_markets)
 
 
 ###############################################################################
 # Poloniex patching
 ###############################################################################
-def _poloniex_single_candles(
-        self, symbol, start_time, end_time, frequency, **kwargs):
-    """Poloniex candles.
+def _poloniex_request_candles(self, symbol, start_time, end_time, frequency):
+    """Poloniex candles request.
     """
-    data = self.public_get_returnchartdata(params={
+    return self.public_get_returnchartdata(params={
         "currencyPair": symbol,
         "start": round(start_time.timestamp()),
         "end": round(end_time.timestamp()) - FREQUENCY_TO_SEC_DICT[frequency],
-        "period": self.describe()['timeframes'][frequency]
+        "period": candle_params(self).timeframes[frequency]
     })
 
+
+def _poloniex_parse_candles(self, data, symbol, frequency, **kwargs):
+    """Poloniex candles.
+    """
     data = pd.DataFrame(data).rename(columns={
         'date': 'start_time',
         'quoteVolume': 'quote_volume',
         'weightedAverage': 'weighted_average'
     })
 
-    data.loc[:, 'start_time'] = data['start_time'].apply(
-        lambda x: pd.Timestamp.utcfromtimestamp(x))
-    data['end_time'] = data['start_time'] + pd.DateOffset(
-        seconds=FREQUENCY_TO_SEC_DICT[frequency])
+    return _set_candle_times(data, frequency, unit='s')
 
-    if 'quote_currency' in kwargs.keys():
-        base_currency = symbol.split('_')[1]
-
-        if kwargs['quote_currency'] == base_currency:
-            data.loc[:, "open"] = (1 / data.loc[:, "open"]).apply(
-                lambda x: round(x, 8))
-            data.loc[:, "close"] = (1 / data.loc[:, "close"]).apply(
-                lambda x: round(x, 8))
-            data.loc[:, "weighted_average"] = (
-                (1 / data.loc[:, "weighted_average"]).apply(
-                    lambda x: round(x, 8)))
-            high_prices = (1 / data.loc[:, "low"]).apply(
-                lambda x: round(x, 8))
-            low_prices = (1 / data.loc[:, "high"]).apply(
-                lambda x: round(x, 8))
-            data.loc[:, "high"] = high_prices
-            data.loc[:, "low"] = low_prices
-
-    return data
 
+setattr(ccxt.poloniex, '_request_single_candles', _poloniex_request_candles)
+setattr(ccxt.poloniex, '_parse_single_candles', _poloniex_parse_candles)
+setattr(ccxt.poloniex, '_candles_page_size', 10000)
 
-setattr(ccxt.poloniex, '_fetch_single_candles', _poloniex_single_candles)
+# Poloniex volume is in the quote currency, and quoteVolume in the base one
+setattr(ccxt.poloniex, '_candles_base_volume', 'quote_volume')
 
 
 ###############################################################################
 # Bitfinex patching
 ###############################################################################
-def _bitfinex_single_candles(self, symbol, start_time, end_time, frequency,
-                             **kwargs):
-    """Bitfinex candles.
+def _bitfinex_request_candles(self, symbol, start_time, end_time, frequency):
+    """Bitfinex candles request.
     """
-    data = self.request(
+    return self.request(
         path='candles/trade:{}:{}/hist'.format(
-            self.describe()['timeframes'][frequency], symbol),
+            candle_params(self).timeframes[frequency], symbol),
         params={
             "start": round(start_time.timestamp() * 1000),
             "end": round((end_time.timestamp() -
                           FREQUENCY_TO_SEC_DICT[frequency]) * 1000),
+            "limit": candle_params(self).page_size,
             "sort": 1
         })
 
+
+def _bitfinex_parse_candles(self, data, symbol, frequency, **kwargs):
+    """Bitfinex candles.
+    """
     data = pd.DataFrame(data, columns=["start_time", "open", "close", "high",
                                        "low", "volume"])
 
-    data.loc[:, 'start_time'] = data['start_time'].apply(
-        lambda x: pd.Timestamp.utcfromtimestamp(x / 1000))
-    data['end_time'] = data['start_time'] + pd.DateOffset(
-        seconds=FREQUENCY_TO_SEC_DICT[frequency])
+    data = _set_candle_times(data, frequency, unit='ms')
 
     return data
 
 
-setattr(ccxt.bitfinex, '_fetch_single_candles', _bitfinex_single_candles)
+setattr(ccxt.bitfinex, '_request_single_candles', _bitfinex_request_candles)
+setattr(ccxt.bitfinex, '_parse_single_candles', _bitfinex_parse_candles)
+setattr(ccxt.bitfinex, '_candles_page_size', 1000)
 
 
 ###############################################################################
 # GDAX patching
 ###############################################################################
-def _gdax_single_candles(self, symbol, start_time, end_time, frequency,
-                         **kwargs):
-    """GDAX candles.
+def _gdax_request_candles(self, symbol, start_time, end_time, frequency):
+    """GDAX candles request.
     """
-    data = self.request(
+    return self.request(
         path='products/{}/candles'.format(symbol),
         params={
-            "granularity": self.describe()['timeframes'][frequency],
+            "granularity": candle_params(self).timeframes[frequency],
             "start": start_time.isoformat(),
             "end": end_time.isoformat(),
         })
 
+
+def _gdax_parse_candles(self, data, symbol, frequency, **kwargs):
+    """GDAX candles.
+    """
     if len(data) == 0:
         return data
 
     data = pd.DataFrame(data, columns=["start_time", "low", "high", "open",
                                        "close", "volume"])
 
-    data.loc[:, 'start_time'] = data['start_time'].apply(
-        lambda x: pd.Timestamp.utcfromtimestamp(x))
-    data = data.sort_values(['start_time'])
-    data['end_time'] = data['start_time'] + pd.DateOffset(
-        seconds=FREQUENCY_TO_SEC_DICT[frequency])
+    data = _set_candle_times(data.sort_values(['start_time']), frequency,
+                             unit='s')
 
     return data
 
 
-setattr(ccxt.gdax, '_fetch_single_candles', _gdax_single_candles)
+setattr(ccxt.gdax, '_request_single_candles', _gdax_request_candles)
+setattr(ccxt.gdax, '_parse_single_candles', _gdax_parse_candles)
+setattr(ccxt.gdax, '_candles_page_size', 300)
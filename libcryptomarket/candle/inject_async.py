@@ -0,0 +1,433 @@
+import asyncio
+import logging
+from time import perf_counter
+
+import pandas as pd
+import ccxt
+
+import libcryptomarket.exchange.async_support
+from libcryptomarket.candle import FREQUENCY_TO_SEC_DICT
+from libcryptomarket.candle.inject import (
+    _candle_windows, _candles_result, _closest_end_time, _cross_legs,
+    _drop_overlap, _invert_result, _latest_candles_panel, _naive_utc,
+    _resample_base_frequency, _resample_period, _resample_result,
+    _response_size, _windowed_pages, _write_cache_gap,
+    _write_resampled_candles)
+from libcryptomarket.candle.markets import get_markets_cache
+from libcryptomarket.candle.params import candle_params
+from libcryptomarket.candle.ratelimit import async_throttle
+from libcryptomarket.candle.retry import (
+    DEFAULT_RETRY_POLICY, IncompleteCandlesError, retry_delay)
+from libcryptomarket.candle.stats import emit
+from libcryptomarket.candle.transform import cross_candles
+
+
+async def _fetch_candles(self, symbol, start_time, end_time, frequency,
+                         cache=None, max_workers=None, base_frequency=None,
+                         return_partial=False, **kwargs):
+    r"""Return candles of a given period and frequency.
+
+    :param symbol: `str` symbol.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param cache: `CandleCache` candle cache. Default is None which always
+                  queries the exchange. Otherwise, only the ranges not
+                  covered by the cache are queried.
+    :param max_workers: `int` number of concurrent requests. Default is None
+                        which paginates serially. Otherwise, the period is
+                        split into windows of the exchange page size which
+                        are queried concurrently within the rate limit.
+    :param base_frequency: `str` finer frequency to query and resample the
+                           candles from. Default is None which resamples
+                           from the coarsest finer frequency fully covered
+                           by the cache, or supported by the exchange if the
+                           frequency is not.
+    :param return_partial: `bool` whether to return the candles queried
+                           before a page failed all its retries instead of
+                           raising its error. If True, a tuple of the
+                           candles and the start time to resume the query
+                           from, None if complete, is returned.
+    :param \**kwargs:
+        See below
+
+    :Keyword Arguments:
+        * *quote_currency* (``str``) --
+          Quote currency symbol, e.g. BTC. If it is the base currency of
+          the symbol, the prices are inverted.
+        * *retry* (``RetryPolicy``) --
+          Retry policy of the failed pages. Default is
+          `DEFAULT_RETRY_POLICY`.
+    """
+    await self.load_markets()
+    start_time, end_time = _naive_utc(start_time), _naive_utc(end_time)
+
+    if base_frequency is None:
+        base_frequency = _resample_base_frequency(
+            self, cache=cache, market_id=self.market_id(symbol),
+            start_time=start_time, end_time=end_time, frequency=frequency)
+
+    if base_frequency is not None and base_frequency != frequency:
+        start_time, end_time = _resample_period(
+            start_time, end_time, frequency)
+        quote_currency = kwargs.pop('quote_currency', None)
+        result = _resample_result(await self.fetch_candles(
+            symbol=symbol, start_time=start_time, end_time=end_time,
+            frequency=base_frequency, cache=cache, max_workers=max_workers,
+            base_frequency=base_frequency, return_partial=return_partial,
+            **kwargs), frequency, return_partial)
+        if cache is not None:
+            _write_resampled_candles(
+                self, cache, symbol=symbol, frequency=frequency,
+                result=result, start_time=start_time, end_time=end_time,
+                return_partial=return_partial)
+
+        return _invert_result(
+            result, return_partial,
+            invert=quote_currency == self.market(symbol)['base'])
+
+    quote_currency = kwargs.pop('quote_currency', None)
+    base_currency = self.market(symbol)['base']
+
+    # Get the exchange market id
+    symbol = self.market_id(symbol)
+
+    fetch_start_time = perf_counter()
+    resume_time = None
+    try:
+        if cache is not None:
+            all_data = await _fetch_cached_candles(
+                self, cache=cache, symbol=symbol, start_time=start_time,
+                end_time=end_time, frequency=frequency,
+                max_workers=max_workers, **kwargs)
+        else:
+            all_data = await _query_candles(
+                self, symbol=symbol, start_time=start_time,
+                end_time=end_time, frequency=frequency,
+                max_workers=max_workers, **kwargs)
+    except IncompleteCandlesError as e:
+        if not return_partial:
+            raise e.error from None
+
+        logging.warning('Returning partial candles of %s: %s', symbol, e)
+        all_data, resume_time = e.pages, e.resume_time
+
+    return _candles_result(
+        self, all_data, symbol=symbol,
+        invert=quote_currency is not None and quote_currency == base_currency,
+        resume_time=resume_time, return_partial=return_partial,
+        fetch_start_time=fetch_start_time)
+
+
+async def _query_candles(self, symbol, start_time, end_time, frequency,
+                         max_workers=None, **kwargs):
+    """Return the list of candle pages queried from the exchange.
+
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param max_workers: `int` number of concurrent requests. Default is None
+                        which paginates serially.
+    """
+    page_size = candle_params(self).page_size
+    if max_workers is None or page_size is None:
+        return await _paginate_candles(
+            self, symbol=symbol, start_time=start_time, end_time=end_time,
+            frequency=frequency, **kwargs)
+
+    semaphore = asyncio.Semaphore(max_workers)
+
+    async def fetch_window(window_start_time, window_end_time):
+        async with semaphore:
+            try:
+                all_data = await _paginate_candles(
+                    self, symbol=symbol, start_time=window_start_time,
+                    end_time=window_end_time, frequency=frequency, **kwargs)
+            except IncompleteCandlesError as e:
+                e.pages = [data[data['start_time'] < window_end_time]
+                           for data in e.pages]
+                raise
+
+        return [data[data['start_time'] < window_end_time]
+                for data in all_data]
+
+    windows = _candle_windows(
+        start_time, end_time, frequency, page_size)
+    results = await asyncio.gather(
+        *[fetch_window(*window) for window in windows],
+        return_exceptions=True)
+
+    return _windowed_pages(results)
+
+
+async def _paginate_candles(self, symbol, start_time, end_time, frequency,
+                            retry=None, **kwargs):
+    """Return the list of candle pages queried serially from the exchange.
+
+    Every request waits for a token of the exchange rate limiter, and the
+    transient errors are retried.
+
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param retry: `RetryPolicy` retry policy. Default is None which uses
+                  `DEFAULT_RETRY_POLICY`.
+    :raises IncompleteCandlesError: if a page failed all its retries, with
+                                    the pages queried before it.
+    """
+    all_data = []
+    last_start_time = None
+
+    period = pd.Timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency])
+    while start_time + period <= end_time:
+        try:
+            data = await _fetch_page(
+                self, symbol=symbol, start_time=start_time,
+                end_time=end_time, frequency=frequency, retry=retry,
+                **kwargs)
+        except Exception as e:
+            raise IncompleteCandlesError(
+                e, resume_time=pd.Timestamp(start_time),
+                pages=all_data) from e
+
+        if len(data) == 0:
+            break
+
+        data = _drop_overlap(data, last_start_time)
+        if len(data) == 0:
+            # No candle after the previous page
+            break
+
+        all_data.append(data)
+        last_start_time = data["start_time"].iloc[-1]
+
+        if data["end_time"].iloc[-1] > start_time:
+            start_time = data["end_time"].iloc[-1]
+        else:
+            break
+
+    return all_data
+
+
+async def _fetch_page(self, symbol, start_time, end_time, frequency,
+                      retry=None, **kwargs):
+    """Return a page of candles, retrying the transient errors.
+
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param retry: `RetryPolicy` retry policy. Default is None which uses
+                  `DEFAULT_RETRY_POLICY`.
+    """
+    retry = retry or DEFAULT_RETRY_POLICY
+    attempt = 0
+
+    while True:
+        await async_throttle(self)
+        try:
+            return await self._fetch_single_candles(
+                symbol=symbol, start_time=start_time, end_time=end_time,
+                frequency=frequency, **kwargs)
+        except Exception as e:
+            delay = retry_delay(self, e, attempt, retry)
+            if delay is None:
+                raise
+
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+async def _fetch_cached_candles(self, cache, symbol, start_time, end_time,
+                                frequency, max_workers=None, **kwargs):
+    """Return the list of candle pages served by the cache.
+
+    :param cache: `CandleCache` candle cache.
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param max_workers: `int` number of concurrent requests.
+    """
+    closed_end_time = _closest_end_time(frequency)
+    period = pd.Timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency])
+
+    for gap_start_time, gap_end_time in cache.missing(
+            self.id, symbol, frequency, start_time, end_time):
+        if gap_start_time + period > gap_end_time:
+            # Not queried as no candle fits in it, so not covered either
+            continue
+
+        try:
+            all_data = await _query_candles(
+                self, symbol=symbol, start_time=gap_start_time,
+                end_time=gap_end_time, frequency=frequency,
+                max_workers=max_workers, **kwargs)
+        except IncompleteCandlesError as e:
+            _write_cache_gap(
+                self, cache, symbol, frequency, e.pages, gap_start_time,
+                min(e.resume_time, closed_end_time))
+            data = cache.read(
+                self.id, symbol, frequency, start_time, e.resume_time)
+            e.pages = [data] if len(data) > 0 else []
+            raise
+
+        _write_cache_gap(
+            self, cache, symbol, frequency, all_data, gap_start_time,
+            min(gap_end_time, closed_end_time))
+
+    data = cache.read(self.id, symbol, frequency, start_time, end_time)
+    return [data] if len(data) > 0 else []
+
+
+async def _fetch_latest_candles(self, symbols, frequency, frequency_count,
+                                end_time=None, max_symbol_workers=None,
+                                return_errors=False, **kwargs):
+    r"""Return the latest candles based on the frequency and its count.
+
+    The symbols are queried concurrently under the exchange rate limiter.
+
+    :param symbols: `list` list of symbols, or `str` symbol name.
+    :param frequency: `str` frequency.
+    :param frequency_count: `int` number of candles.
+    :param end_time: `datetime` end time. Default is None which will use
+                     current time.
+    :param max_symbol_workers: `int` number of symbols queried concurrently.
+                               Default is None which queries all the symbols
+                               at once.
+    :param return_errors: `bool` whether to return the symbol errors instead
+                          of raising the first one. If True, a tuple of the
+                          candles of the succeeded symbols and a `dict` of
+                          the failed symbols to their exceptions is
+                          returned.
+    :param \**kwargs:
+        See below
+
+    :Keyword Arguments:
+        * *quote_currency* (``str``) --
+          Quote currency symbol, e.g. BTC.
+    """
+    if isinstance(symbols, str):
+        symbols = [symbols]
+
+    closest_end_time = _closest_end_time(frequency, end_time)
+    start_time = closest_end_time - pd.Timedelta(
+        seconds=FREQUENCY_TO_SEC_DICT[frequency] * frequency_count + 1)
+
+    # Load the markets once before querying the symbols concurrently
+    await self.load_markets()
+
+    semaphore = asyncio.Semaphore(max_symbol_workers or len(symbols))
+
+    async def fetch_symbol(symbol):
+        async with semaphore:
+            return await self.fetch_candles(
+                symbol=symbol,
+                start_time=start_time,
+                end_time=closest_end_time,
+                frequency=frequency,
+                **kwargs)
+
+    results = await asyncio.gather(
+        *[fetch_symbol(symbol) for symbol in symbols],
+        return_exceptions=return_errors)
+
+    return _latest_candles_panel(
+        symbols, results, closest_end_time, return_errors)
+
+
+async def _fetch_cross_candles(self, symbol, start_time, end_time, frequency,
+                               via=None, **kwargs):
+    r"""Return synthetic candles of a cross rate from its two legs.
+
+    The legs are queried concurrently. See the synchronous version for the
+    details.
+
+    :param symbol: `str` symbol of the cross rate, e.g. ETH/USDT.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :param via: `str` intermediate currency, e.g. BTC. Default is None which
+                finds one listed against both currencies of the symbol.
+    :param \**kwargs: Arguments of `fetch_candles` for both legs.
+    """
+    await self.load_markets()
+    legs = _cross_legs(self, symbol, via)
+
+    base_leg, quote_leg = await asyncio.gather(*[
+        self.fetch_candles(
+            symbol=leg_symbol, start_time=start_time, end_time=end_time,
+            frequency=frequency, quote_currency=quote_currency, **kwargs)
+        for leg_symbol, quote_currency in legs])
+
+    return cross_candles(base_leg, quote_leg)
+
+
+async def _load_markets(self, reload=False):
+    """Load the markets of the exchange, shared by all its instances.
+
+    :param reload: `bool` whether to query the markets from the exchange
+                   even if loaded.
+    """
+    if not reload and not self.markets:
+        cached = get_markets_cache().get(self.id)
+        if cached is not None:
+            return self.set_markets(*cached)
+
+    loaded = bool(self.markets) and not reload
+    markets = await _exchange_load_markets(self, reload=reload)
+    if not loaded:
+        get_markets_cache().put(self.id, self.markets,
+                                getattr(self, 'currencies', None))
+
+    return markets
+
+
+async def _fetch_single_candles(self, symbol, start_time, end_time, frequency,
+                                **kwargs):
+    """Return a single page of candles queried from the exchange.
+
+    The request and parse times are emitted to the candle stats.
+    """
+    request_start_time = perf_counter()
+    data = await self._request_single_candles(
+        symbol=symbol, start_time=start_time, end_time=end_time,
+        frequency=frequency)
+    emit('request', self.id, symbol=symbol, size=_response_size(self),
+         seconds=perf_counter() - request_start_time)
+
+    parse_start_time = perf_counter()
+    data = self._parse_single_candles(
+        data, symbol=symbol, frequency=frequency, **kwargs)
+    emit('parse', self.id, symbol=symbol, rows=len(data),
+         seconds=perf_counter() - parse_start_time)
+    return data
+
+
+###############################################################################
+# Patch
+###############################################################################
+Exchange = libcryptomarket.exchange.async_support.Exchange
+
+# Patch the base class once, instead of every exchange class
+setattr(Exchange, 'fetch_candles', _fetch_candles)
+setattr(Exchange, 'fetch_latest_candles', _fetch_latest_candles)
+setattr(Exchange, 'fetch_cross_candles', _fetch_cross_candles)
+setattr(Exchange, '_fetch_single_candles', _fetch_single_candles)
+setattr(Exchange, '_candles_page_size', None)
+setattr(Exchange, '_candles_base_volume', 'volume')
+
+# Share the markets among the instances of every exchange, synchronous or
+# asynchronous
+_exchange_load_markets = Exchange.load_markets
+setattr(Exchange, 'load_markets', _load_markets)
+
+# The requests and parsers of the synchronous exchanges are shared, as the
+# requests return awaitables on the asyncio exchanges
+for exchange in ['poloniex', 'bitfinex', 'gdax']:
+    for attr in ['_request_single_candles', '_parse_single_candles',
+                 '_candles_page_size', '_candles_base_volume']:
+        setattr(getattr(libcryptomarket.exchange.async_support, exchange),
+                attr, getattr(getattr(ccxt, exchange), attr))
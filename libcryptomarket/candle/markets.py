@@ -0,0 +1,134 @@
+import json
+import logging
+import os
+import threading
+from time import time
+
+
+DEFAULT_TTL = 86400
+
+DEFAULT_PATH = os.path.join(os.path.expanduser('~'), '.libcryptomarket',
+                            'markets')
+
+
+class MarketsCache(object):
+    """Markets of the exchanges shared by all their instances.
+
+    The markets loaded by an instance are served to the other instances of
+    the exchange until they expire, so that only the first instance queries
+    the markets from the exchange. With a path, the markets are also kept on
+    disk and shared across processes.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL):
+        """Constructor.
+
+        :param path: `str` directory of the markets files. Default is None
+                     which keeps the markets in memory only.
+        :param ttl: `float` number of seconds the markets are served before
+                    they are queried from the exchange again.
+        """
+        self.path = path
+        self.ttl = ttl
+        self._markets = {}
+        self._lock = threading.Lock()
+
+    def _file_path(self, exchange_id):
+        """Return the path of the markets file of the exchange.
+        """
+        return os.path.join(self.path, exchange_id + '.json')
+
+    def get(self, exchange_id):
+        """Return the markets of the exchange, or None if missing or expired.
+
+        :param exchange_id: `str` exchange id.
+        :return: `tuple` `dict` of symbol to market and `dict` of code to
+                 currency, or None.
+        """
+        entry = self._markets.get(exchange_id)
+        if entry is None and self.path is not None:
+            entry = self._read(exchange_id)
+            if entry is not None:
+                self._markets[exchange_id] = entry
+
+        if entry is None or time() - entry[0] > self.ttl:
+            return None
+
+        return entry[1], entry[2]
+
+    def put(self, exchange_id, markets, currencies=None):
+        """Keep the markets loaded from the exchange.
+
+        :param exchange_id: `str` exchange id.
+        :param markets: `dict` symbol to market.
+        :param currencies: `dict` code to currency.
+        """
+        entry = (time(), markets, currencies)
+        self._markets[exchange_id] = entry
+        if self.path is None:
+            return
+
+        path = self._file_path(exchange_id)
+        with self._lock:
+            try:
+                os.makedirs(self.path, exist_ok=True)
+                with open(path + '.tmp', 'w') as f:
+                    json.dump({'time': entry[0], 'markets': markets,
+                               'currencies': currencies}, f, default=str)
+                os.replace(path + '.tmp', path)
+            except (OSError, TypeError, ValueError) as e:
+                logging.warning('Failed to write the markets of %s: %s',
+                                exchange_id, e)
+
+    def clear(self):
+        """Remove all the markets, in memory and on disk.
+        """
+        with self._lock:
+            self._markets.clear()
+            if self.path is None or not os.path.isdir(self.path):
+                return
+
+            for name in os.listdir(self.path):
+                if name.endswith('.json'):
+                    os.remove(os.path.join(self.path, name))
+
+    def _read(self, exchange_id):
+        """Return the update time, markets and currencies of the exchange on
+        disk.
+        """
+        path = self._file_path(exchange_id)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            with open(path) as f:
+                content = json.load(f)
+            return (content['time'], content['markets'],
+                    content.get('currencies'))
+        except (OSError, KeyError, ValueError) as e:
+            logging.warning('Failed to read the markets of %s: %s',
+                            exchange_id, e)
+            return None
+
+
+_MARKETS_CACHE = MarketsCache()
+
+
+def get_markets_cache():
+    """Return the process-wide markets cache.
+    """
+    return _MARKETS_CACHE
+
+
+def set_markets_cache(path=None, ttl=DEFAULT_TTL):
+    """Replace the process-wide markets cache.
+
+    :param path: `str` directory of the markets files, e.g. `DEFAULT_PATH`.
+                 Default is None which keeps the markets in memory only.
+    :param ttl: `float` number of seconds the markets are served before they
+                are queried from the exchange again.
+    :return: `MarketsCache` markets cache.
+    """
+    global _MARKETS_CACHE
+    _MARKETS_CACHE = MarketsCache(path=path, ttl=ttl)
+    return _MARKETS_CACHE
@@ -0,0 +1,33 @@
+from collections import namedtuple
+
+
+CandleParams = namedtuple(
+    'CandleParams', ['rate_limit', 'timeframes', 'page_size'])
+
+_CANDLE_PARAMS = {}
+
+
+def candle_params(exchange):
+    """Return the candle parameters of the exchange.
+
+    The parameters are resolved from the exchange configuration instead of
+    merging its description, and cached per class. The cached entry is
+    replaced once the rate limit, timeframes or page size of the exchange
+    differ from it.
+
+    :param exchange: `ccxt.Exchange` exchange instance.
+    :return: `CandleParams` rate limit in milliseconds, timeframe map and
+             maximum number of candles in a page.
+    """
+    params = _CANDLE_PARAMS.get(type(exchange))
+    if (params is None or
+            params.rate_limit != exchange.rateLimit or
+            params.page_size != exchange._candles_page_size or
+            params.timeframes != (exchange.timeframes or {})):
+        params = CandleParams(
+            rate_limit=exchange.rateLimit,
+            timeframes=dict(exchange.timeframes or {}),
+            page_size=exchange._candles_page_size)
+        _CANDLE_PARAMS[type(exchange)] = params
+
+    return params
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import multiprocessing
+import threading
+from time import monotonic, sleep
+
+from libcryptomarket.candle.params import candle_params
+from libcryptomarket.candle.stats import emit
+
+
+DEFAULT_CAPACITY = 5
+
+_RATE_LIMITERS = {}
+# Exchange rate limits the rate limiters are derived from
+_RATE_LIMITS = {}
+_RATE_LIMITERS_LOCK = threading.Lock()
+
+
+class TokenBucket(object):
+    """Thread-safe token bucket.
+
+    The bucket starts full so that bursts up to its capacity are served
+    without waiting. Afterwards, tokens are refilled at a constant rate and
+    callers are served in the order they ask for tokens.
+    """
+
+    def __init__(self, rate, capacity=DEFAULT_CAPACITY):
+        """Constructor.
+
+        :param rate: `float` number of tokens refilled per second.
+        :param capacity: `int` maximum number of tokens.
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.acquired_count = 0
+        self.waited_time = 0.0
+        self._tokens = self.capacity
+        self._update_time = monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Take tokens from the bucket, waiting until they are refilled.
+
+        :param tokens: `int` number of tokens.
+        :return: `float` waited time in seconds.
+        """
+        with self._lock:
+            wait = self._reserve(tokens)
+
+        if wait > 0:
+            sleep(wait)
+
+        return wait
+
+    async def async_acquire(self, tokens=1):
+        """Take tokens from the bucket without blocking the event loop.
+
+        :param tokens: `int` number of tokens.
+        :return: `float` waited time in seconds.
+        """
+        with self._lock:
+            wait = self._reserve(tokens)
+
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        return wait
+
+    def defer(self, seconds):
+        """Hold the tokens back for a period, e.g. when the exchange asks to
+        slow down.
+
+        :param seconds: `float` time until the next token is available.
+        """
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+    def _refill(self):
+        """Refill the tokens since the last update.
+
+        The caller must hold the lock.
+        """
+        now = monotonic()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._update_time) * self.rate)
+        self._update_time = now
+
+    def _reserve(self, tokens):
+        """Take tokens in advance and return the time to wait for them.
+
+        The caller must hold the lock.
+        """
+        self._refill()
+        self._tokens -= tokens
+
+        wait = max(0.0, -self._tokens / self.rate)
+        self.acquired_count += tokens
+        self.waited_time += wait
+        return wait
+
+
+class SharedTokenBucket(TokenBucket):
+    """Token bucket shared by processes.
+
+    The tokens are kept in shared memory, so that the requests of all the
+    processes together never exceed the rate. The bucket must be created
+    before the processes and handed to them at startup, e.g. through the
+    initializer of a process pool.
+    """
+
+    def __init__(self, rate, capacity=DEFAULT_CAPACITY):
+        """Constructor.
+
+        :param rate: `float` number of tokens refilled per second.
+        :param capacity: `int` maximum number of tokens.
+        """
+        self._state = multiprocessing.Array('d', 2)
+        super(SharedTokenBucket, self).__init__(rate, capacity)
+        self._lock = self._state.get_lock()
+
+    @property
+    def _tokens(self):
+        return self._state[0]
+
+    @_tokens.setter
+    def _tokens(self, value):
+        self._state[0] = value
+
+    @property
+    def _update_time(self):
+        return self._state[1]
+
+    @_update_time.setter
+    def _update_time(self, value):
+        self._state[1] = value
+
+
+def get_rate_limiter(exchange):
+    """Return the process-wide rate limiter of the exchange.
+
+    The limiter is shared by all the instances of the same exchange id, and
+    its rate is derived from the exchange rate limit. The rate follows the
+    rate limit when it changes, unless the limiter has been replaced.
+
+    :param exchange: `ccxt.Exchange` exchange instance.
+    """
+    rate_limit = candle_params(exchange).rate_limit
+    rate_limiter = _RATE_LIMITERS.get(exchange.id)
+    if (rate_limiter is not None and
+            _RATE_LIMITS.get(exchange.id, rate_limit) == rate_limit):
+        return rate_limiter
+
+    with _RATE_LIMITERS_LOCK:
+        rate_limiter = _RATE_LIMITERS.get(exchange.id)
+        if rate_limiter is None:
+            rate_limiter = TokenBucket(rate=1000.0 / rate_limit)
+            _RATE_LIMITERS[exchange.id] = rate_limiter
+        elif exchange.id in _RATE_LIMITS:
+            rate_limiter.rate = 1000.0 / rate_limit
+        else:
+            return rate_limiter
+
+        _RATE_LIMITS[exchange.id] = rate_limit
+        return rate_limiter
+
+
+def set_rate_limiter(exchange_id, rate, capacity=DEFAULT_CAPACITY):
+    """Replace the process-wide rate limiter of the exchange.
+
+    :param exchange_id: `str` exchange id, e.g. poloniex.
+    :param rate: `float` number of requests per second.
+    :param capacity: `int` maximum number of requests in a burst.
+    """
+    return install_rate_limiter(
+        exchange_id, TokenBucket(rate=rate, capacity=capacity))
+
+
+def install_rate_limiter(exchange_id, rate_limiter):
+    """Replace the process-wide rate limiter of the exchange by a given one,
+    e.g. a `SharedTokenBucket` created by the parent process.
+
+    :param exchange_id: `str` exchange id, e.g. poloniex.
+    :param rate_limiter: `TokenBucket` rate limiter.
+    """
+    with _RATE_LIMITERS_LOCK:
+        _RATE_LIMITERS[exchange_id] = rate_limiter
+        _RATE_LIMITS.pop(exchange_id, None)
+
+        return rate_limiter
+
+
+def throttle(exchange):
+    """Wait for a request token of the exchange.
+
+    :param exchange: `ccxt.Exchange` exchange instance.
+    :return: `float` waited time in seconds.
+    """
+    wait = get_rate_limiter(exchange).acquire()
+    logging.debug('Waited %.3fs for a request token of %s',
+                  wait, exchange.id)
+    emit('wait', exchange.id, seconds=wait)
+    return wait
+
+
+async def async_throttle(exchange):
+    """Wait for a request token of the exchange in the event loop.
+
+    :param exchange: `ccxt.Exchange` exchange instance.
+    :return: `float` waited time in seconds.
+    """
+    wait = await get_rate_limiter(exchange).async_acquire()
+    logging.debug('Waited %.3fs for a request token of %s',
+                  wait, exchange.id)
+    emit('wait', exchange.id, seconds=wait)
+    return wait
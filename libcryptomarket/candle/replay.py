@@ -0,0 +1,151 @@
+import asyncio
+import json
+import threading
+from time import sleep
+
+import pandas as pd
+
+from libcryptomarket.candle.session import _is_async
+
+
+def _request_key(symbol, start_time, end_time, frequency):
+    """Return the key of a candles request.
+
+    :param symbol: `str` exchange market id.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    """
+    return '{}|{}|{}|{}'.format(
+        symbol, frequency,
+        pd.Timestamp(start_time).value // 1000000,
+        pd.Timestamp(end_time).value // 1000000)
+
+
+class CandleRecorder(object):
+    """Recorder of the raw candle responses of an exchange.
+
+    The raw responses are recorded before they are parsed, together with the
+    markets of the exchange, so that they can be replayed offline by
+    `CandleReplay`.
+    """
+
+    def __init__(self, exchange):
+        """Constructor.
+
+        The recorder is installed on the exchange instance.
+
+        :param exchange: `ccxt.Exchange` exchange instance.
+        """
+        self.exchange = exchange
+        self.responses = {}
+        self._lock = threading.Lock()
+        self._request = exchange._request_single_candles
+
+        if _is_async(exchange):
+            async def request(symbol, start_time, end_time, frequency):
+                data = await self._request(
+                    symbol=symbol, start_time=start_time, end_time=end_time,
+                    frequency=frequency)
+                self._add(symbol, start_time, end_time, frequency, data)
+                return data
+        else:
+            def request(symbol, start_time, end_time, frequency):
+                data = self._request(
+                    symbol=symbol, start_time=start_time, end_time=end_time,
+                    frequency=frequency)
+                self._add(symbol, start_time, end_time, frequency, data)
+                return data
+
+        exchange._request_single_candles = request
+
+    def _add(self, symbol, start_time, end_time, frequency, data):
+        with self._lock:
+            self.responses[_request_key(
+                symbol, start_time, end_time, frequency)] = data
+
+    def save(self, path):
+        """Save the recording.
+
+        :param path: `str` output path of the recording in json.
+        """
+        with open(path, 'w') as f:
+            json.dump({
+                'exchange': self.exchange.id,
+                'markets': self.exchange.markets,
+                'responses': self.responses,
+            }, f)
+
+
+class CandleReplay(object):
+    """Offline stand-in of the candle requests of an exchange.
+
+    The recorded responses are served instead of querying the exchange,
+    after waiting for the configured latency.
+    """
+
+    def __init__(self, responses, markets=None, latency=0.0):
+        """Constructor.
+
+        :param responses: `dict` request keys to raw responses, or a
+                          function of the symbol, start time, end time and
+                          frequency returning the raw response.
+        :param markets: `dict` markets of the exchange. Default is None
+                        which loads the markets from the exchange.
+        :param latency: `float` latency of every response in seconds.
+        """
+        self.responses = responses
+        self.markets = markets
+        self.latency = latency
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, latency=0.0):
+        """Load a recording saved by `CandleRecorder`.
+
+        :param path: `str` path of the recording.
+        :param latency: `float` latency of every response in seconds.
+        """
+        with open(path) as f:
+            recording = json.load(f)
+
+        return cls(responses=recording['responses'],
+                   markets=recording['markets'],
+                   latency=latency)
+
+    def install(self, exchange):
+        """Serve the candle requests of the exchange instance.
+
+        :param exchange: `ccxt.Exchange` exchange instance.
+        :return: `ccxt.Exchange` the exchange instance.
+        """
+        if self.markets is not None:
+            exchange.set_markets(self.markets)
+
+        if _is_async(exchange):
+            async def request(symbol, start_time, end_time, frequency):
+                if self.latency > 0:
+                    await asyncio.sleep(self.latency)
+                return self._response(symbol, start_time, end_time, frequency)
+        else:
+            def request(symbol, start_time, end_time, frequency):
+                if self.latency > 0:
+                    sleep(self.latency)
+                return self._response(symbol, start_time, end_time, frequency)
+
+        exchange._request_single_candles = request
+        return exchange
+
+    def _response(self, symbol, start_time, end_time, frequency):
+        with self._lock:
+            self.request_count += 1
+
+        if callable(self.responses):
+            return self.responses(symbol, start_time, end_time, frequency)
+
+        key = _request_key(symbol, start_time, end_time, frequency)
+        if key not in self.responses:
+            raise KeyError("Request {} is not recorded".format(key))
+
+        return self.responses[key]
@@ -0,0 +1,104 @@
+import logging
+import random
+from collections import namedtuple
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import ccxt
+
+from libcryptomarket.candle.ratelimit import get_rate_limiter
+from libcryptomarket.candle.stats import emit
+
+
+RetryPolicy = namedtuple(
+    'RetryPolicy', ['max_retries', 'backoff', 'max_backoff'])
+
+# Up to 3 retries after about 1, 2 and 4 seconds
+DEFAULT_RETRY_POLICY = RetryPolicy(
+    max_retries=3, backoff=1.0, max_backoff=60.0)
+
+NO_RETRY_POLICY = RetryPolicy(max_retries=0, backoff=0.0, max_backoff=0.0)
+
+
+class IncompleteCandlesError(Exception):
+    """Error raised when a page of candles failed after all its retries.
+
+    The candles queried before the failed page are kept, so that the query
+    can resume from the failed page.
+    """
+
+    def __init__(self, error, resume_time, pages=None):
+        """Constructor.
+
+        :param error: `Exception` error of the failed page.
+        :param resume_time: `datetime` start time of the failed page.
+        :param pages: `list` list of the candle pages queried before the
+                      failed page.
+        """
+        super(IncompleteCandlesError, self).__init__(
+            "Candles are incomplete from {}: {}".format(resume_time, error))
+        self.error = error
+        self.resume_time = resume_time
+        self.pages = pages if pages is not None else []
+
+
+def retry_after(exchange):
+    """Return the delay asked by the Retry-After header of the last response.
+
+    :param exchange: `ccxt.Exchange` exchange instance.
+    :return: `float` delay in seconds, or None if not asked.
+    """
+    headers = getattr(exchange, 'last_response_headers', None)
+    value = headers.get('Retry-After') if headers else None
+    if value is None:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_time = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+    return max(0.0, (retry_time - datetime.now(timezone.utc)).total_seconds())
+
+
+def retry_delay(exchange, error, attempt, policy):
+    """Return the time to wait before retrying a failed request.
+
+    Only the network errors, including the rate limit errors, are retried.
+    The delay grows exponentially with a random jitter, and is at least the
+    delay asked by the exchange in Retry-After. On rate limit errors, the
+    rate limiter of the exchange is held back instead, so that the
+    concurrent requests of the exchange slow down as well.
+
+    :param exchange: `ccxt.Exchange` exchange instance.
+    :param error: `Exception` error of the request.
+    :param attempt: `int` number of retries done so far.
+    :param policy: `RetryPolicy` retry policy.
+    :return: `float` time to wait in seconds, or None if the request must
+             not be retried.
+    """
+    if (attempt >= policy.max_retries or
+            not isinstance(error, ccxt.NetworkError)):
+        return None
+
+    delay = min(policy.max_backoff, policy.backoff * 2 ** attempt)
+    delay = delay / 2 + random.uniform(0, delay / 2)
+
+    asked_delay = retry_after(exchange)
+    if asked_delay is not None:
+        delay = max(delay, asked_delay)
+
+    logging.warning('Retrying request of %s in %.3fs after error: %s',
+                    exchange.id, delay, error)
+    emit('retry', exchange.id, seconds=delay)
+
+    if isinstance(error, ccxt.DDoSProtection) or asked_delay is not None:
+        get_rate_limiter(exchange).defer(delay)
+        return 0.0
+
+    return delay
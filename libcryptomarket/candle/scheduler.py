@@ -0,0 +1,310 @@
+import heapq
+import logging
+import multiprocessing
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+from queue import Queue
+from time import monotonic, perf_counter
+
+import libcryptomarket
+from libcryptomarket.candle.inject import _closest_end_time
+from libcryptomarket.candle.params import candle_params
+from libcryptomarket.candle.ratelimit import (
+    SharedTokenBucket, install_rate_limiter)
+from libcryptomarket.candle.stats import get_stats
+
+
+CandleJob = namedtuple('CandleJob', ['exchange', 'symbol', 'frequency'])
+
+REPORT_COUNTERS = ['jobs', 'errors', 'requests', 'rows', 'bytes', 'seconds']
+
+_WORKER = {}
+
+
+def candle_jobs(exchanges, symbols, frequencies):
+    """Return the jobs of every symbol and frequency on every exchange.
+
+    :param exchanges: `list` list of exchange ids.
+    :param symbols: `list` list of symbols.
+    :param frequencies: `list` list of frequencies.
+    :return: `list` list of `CandleJob`.
+    """
+    return [CandleJob(exchange=exchange, symbol=symbol, frequency=frequency)
+            for exchange in exchanges
+            for symbol in symbols
+            for frequency in frequencies]
+
+
+def _init_worker(configs, markets, rate_limiters, cache):
+    """Create the exchange instances of a worker process.
+
+    :param configs: `dict` exchange id to the config of its instances.
+    :param markets: `dict` exchange id to `tuple` of its markets and
+                    currencies, loaded by the parent process.
+    :param rate_limiters: `dict` exchange id to `SharedTokenBucket`.
+    :param cache: `CandleCache` or `CandleStore` of the candles.
+    """
+    for exchange_id, rate_limiter in rate_limiters.items():
+        install_rate_limiter(exchange_id, rate_limiter)
+
+    _WORKER['exchanges'] = {}
+    for exchange_id, config in configs.items():
+        exchange = getattr(libcryptomarket, exchange_id)(config or {})
+        exchange.set_markets(*markets[exchange_id])
+        _WORKER['exchanges'][exchange_id] = exchange
+
+    _WORKER['cache'] = cache
+
+
+def _run_job(job, start_time, end_time):
+    """Fetch the candles of a job into the cache, in a worker process.
+
+    :return: `tuple` job and `dict` of its counters.
+    """
+    exchange = _WORKER['exchanges'][job.exchange]
+    cache = _WORKER['cache']
+
+    before = get_stats().snapshot().get(job.exchange, {})
+    start = perf_counter()
+    try:
+        rows = len(exchange.fetch_candles(
+            symbol=job.symbol, start_time=start_time, end_time=end_time,
+            frequency=job.frequency, cache=cache))
+    except ValueError:
+        # No candle within the period, which is still covered by the cache
+        # if the exchange returned no candle for it
+        if cache.missing(job.exchange, exchange.market_id(job.symbol),
+                         job.frequency, start_time, end_time):
+            raise
+        rows = 0
+
+    after = get_stats().snapshot().get(job.exchange, {})
+    return job, {
+        'rows': rows,
+        'requests': after.get('requests', 0) - before.get('requests', 0),
+        'bytes': after.get('bytes', 0) - before.get('bytes', 0),
+        'seconds': perf_counter() - start,
+    }
+
+
+class CandleScheduler(object):
+    """Scheduler keeping the candles of many series current in a cache.
+
+    Every job, i.e. a symbol and frequency on an exchange, is queued by its
+    staleness, the time between its first candle missing from the cache and
+    its latest closed candle. The most stale job is fetched first, one
+    window at a time, and queued again with its new staleness, so that the
+    series of a universe progress together.
+
+    The windows are fetched by a pool of processes, so the parsing and the
+    serialization of the candles are spread across cores. The requests of an
+    exchange from all the processes share a rate limiter in shared memory,
+    so its rate budget is never exceeded.
+    """
+
+    def __init__(self, exchanges, jobs, cache, start_time, budgets=None,
+                 processes=None, window=timedelta(days=30),
+                 report_interval=10.0):
+        """Constructor.
+
+        :param exchanges: `dict` exchange id to the config of its instances,
+                          e.g. {'poloniex': {}}.
+        :param jobs: `list` list of `CandleJob`.
+        :param cache: `CandleCache` or `CandleStore` of the candles.
+        :param start_time: `datetime` start time of the series.
+        :param budgets: `dict` exchange id to its number of requests per
+                        second. Default is None which uses the exchange rate
+                        limit.
+        :param processes: `int` number of worker processes. Default is None
+                          which uses the number of cores.
+        :param window: `timedelta` maximum period of a fetch.
+        :param report_interval: `float` number of seconds between the
+                                progress reports.
+        """
+        self.configs = dict(exchanges)
+        self.jobs = list(jobs)
+        self.cache = cache
+        self.start_time = start_time
+        self.processes = processes or multiprocessing.cpu_count()
+        self.window = window
+        self.report_interval = report_interval
+
+        self.exchanges = dict(
+            (exchange_id, getattr(libcryptomarket, exchange_id)(config or {}))
+            for exchange_id, config in self.configs.items())
+
+        budgets = budgets or {}
+        self.budgets = dict(
+            (exchange_id, float(budgets.get(
+                exchange_id,
+                1000.0 / candle_params(exchange).rate_limit)))
+            for exchange_id, exchange in self.exchanges.items())
+
+        self._counters = defaultdict(lambda: dict.fromkeys(
+            REPORT_COUNTERS, 0))
+        self._start = None
+        self._report_time = None
+
+    def missing(self, job):
+        """Return the first range of the job missing from the cache.
+
+        :param job: `CandleJob` job.
+        :return: `tuple` start and end times of the range, or None if the
+                 job is up to date.
+        """
+        exchange = self.exchanges[job.exchange]
+        exchange.load_markets()
+        gaps = self.cache.missing(
+            job.exchange, exchange.market_id(job.symbol), job.frequency,
+            self.start_time, _closest_end_time(job.frequency))
+        return gaps[0] if gaps else None
+
+    def staleness(self, job):
+        """Return the staleness of the job.
+
+        :param job: `CandleJob` job.
+        :return: `float` number of seconds between the first candle missing
+                 from the cache and the latest closed candle.
+        """
+        gap = self.missing(job)
+        if gap is None:
+            return 0.0
+
+        return (_closest_end_time(job.frequency) - gap[0]).total_seconds()
+
+    def run(self):
+        """Fetch the candles of all the jobs until they are up to date.
+
+        :return: `dict` failed jobs to their exceptions.
+        """
+        for exchange in self.exchanges.values():
+            exchange.load_markets()
+
+        # Without bursts, the budgets hold over any period
+        rate_limiters = dict(
+            (exchange_id, SharedTokenBucket(rate=budget, capacity=1))
+            for exchange_id, budget in self.budgets.items())
+        markets = dict(
+            (exchange_id, (exchange.markets, exchange.currencies))
+            for exchange_id, exchange in self.exchanges.items())
+
+        queue = []
+        for i, job in enumerate(self.jobs):
+            staleness = self.staleness(job)
+            if staleness > 0:
+                heapq.heappush(queue, (-staleness, i, job))
+
+        logging.info('%d of %d jobs are stale', len(queue), len(self.jobs))
+
+        self._start = self._report_time = monotonic()
+        results = Queue()
+        gap_starts = {}
+        errors = {}
+        running = 0
+        sequence = len(self.jobs)
+
+        pool = multiprocessing.Pool(
+            processes=self.processes, initializer=_init_worker,
+            initargs=(self.configs, markets, rate_limiters, self.cache))
+        try:
+            while queue or running > 0:
+                while queue and running < self.processes:
+                    _, _, job = heapq.heappop(queue)
+                    gap = self.missing(job)
+                    if gap is None:
+                        continue
+
+                    gap_start, gap_end = gap
+                    gap_starts[job] = gap_start
+                    pool.apply_async(
+                        _run_job,
+                        (job, gap_start, min(gap_start + self.window,
+                                             gap_end)),
+                        callback=results.put,
+                        error_callback=lambda e, job=job: results.put(
+                            (job, e)))
+                    running += 1
+
+                job, result = results.get()
+                running -= 1
+                counters = self._counters[job.exchange]
+                counters['jobs'] += 1
+
+                if isinstance(result, Exception):
+                    logging.warning('Failed job %s: %s', job, result)
+                    counters['errors'] += 1
+                    errors[job] = result
+                    continue
+
+                for name in ['requests', 'rows', 'bytes', 'seconds']:
+                    counters[name] += result[name]
+
+                gap = self.missing(job)
+                if gap is None:
+                    logging.debug('Completed %s', job)
+                elif gap[0] <= gap_starts[job]:
+                    logging.warning('No progress on job %s from %s',
+                                    job, gap[0])
+                else:
+                    staleness = (_closest_end_time(job.frequency) -
+                                 gap[0]).total_seconds()
+                    heapq.heappush(queue, (-staleness, sequence, job))
+                    sequence += 1
+
+                self._log_progress(len(queue), running)
+        finally:
+            pool.terminate()
+            pool.join()
+
+        logging.info('Completed the jobs in %.3fs\n%s',
+                     monotonic() - self._start, self.summary())
+        return errors
+
+    def report(self):
+        """Return the counters of the fetched windows.
+
+        :return: `dict` exchange id to `dict` of counters, with the request
+                 and row throughputs per second since the start of the run.
+        """
+        elapsed = monotonic() - self._start if self._start else 0.0
+        report = {}
+        for exchange_id, counters in self._counters.items():
+            counters = dict(counters)
+            counters['requests_per_second'] = (
+                counters['requests'] / elapsed if elapsed > 0 else 0.0)
+            counters['rows_per_second'] = (
+                counters['rows'] / elapsed if elapsed > 0 else 0.0)
+            counters['budget'] = self.budgets[exchange_id]
+            report[exchange_id] = counters
+
+        return report
+
+    def summary(self):
+        """Return the summary of the report, a line per exchange.
+        """
+        return '\n'.join(
+            '{}: {} jobs, {} errors, {} rows, {} requests, {:.2f} requests/s '
+            'of {:.2f}/s, {:.0f} rows/s'.format(
+                exchange_id, counters['jobs'], counters['errors'],
+                counters['rows'], counters['requests'],
+                counters['requests_per_second'], counters['budget'],
+                counters['rows_per_second'])
+            for exchange_id, counters in sorted(self.report().items()))
+
+    def _log_progress(self, queued, running):
+        """Log the progress at most once per report interval.
+        """
+        now = monotonic()
+        if now - self._report_time < self.report_interval:
+            return
+
+        self._report_time = now
+        report = self.report()
+        logging.info(
+            '%d jobs done, %d running, %d queued, %.0f rows/s, '
+            '%.2f requests/s',
+            sum(counters['jobs'] for counters in report.values()),
+            running, queued,
+            sum(counters['rows_per_second'] for counters in report.values()),
+            sum(counters['requests_per_second']
+                for counters in report.values()))
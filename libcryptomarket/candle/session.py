@@ -0,0 +1,91 @@
+import asyncio
+import threading
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+
+DEFAULT_POOL_SIZE = 32
+
+_SESSIONS = {}
+_SESSIONS_LOCK = threading.Lock()
+
+
+def _is_async(exchange):
+    """Return whether the exchange is an asyncio exchange.
+    """
+    return asyncio.iscoroutinefunction(exchange.load_markets)
+
+
+class SharedSession(Session):
+    """Keep-alive HTTP session shared by the instances of an exchange.
+
+    The connections are kept open across the requests of all the instances,
+    so that only the first request to a host pays for the TCP and TLS
+    handshakes. The exchange instances close their session when they are
+    deleted, so the shared session is only closed by `close_sessions`.
+    """
+
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE):
+        """Constructor.
+
+        :param pool_size: `int` maximum number of connections kept open per
+                          host, which should not be less than the number of
+                          concurrent requests.
+        """
+        super(SharedSession, self).__init__()
+        adapter = HTTPAdapter(pool_connections=pool_size,
+                              pool_maxsize=pool_size)
+        self.mount('https://', adapter)
+        self.mount('http://', adapter)
+        self.headers['Accept-Encoding'] = 'gzip, deflate'
+
+    def close(self):
+        """Keep the connections open for the other exchange instances.
+        """
+        pass
+
+
+def get_session(exchange_id):
+    """Return the process-wide session of the exchange.
+
+    :param exchange_id: `str` exchange id, e.g. poloniex.
+    """
+    session = _SESSIONS.get(exchange_id)
+    if session is not None:
+        return session
+
+    with _SESSIONS_LOCK:
+        if exchange_id not in _SESSIONS:
+            _SESSIONS[exchange_id] = SharedSession()
+
+        return _SESSIONS[exchange_id]
+
+
+def close_sessions():
+    """Close the connections of all the shared sessions.
+    """
+    with _SESSIONS_LOCK:
+        for session in _SESSIONS.values():
+            Session.close(session)
+
+        _SESSIONS.clear()
+
+
+def _get_session(self):
+    """Return the session of the exchange instance.
+
+    The instances without a session of their own share the session of their
+    exchange. The asyncio exchanges keep their own aiohttp session.
+    """
+    session = self.__dict__.get('_session')
+    if session is None and not _is_async(self):
+        session = get_session(self.id)
+
+    return session
+
+
+def _set_session(self, session):
+    """Set the session of the exchange instance, e.g. from its config.
+    """
+    self.__dict__['_session'] = session
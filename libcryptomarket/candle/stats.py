@@ -0,0 +1,128 @@
+import threading
+from collections import defaultdict
+
+COUNTERS = ['requests', 'rows', 'bytes', 'wait_time', 'request_time',
+            'parse_time', 'concat_time', 'fetches', 'fetch_time', 'retries',
+            'retry_time']
+
+_HOOKS = []
+_HOOKS_LOCK = threading.Lock()
+
+
+class CandleStats(object):
+    """Thread-safe counters of the candle fetch path, per exchange.
+
+    The counters are fed by the events of the fetch path:
+
+    * *wait* -- a request waited for a rate limit token.
+    * *request* -- a page was requested from the exchange.
+    * *retry* -- a failed request is retried after a delay.
+    * *parse* -- a page was parsed into candles.
+    * *concat* -- the pages of a fetch were concatenated.
+    * *fetch* -- a fetch of candles completed.
+    """
+
+    def __init__(self):
+        """Constructor.
+        """
+        self._counters = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+        self._lock = threading.Lock()
+
+    def __call__(self, event, exchange, seconds=0.0, rows=0, size=0,
+                 **kwargs):
+        """Add an event to the counters.
+
+        :param event: `str` event name.
+        :param exchange: `str` exchange id.
+        :param seconds: `float` duration of the event.
+        :param rows: `int` number of candles.
+        :param size: `int` number of bytes.
+        """
+        with self._lock:
+            counters = self._counters[exchange]
+            if event == 'wait':
+                counters['wait_time'] += seconds
+            elif event == 'request':
+                counters['requests'] += 1
+                counters['request_time'] += seconds
+                counters['bytes'] += size
+            elif event == 'parse':
+                counters['parse_time'] += seconds
+                counters['rows'] += rows
+            elif event == 'concat':
+                counters['concat_time'] += seconds
+            elif event == 'fetch':
+                counters['fetches'] += 1
+                counters['fetch_time'] += seconds
+            elif event == 'retry':
+                counters['retries'] += 1
+                counters['retry_time'] += seconds
+
+    def snapshot(self):
+        """Return a copy of the counters.
+
+        :return: `dict` exchange id to `dict` of counters.
+        """
+        with self._lock:
+            return dict((exchange, dict(counters))
+                        for exchange, counters in self._counters.items())
+
+    def reset(self):
+        """Reset all the counters.
+        """
+        with self._lock:
+            self._counters.clear()
+
+    def summary(self):
+        """Return the summary of the counters, a line per exchange.
+        """
+        return '\n'.join(
+            '{}: {} requests, {} retries, {} rows, {} bytes, wait {:.3f}s, '
+            'request {:.3f}s, parse {:.3f}s, concat {:.3f}s'.format(
+                exchange, counters['requests'], counters['retries'],
+                counters['rows'], counters['bytes'], counters['wait_time'],
+                counters['request_time'], counters['parse_time'],
+                counters['concat_time'])
+            for exchange, counters in sorted(self.snapshot().items()))
+
+
+_STATS = CandleStats()
+
+
+def get_stats():
+    """Return the process-wide candle stats.
+    """
+    return _STATS
+
+
+def add_hook(hook):
+    """Add a hook called on every event of the candle fetch path.
+
+    The hook is called with the event name and the exchange id, and the
+    keyword arguments seconds, rows, size and symbol, e.g. to export the
+    events to a metrics system. It must be thread-safe and fast.
+
+    :param hook: `callable` hook.
+    """
+    with _HOOKS_LOCK:
+        _HOOKS.append(hook)
+
+
+def remove_hook(hook):
+    """Remove a hook added by `add_hook`.
+
+    :param hook: `callable` hook.
+    """
+    with _HOOKS_LOCK:
+        _HOOKS.remove(hook)
+
+
+def emit(event, exchange, **kwargs):
+    """Emit an event to the stats and the hooks.
+
+    :param event: `str` event name.
+    :param exchange: `str` exchange id.
+    """
+    _STATS(event, exchange, **kwargs)
+    for hook in list(_HOOKS):
+        hook(event, exchange, **kwargs)
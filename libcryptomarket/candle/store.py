@@ -0,0 +1,356 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from libcryptomarket.candle import FREQUENCY_TO_SEC_DICT
+from libcryptomarket.candle.cache import from_epoch, to_epoch
+
+
+RECORD_DTYPE = np.dtype([
+    ('start_time', '<i8'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+
+HEADER_SIZE = 512
+
+
+class CandleStore(object):
+    """Memory-mapped candle store keyed by exchange, market id and frequency.
+
+    Each key is stored as a binary file of fixed-width records, i.e. the
+    start time in epoch seconds, the OHLCV prices and the other numeric
+    columns of the candles, e.g. the quote volume and the weighted average
+    of Poloniex, one record per candle of a regular grid of the frequency.
+    The candles missing on the grid are stored as records of NaN prices, so
+    the record of a time is found by arithmetic and a time range is read as
+    a zero-copy `numpy` view of the mapped file.
+
+    The records of a key are contiguous. The candles after the last record
+    are appended to the file, while the candles before the first record
+    rewrite it, as do the candles bringing a column the key does not store
+    yet. Only numeric columns can be stored. The store has the same
+    interface as `CandleCache`, so it can be given to `fetch_candles` as its
+    cache.
+    """
+
+    def __init__(self, path):
+        """Constructor.
+
+        :param path: `str` root directory of the store.
+        """
+        self.path = path
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """Return the state to pickle, without the mapped files and the lock,
+        so that the store can be handed to other processes.
+        """
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def _key_path(self, exchange, market_id, frequency):
+        """Return the path of the key.
+        """
+        market_id = str(market_id).replace('/', '-')
+        return os.path.join(self.path, exchange, market_id, frequency + '.bin')
+
+    def records(self, exchange, market_id, frequency):
+        """Return all the records of the key.
+
+        The records are a read-only view of the mapped file, which is mapped
+        again only after it has changed.
+
+        :param exchange: `str` exchange id.
+        :param market_id: `str` exchange market id.
+        :param frequency: `str` frequency.
+        :return: `np.ndarray` records of `RECORD_DTYPE` and the other fields
+                 of the key.
+        """
+        path = self._key_path(exchange, market_id, frequency)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=RECORD_DTYPE)
+
+        stat = os.stat(path)
+        version = (stat.st_size, stat.st_mtime_ns)
+        entry = self._maps.get(path)
+        if entry is None or entry[0] != version:
+            with open(path, 'rb') as f:
+                dtype = record_dtype(
+                    json.loads(f.read(HEADER_SIZE).decode())['fields'])
+            if stat.st_size > HEADER_SIZE:
+                records = np.memmap(path, dtype=dtype, mode='r',
+                                    offset=HEADER_SIZE)
+            else:
+                records = np.empty(0, dtype=dtype)
+            entry = (version, records)
+            self._maps[path] = entry
+
+        return entry[1]
+
+    def view(self, exchange, market_id, frequency, start_time=None,
+             end_time=None):
+        """Return the records of the candles within the period.
+
+        The offsets of the period are computed from the start time of the
+        first record, without searching the records.
+
+        :param exchange: `str` exchange id.
+        :param market_id: `str` exchange market id.
+        :param frequency: `str` frequency.
+        :param start_time: `datetime` start time. Default is None which
+                           starts from the first record.
+        :param end_time: `datetime` end time. Default is None which ends at
+                         the last record.
+        :return: `np.ndarray` zero-copy view of the records of the key.
+        """
+        records = self.records(exchange, market_id, frequency)
+        if len(records) == 0:
+            return records
+
+        period = FREQUENCY_TO_SEC_DICT[frequency]
+        first = int(records[0]['start_time'])
+
+        start = 0
+        if start_time is not None:
+            start = -(-(to_epoch(start_time) - first) // period)
+
+        end = len(records)
+        if end_time is not None:
+            end = (to_epoch(end_time) - first) // period
+
+        start = min(max(start, 0), len(records))
+        end = min(max(end, start), len(records))
+        return records[start:end]
+
+    def missing(self, exchange, market_id, frequency, start_time, end_time):
+        """Return the ranges not stored yet.
+
+        As the records are contiguous, the ranges are extended to the first
+        or the last record, so that they can be stored.
+
+        :param exchange: `str` exchange id.
+        :param market_id: `str` exchange market id.
+        :param frequency: `str` frequency.
+        :param start_time: `datetime` start time.
+        :param end_time: `datetime` end time.
+        :return: `list` list of (start_time, end_time) tuples.
+        """
+        period = FREQUENCY_TO_SEC_DICT[frequency]
+        start, end = to_epoch(start_time), to_epoch(end_time)
+        records = self.records(exchange, market_id, frequency)
+        if len(records) == 0:
+            gaps = [(start, end)]
+        else:
+            first = int(records[0]['start_time'])
+            last = first + len(records) * period
+            gaps = []
+            if start < first:
+                gaps.append((start, first))
+            if end > last:
+                gaps.append((last, end))
+
+        return [(from_epoch(gap_start), from_epoch(gap_end))
+                for gap_start, gap_end in gaps
+                if -(-gap_start // period) * period + period <= gap_end]
+
+    def read(self, exchange, market_id, frequency, start_time, end_time):
+        """Return the stored candles within the period.
+
+        :param exchange: `str` exchange id.
+        :param market_id: `str` exchange market id.
+        :param frequency: `str` frequency.
+        :param start_time: `datetime` start time.
+        :param end_time: `datetime` end time.
+        :return: `pd.DataFrame` candles, without the missing candles.
+        """
+        records = self.view(
+            exchange, market_id, frequency, start_time, end_time)
+        records = records[~np.isnan(records['close'])]
+        if len(records) == 0:
+            return pd.DataFrame()
+
+        data = pd.DataFrame(np.array(records))
+        data['start_time'] = pd.to_datetime(data['start_time'], unit='s')
+        data.insert(1, 'end_time', data['start_time'] + pd.Timedelta(
+            seconds=FREQUENCY_TO_SEC_DICT[frequency]))
+        return data
+
+    def write(self, exchange, market_id, frequency, data, start_time,
+              end_time):
+        """Store the candles of the period.
+
+        The candles of the period on the grid of the frequency are stored,
+        the missing ones as records of NaN prices. The period must adjoin or
+        overlap the stored records, and the stored records are not changed,
+        except for the columns new to the key, which are added to the stored
+        records as NaN values.
+
+        :param exchange: `str` exchange id.
+        :param market_id: `str` exchange market id.
+        :param frequency: `str` frequency.
+        :param data: `pd.DataFrame` candles.
+        :param start_time: `datetime` start time of the period.
+        :param end_time: `datetime` end time of the period.
+        :raises ValueError: if the period is apart from the stored records,
+                            the candles are not on the grid of the stored
+                            records, or a column is not numeric.
+        """
+        period = FREQUENCY_TO_SEC_DICT[frequency]
+        path = self._key_path(exchange, market_id, frequency)
+
+        with self._lock:
+            records = self.records(exchange, market_id, frequency)
+            fields = list(records.dtype.names[len(RECORD_DTYPE):])
+            fields += [field for field in _data_fields(data)
+                       if field not in fields]
+            dtype = record_dtype(fields)
+
+            if len(records) > 0:
+                anchor = int(records[0]['start_time'])
+            elif len(data) > 0:
+                anchor = to_epoch(data['start_time'].iloc[0])
+            else:
+                anchor = 0
+
+            block = _grid_records(data, to_epoch(start_time),
+                                  to_epoch(end_time), period, anchor, dtype)
+            if len(block) == 0:
+                return
+
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if len(records) == 0:
+                _write_records(path, dtype, [block])
+                return
+
+            first = int(records[0]['start_time'])
+            last = first + len(records) * period
+            block_first = int(block[0]['start_time'])
+            block_last = block_first + len(block) * period
+            if block_first > last or block_last < first:
+                raise ValueError(
+                    "Period {} - {} is apart from the stored records {} - "
+                    "{}".format(from_epoch(block_first),
+                                from_epoch(block_last), from_epoch(first),
+                                from_epoch(last)))
+
+            before = block[:max(0, (first - block_first) // period)]
+            after = block[max(0, (last - block_first) // period):]
+
+            if len(before) > 0 or dtype != records.dtype:
+                _write_records(path, dtype,
+                               [before, _cast_records(records, dtype), after])
+            elif len(after) > 0:
+                with open(path, 'ab') as f:
+                    f.write(after.tobytes())
+
+
+def record_dtype(fields):
+    """Return the dtype of the records with the given fields besides the
+    ones of `RECORD_DTYPE`.
+
+    :param fields: `list` list of field names.
+    """
+    return np.dtype(RECORD_DTYPE.descr + [(field, '<f8') for field in fields])
+
+
+def _data_fields(data):
+    """Return the columns of the candles stored besides the ones of
+    `RECORD_DTYPE`.
+
+    :raises ValueError: if a stored column is not numeric.
+    """
+    for column in data.columns:
+        if column in ('start_time', 'end_time'):
+            continue
+
+        try:
+            data[column].values.astype(float)
+        except (TypeError, ValueError):
+            raise ValueError(
+                "Column {} is not numeric and cannot be stored".format(
+                    column))
+
+    return [column for column in data.columns
+            if column not in ('start_time', 'end_time') and
+            column not in RECORD_DTYPE.names]
+
+
+def _cast_records(records, dtype):
+    """Return the records with the fields of the dtype, the new ones NaN.
+    """
+    if records.dtype == dtype:
+        return records
+
+    cast = np.empty(len(records), dtype=dtype)
+    for field in dtype.names:
+        if field in records.dtype.names:
+            cast[field] = records[field]
+        else:
+            cast[field] = np.nan
+
+    return cast
+
+
+def _write_records(path, dtype, blocks):
+    """Write the header of the dtype and the blocks of records to the path.
+
+    The file is written to a temporary path and then renamed, so that no
+    partial file is left behind.
+    """
+    header = json.dumps(
+        {'fields': list(dtype.names[len(RECORD_DTYPE):])}).encode()
+    if len(header) > HEADER_SIZE:
+        raise ValueError("Too many fields to store: {}".format(
+            dtype.names[len(RECORD_DTYPE):]))
+
+    with open(path + '.tmp', 'wb') as f:
+        f.write(header.ljust(HEADER_SIZE))
+        for block in blocks:
+            f.write(block.tobytes())
+
+    os.replace(path + '.tmp', path)
+
+
+def _grid_records(data, start, end, period, anchor, dtype=RECORD_DTYPE):
+    """Return the records of the candles on the grid within the period.
+
+    :param data: `pd.DataFrame` candles.
+    :param start: `int` start time in epoch seconds.
+    :param end: `int` end time in epoch seconds.
+    :param period: `int` period of the frequency in seconds.
+    :param anchor: `int` start time of any candle on the grid.
+    :param dtype: `np.dtype` dtype of the records.
+    """
+    first = start + (anchor - start) % period
+    records = np.zeros(max(0, (end - first) // period), dtype=dtype)
+    records['start_time'] = first + np.arange(len(records)) * period
+    for column in dtype.names[1:]:
+        records[column] = np.nan
+
+    if len(data) == 0 or len(records) == 0:
+        return records
+
+    start_times = (pd.to_datetime(data['start_time']).values
+                   .astype('datetime64[s]').astype(np.int64))
+    if ((start_times - first) % period != 0).any():
+        raise ValueError("Candles are not on the grid of {}".format(
+            from_epoch(anchor)))
+
+    offsets = (start_times - first) // period
+    inside = (offsets >= 0) & (offsets < len(records))
+    for column in dtype.names[1:]:
+        if column in data.columns:
+            records[column][offsets[inside]] = \
+                data[column].values[inside].astype(float)
+
+    return records
@@ -0,0 +1,263 @@
+import numpy as np
+import pandas as pd
+
+from libcryptomarket.candle import FREQUENCY_TO_SEC_DICT
+
+
+PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'weighted_average']
+
+VOLUME_COLUMNS = ['volume', 'quote_volume']
+
+
+def invert_candles(data, decimals=8):
+    """Return the candles quoted in the base currency.
+
+    All the prices are inverted in a single vectorized step, and the high
+    and low prices are swapped. The volumes are unchanged.
+
+    :param data: `pd.DataFrame` candles.
+    :param decimals: `int` number of decimals to round the prices to.
+    """
+    columns = [column for column in PRICE_COLUMNS if column in data.columns]
+    inverted = np.round(1.0 / data[columns].values.astype(float), decimals)
+
+    swapped = {'high': 'low', 'low': 'high'}
+    data = data.copy()
+    for i, column in enumerate(columns):
+        data[swapped.get(column, column)] = inverted[:, i]
+
+    return data
+
+
+def resample_candles(data, frequency):
+    """Return the candles aggregated to a lower frequency.
+
+    The candles are grouped by the start time of the lower frequency, aligned
+    to the epoch, and aggregated in a single vectorized step per column. The
+    open and close are the first and last prices, the high and low are the
+    maximum and minimum, the volumes are summed and the weighted average is
+    weighted by the quote volume. Other columns take their last value.
+
+    :param data: `pd.DataFrame` candles of a finer frequency.
+    :param frequency: `str` frequency, which must be a multiple of the
+                      frequency of the candles.
+    """
+    period = FREQUENCY_TO_SEC_DICT[frequency]
+    if len(data) == 0:
+        return data
+
+    base_period = (data['end_time'].iloc[0] -
+                   data['start_time'].iloc[0]).total_seconds()
+    if period % base_period != 0:
+        raise ValueError(
+            "Frequency {} is not a multiple of the candle frequency".format(
+                frequency))
+
+    data = data.sort_values('start_time')
+    epochs = data['start_time'].values.astype('datetime64[s]').astype(np.int64)
+    buckets = epochs // period
+    firsts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    lasts = np.r_[firsts[1:], len(buckets)] - 1
+
+    start_times = pd.to_datetime(buckets[firsts] * period, unit='s')
+    resampled = {
+        'start_time': start_times,
+        'end_time': start_times + pd.Timedelta(seconds=period),
+    }
+
+    for column in data.columns:
+        if column in resampled:
+            continue
+
+        values = data[column].values
+        if column == 'open':
+            resampled[column] = values[firsts]
+        elif column == 'high':
+            resampled[column] = np.maximum.reduceat(values, firsts)
+        elif column == 'low':
+            resampled[column] = np.minimum.reduceat(values, firsts)
+        elif column in VOLUME_COLUMNS:
+            resampled[column] = np.add.reduceat(values, firsts)
+        elif (column == 'weighted_average' and
+                'quote_volume' in data.columns):
+            quote_volumes = data['quote_volume'].values.astype(float)
+            weights = np.add.reduceat(quote_volumes, firsts)
+            totals = np.add.reduceat(values * quote_volumes, firsts)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                resampled[column] = np.where(
+                    weights > 0, totals / weights, values[lasts])
+        else:
+            resampled[column] = values[lasts]
+
+    return pd.DataFrame(resampled, columns=list(data.columns))
+
+
+def cross_candles(base_leg, quote_leg):
+    """Return the synthetic candles of a cross rate from its two legs.
+
+    The legs are aligned on their start times, and only the candles present
+    in both legs are kept. For a cross rate A/C through B, the base leg is
+    A/B and the quote leg is B/C, both quoted as the price of their base
+    currency, e.g. inverted by `invert_candles` if the exchange lists B/A.
+
+    The open, close and weighted average prices are the products of those of
+    the legs. The high and low prices of the legs may not occur at the same
+    time, so the products of the highs and of the lows are the widest range
+    the cross rate can have traded in, rather than its exact high and low.
+    The volumes of the legs are in different currencies, so they are not
+    carried over.
+
+    :param base_leg: `pd.DataFrame` candles of the base leg.
+    :param quote_leg: `pd.DataFrame` candles of the quote leg.
+    """
+    columns = [column for column in PRICE_COLUMNS
+               if column in base_leg.columns and column in quote_leg.columns]
+    data = pd.merge(
+        base_leg[['start_time', 'end_time'] + columns],
+        quote_leg[['start_time'] + columns],
+        on='start_time', suffixes=('_base', '_quote'))
+
+    prices = (
+        data[[column + '_base' for column in columns]].values.astype(float) *
+        data[[column + '_quote' for column in columns]].values.astype(float))
+
+    cross = data[['start_time', 'end_time']].copy()
+    for i, column in enumerate(columns):
+        cross[column] = prices[:, i]
+
+    return cross
+
+
+def composite_candles(candles, base_volumes=None):
+    """Return the volume-weighted composite of the candles of several venues.
+
+    The candles of the venues are aligned on their start times, and the
+    composite of every start time is computed in a single vectorized step
+    over the venues which have a candle at that time. The high and low are
+    the highest and lowest prices of the venues, the volume is the total
+    volume in the base currency and the VWAP is the average of the venue
+    prices weighted by their volumes. The price of a venue is its weighted
+    average if given, otherwise its typical price, i.e. the average of its
+    high, low and close.
+
+    :param candles: `dict` venue to `pd.DataFrame` candles.
+    :param base_volumes: `dict` venue to the name of its volume column in the
+                         base currency. Default is None which uses volume
+                         for all the venues.
+    :return: `pd.DataFrame` candles of start_time, end_time, high, low,
+             volume, vwap and venue_count.
+    """
+    base_volumes = base_volumes or {}
+    times = pd.concat([data[['start_time', 'end_time']]
+                       for data in candles.values()])
+    times = times.drop_duplicates('start_time').sort_values('start_time')
+    index = pd.Index(times['start_time'])
+
+    # Venue, start time and high, low, price, volume
+    values = np.full((len(candles), len(index), 4), np.nan)
+    for i, (venue, data) in enumerate(candles.items()):
+        if 'weighted_average' in data.columns:
+            prices = data['weighted_average'].values
+        else:
+            prices = data[['high', 'low', 'close']].values.mean(axis=1)
+
+        values[i, index.get_indexer(data['start_time'])] = np.column_stack([
+            data['high'].values, data['low'].values, prices,
+            data[base_volumes.get(venue, 'volume')].values]).astype(float)
+
+    highs, lows, prices, volumes = np.moveaxis(values, 2, 0)
+    volume = np.nansum(volumes, axis=0)
+    weighted = np.nansum(prices * volumes, axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = np.where(volume > 0, weighted / volume,
+                        np.nanmean(prices, axis=0))
+
+    return pd.DataFrame({
+        'start_time': times['start_time'].values,
+        'end_time': times['end_time'].values,
+        'high': np.nanmax(highs, axis=0),
+        'low': np.nanmin(lows, axis=0),
+        'volume': volume,
+        'vwap': vwap,
+        'venue_count': (~np.isnan(prices)).sum(axis=0),
+    }, columns=['start_time', 'end_time', 'high', 'low', 'volume', 'vwap',
+                'venue_count'])
+
+
+def stitch_candles(pages):
+    """Return the candle pages merged in order of start time.
+
+    The pages are ordered by their first start times and concatenated once.
+    The candles overlapping the candles before them, e.g. the boundary
+    candles returned by both of two consecutive pages, are then dropped in a
+    single linear pass, so the result has unique and increasing start times.
+    The candles of every page must be in order of start time.
+
+    :param pages: `list` list of candle pages.
+    """
+    pages = [page for page in pages if len(page) > 0]
+    if len(pages) == 0:
+        return pd.DataFrame()
+
+    pages = sorted(pages, key=lambda page: page['start_time'].iloc[0])
+    data = pd.concat(pages, ignore_index=True) if len(pages) > 1 else \
+        pages[0].reset_index(drop=True)
+
+    start_times = data['start_time'].values
+    if (start_times[1:] <= start_times[:-1]).any():
+        # Keep the candles after the latest start time before them
+        latest_start_times = np.maximum.accumulate(start_times)
+        data = data[np.concatenate([
+            [True], start_times[1:] > latest_start_times[:-1]])]
+        data = data.reset_index(drop=True)
+
+    return data
+
+
+def candle_gaps(data, start_time, end_time, frequency):
+    """Return the start times of the candles missing within a period.
+
+    The candles are expected on a grid of the frequency, aligned to the
+    first candle, or to the epoch if there is none. Only the candles fully
+    inside the period are expected.
+
+    :param data: `pd.DataFrame` candles.
+    :param start_time: `datetime` start time.
+    :param end_time: `datetime` end time.
+    :param frequency: `str` frequency.
+    :return: `pd.DatetimeIndex` start times of the missing candles.
+    """
+    period = pd.Timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency])
+    start_time = pd.Timestamp(start_time)
+    anchor = data['start_time'].iloc[0] if len(data) > 0 else \
+        pd.Timestamp(0)
+    grid = pd.date_range(
+        start=start_time + (anchor - start_time) % period,
+        end=pd.Timestamp(end_time) - period,
+        freq=period)
+
+    if len(data) == 0:
+        return grid
+
+    return grid[~grid.isin(data['start_time'].values)]
+
+
+def gap_ranges(gaps, frequency):
+    """Return the periods of consecutive missing candles.
+
+    :param gaps: `pd.DatetimeIndex` start times of the missing candles, as
+                 returned by `candle_gaps`.
+    :param frequency: `str` frequency.
+    :return: `list` list of (start_time, end_time) tuples.
+    """
+    if len(gaps) == 0:
+        return []
+
+    period = pd.Timedelta(seconds=FREQUENCY_TO_SEC_DICT[frequency])
+    breaks = np.flatnonzero(np.diff(gaps.values) != period.to_timedelta64())
+    firsts = np.concatenate([[0], breaks + 1])
+    lasts = np.concatenate([breaks, [len(gaps) - 1]])
+
+    return [(pd.Timestamp(gaps.values[first]),
+             pd.Timestamp(gaps.values[last]) + period)
+            for first, last in zip(firsts, lasts)]
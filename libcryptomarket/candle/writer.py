@@ -0,0 +1,124 @@
+import bz2
+import gzip
+import lzma
+
+
+FILE_COMPRESSIONS = {
+    'csv': ['gzip', 'bz2', 'xz'],
+    'parquet': ['snappy', 'gzip', 'brotli', 'zstd', 'lz4'],
+    'feather': ['lz4', 'zstd'],
+}
+
+CSV_OPENERS = {
+    None: open,
+    'gzip': gzip.open,
+    'bz2': bz2.open,
+    'xz': lzma.open,
+}
+
+
+class CandleWriter(object):
+    """Incremental writer of candles in long format.
+
+    Every chunk of candles is written as soon as it is given, with the
+    symbol as a column, so that the whole universe never needs to be held
+    in memory. Parquet and feather require pyarrow to be installed.
+    """
+
+    def __init__(self, path, file_format='csv', compression=None):
+        """Constructor.
+
+        :param path: `str` output path.
+        :param file_format: `str` file format, either "csv", "parquet" or
+                            "feather".
+        :param compression: `str` compression. Default is None which does
+                            not compress, or the default compression of
+                            the format for parquet.
+        """
+        if file_format not in FILE_COMPRESSIONS:
+            raise ValueError("File format {} is not supported".format(
+                file_format))
+
+        if (compression is not None and
+                compression not in FILE_COMPRESSIONS[file_format]):
+            raise ValueError(
+                "Compression {} is not supported by {}".format(
+                    compression, file_format))
+
+        self.path = path
+        self.file_format = file_format
+        self.compression = compression
+        self.row_count = 0
+        self._file = None
+        self._writer = None
+        self._schema = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def write(self, data, symbol):
+        """Write a chunk of candles of the symbol.
+
+        :param data: `pd.DataFrame` candles.
+        :param symbol: `str` symbol.
+        """
+        if len(data) == 0:
+            return
+
+        data = data.reset_index(drop=True)
+        data.insert(1, 'symbol', symbol)
+        getattr(self, '_write_' + self.file_format)(data)
+        self.row_count += len(data)
+
+    def close(self):
+        """Flush and close the output file.
+        """
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_csv(self, data):
+        header = self._file is None
+        if header:
+            self._file = CSV_OPENERS[self.compression](self.path, 'wt')
+
+        data.to_csv(self._file, header=header, index=False)
+
+    def _write_parquet(self, data):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if self._writer is None:
+            table = pa.Table.from_pandas(data, preserve_index=False)
+            self._schema = table.schema
+            self._writer = pq.ParquetWriter(
+                self.path, self._schema,
+                compression=self.compression or 'snappy')
+        else:
+            table = pa.Table.from_pandas(
+                data, schema=self._schema, preserve_index=False)
+
+        self._writer.write_table(table)
+
+    def _write_feather(self, data):
+        import pyarrow as pa
+
+        if self._writer is None:
+            batch = pa.RecordBatch.from_pandas(data, preserve_index=False)
+            self._schema = batch.schema
+            self._file = pa.OSFile(self.path, 'wb')
+            self._writer = pa.ipc.new_file(
+                self._file, self._schema,
+                options=pa.ipc.IpcWriteOptions(compression=self.compression))
+        else:
+            batch = pa.RecordBatch.from_pandas(
+                data, schema=self._schema, preserve_index=False)
+
+        self._writer.write_batch(batch)
@@ -1,10 +1,18 @@
 import argparse
 import logging
+import os
+import sys
+from datetime import timedelta
 
 import pandas as pd
 
-# pylint: disable-msg=W0401
-from libcryptomarket.exchange import *  # flake8: noqa
+import libcryptomarket
+from libcryptomarket.candle.backfill import (
+    BackfillManifest, backfill_units, run_backfill)
+from libcryptomarket.candle.markets import (
+    DEFAULT_PATH, DEFAULT_TTL, set_markets_cache)
+from libcryptomarket.candle.stats import get_stats
+from libcryptomarket.candle.writer import CandleWriter, FILE_COMPRESSIONS
 
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
@@ -17,8 +25,10 @@ def get_args():
     """
     parser = argparse.ArgumentParser(description=(
         'Query historical candles to files.'))
-    parser.add_argument('--exchange', action='store', dest='exchange',
-                        help='Exchange name.', required=True)
+    parser.add_argument('--exchange', action='store', dest='exchanges',
+                        help='Exchange name. Multiple exchanges are only '
+                             'supported in bulk mode.',
+                        type=str, nargs='+', required=True)
     parser.add_argument('--symbols', action='store', dest='symbols',
                         help='List of symbols',
                         type=str, nargs='+', required=True)
@@ -33,9 +43,44 @@ def get_args():
                         help='End time in format of \'YYYY-MM-DD\'',
                         required=True)
     parser.add_argument('--output', action='store', dest='output',
-                        help='Output filename', required=True)
-
-    return parser.parse_args()
+                        help='Output filename, or output directory in bulk '
+                             'mode', required=True)
+    parser.add_argument('--format', action='store', dest='format',
+                        help='Output file format.',
+                        choices=list(FILE_COMPRESSIONS), default='csv')
+    parser.add_argument('--compression', action='store', dest='compression',
+                        help='Output compression, e.g. gzip for csv, zstd '
+                             'for parquet and feather.',
+                        default=None)
+    parser.add_argument('--chunk-size', action='store', dest='chunk_size',
+                        help='Number of candles written at a time.',
+                        type=int, default=100000)
+    parser.add_argument('--bulk', action='store_true', dest='bulk',
+                        help='Query the symbols and exchanges concurrently '
+                             'in windows, writing every window to its own '
+                             'file and resuming from the completed windows '
+                             'on restart.')
+    parser.add_argument('--workers', action='store', dest='workers',
+                        help='Number of windows queried concurrently in '
+                             'bulk mode.',
+                        type=int, default=4)
+    parser.add_argument('--window-days', action='store', dest='window_days',
+                        help='Number of days of every window in bulk mode.',
+                        type=int, default=30)
+    parser.add_argument('--markets-cache', action='store',
+                        dest='markets_cache',
+                        help='Directory of the markets cached across runs.',
+                        default=DEFAULT_PATH)
+    parser.add_argument('--markets-ttl', action='store', dest='markets_ttl',
+                        help='Number of seconds the cached markets are used '
+                             'before querying them again.',
+                        type=float, default=DEFAULT_TTL)
+
+    args = parser.parse_args()
+    if not args.bulk and len(args.exchanges) > 1:
+        parser.error('Multiple exchanges are only supported in bulk mode')
+
+    return args
 
 
 def main():
@@ -50,31 +95,85 @@ def main():
     end_time = pd.Timestamp(args.end_time)
     logging.info('End time: %s', end_time)
 
+    set_markets_cache(args.markets_cache, ttl=args.markets_ttl)
+
+    if args.bulk:
+        bulk_export(args, start_time, end_time)
+    else:
+        export(args, start_time, end_time)
+
+
+def export(args, start_time, end_time):
+    """Export the candles of the symbols to a single file.
+    """
     logging.info('Starting querying to exchange %s with frequency %s...',
-                 args.exchange, args.frequency)
+                 args.exchanges[0], args.frequency)
+
+    exchange = getattr(libcryptomarket, args.exchanges[0].lower())()
 
-    all_data = {}
+    logging.info('Exporting to path (%s) in %s...', args.output, args.format)
 
-    exchange = globals()[args.exchange.lower()]
+    with CandleWriter(args.output, file_format=args.format,
+                      compression=args.compression) as writer:
+        for symbol in args.symbols:
+            logging.info('Querying symbol %s...', symbol)
+            for data in exchange.iter_candles(
+                    symbol=symbol,
+                    start_time=start_time,
+                    end_time=end_time,
+                    frequency=args.frequency,
+                    chunk_size=args.chunk_size):
+                writer.write(data, symbol=symbol)
 
-    for symbol in args.symbols:
-        logging.info('Querying symbol %s...', symbol)
-        data = exchange().fetch_candles(
-            symbol=symbol,
-            start_time=start_time,
-            end_time=end_time,
-            frequency=args.frequency)
-        all_data[symbol] = data.set_index(['start_time'], ['end_time'])
+    logging.info('Exported %d historical prices', writer.row_count)
+    log_stats()
 
-    logging.info('Cleaning the data...')
 
-    all_data = pd.concat(all_data, axis=1, names=['symbol', 'value'])
-    all_data = all_data.stack(level=0)
+def log_stats():
+    """Log the summary of the candle stats of every exchange.
+    """
+    for line in get_stats().summary().splitlines():
+        logging.info('Stats of %s', line)
 
-    logging.info('Exporting to path (%s)...', args.output)
-    all_data.to_csv(args.output)
 
-    logging.info('Exported all the historical prices')
+def bulk_export(args, start_time, end_time):
+    """Export the candles of the symbols and exchanges by windows.
+    """
+    exchanges = dict(
+        (name.lower(), getattr(libcryptomarket, name.lower())())
+        for name in args.exchanges)
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest = BackfillManifest(os.path.join(args.output, 'manifest.jsonl'))
+    units = backfill_units(
+        exchanges=list(exchanges.keys()),
+        symbols=args.symbols,
+        frequency=args.frequency,
+        start_time=start_time,
+        end_time=end_time,
+        window=timedelta(days=args.window_days))
+
+    logging.info('Starting bulk querying to exchanges %s with frequency '
+                 '%s...', ', '.join(exchanges.keys()), args.frequency)
+
+    errors = run_backfill(
+        exchanges=exchanges,
+        units=units,
+        output=args.output,
+        manifest=manifest,
+        file_format=args.format,
+        compression=args.compression,
+        max_workers=args.workers)
+
+    log_stats()
+
+    if errors:
+        logging.error('%d units failed, rerun the same command to resume',
+                      len(errors))
+        sys.exit(1)
+
+    logging.info('Exported all the historical prices to directory (%s)',
+                 args.output)
 
 
 if __name__ == '__main__':
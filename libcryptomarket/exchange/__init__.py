@@ -1,3 +1,4 @@
 # pylint: disable-msg=W0401
 # flake8: noqa
 from ccxt import *
+import libcryptomarket.candle.inject
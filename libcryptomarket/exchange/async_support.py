@@ -0,0 +1,15 @@
+# pylint: disable-msg=W0401
+# flake8: noqa
+import importlib
+
+try:
+    _ccxt_async = importlib.import_module('ccxt.async_support')
+except ImportError:
+    # Before ccxt 1.13 the asyncio package was named ccxt.async, which is a
+    # reserved word since Python 3.7
+    _ccxt_async = importlib.import_module('ccxt.async')
+
+__all__ = ['Exchange'] + list(_ccxt_async.exchanges)
+
+globals().update(dict(
+    (name, getattr(_ccxt_async, name)) for name in __all__))
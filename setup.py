@@ -23,6 +23,10 @@ setup_requirements = [
     # TODO(gavincyi): put setup requirements (distutils extensions, etc.) here
 ]
 
+extras_requirements = {
+    'parquet': ['pyarrow'],
+}
+
 test_requirements = [
     'pytest',
     # TODO: put package test requirements here
@@ -39,6 +43,7 @@ setup(
     packages=find_packages(),
     include_package_data=True,
     install_requires=requirements,
+    extras_require=extras_requirements,
     license="GNU General Public License v3",
     zip_safe=False,
     keywords='libcryptomarket',
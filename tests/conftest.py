@@ -0,0 +1,157 @@
+import math
+from datetime import datetime
+
+import ccxt
+import pandas as pd
+import pytest
+
+import libcryptomarket
+from libcryptomarket.candle import FREQUENCY_TO_SEC_DICT, markets
+from libcryptomarket.candle.cache import CandleCache
+from libcryptomarket.candle.markets import MarketsCache
+from libcryptomarket.candle.ratelimit import set_rate_limiter
+from libcryptomarket.candle.replay import CandleReplay
+from libcryptomarket.candle.store import CandleStore
+
+SYMBOLS = ['ETH/BTC', 'LTC/BTC']
+
+START_TIME = datetime(2018, 1, 1)
+
+END_TIME = datetime(2018, 1, 4)
+
+
+def price(epoch):
+    """Return the synthetic price of the candle starting at the epoch.
+    """
+    return 0.05 + 0.01 * math.sin(epoch / 86400.0)
+
+
+def synthetic_epochs(exchange, start_time, end_time, frequency):
+    """Return the candle start times of a synthetic page, at most a page of
+    the exchange.
+    """
+    period = FREQUENCY_TO_SEC_DICT[frequency]
+    start = -(-int(start_time.timestamp()) // period) * period
+    end = int(end_time.timestamp()) - period
+    epochs = list(range(start, end + 1, period))
+    return epochs[:exchange._candles_page_size]
+
+
+def synthetic_responses(exchange):
+    """Return a function of the synthetic raw responses of the exchange.
+    """
+    def poloniex(symbol, start_time, end_time, frequency):
+        return [{
+            'date': epoch,
+            'high': price(epoch) * 1.01,
+            'low': price(epoch) * 0.99,
+            'open': price(epoch),
+            'close': price(epoch),
+            'volume': 10.0,
+            'quoteVolume': 100.0,
+            'weightedAverage': price(epoch),
+        } for epoch in synthetic_epochs(
+            exchange, start_time, end_time, frequency)]
+
+    def gdax(symbol, start_time, end_time, frequency):
+        return [[epoch, price(epoch) * 0.99, price(epoch) * 1.01,
+                 price(epoch), price(epoch), 10.0]
+                for epoch in reversed(synthetic_epochs(
+                    exchange, start_time, end_time, frequency))]
+
+    return locals()[exchange.id]
+
+
+def synthetic_markets(exchange_id):
+    """Return the markets of the symbols.
+    """
+    markets = {}
+    for symbol in SYMBOLS:
+        base, quote = symbol.split('/')
+        if exchange_id == 'poloniex':
+            market_id = '{}_{}'.format(quote, base)
+        else:
+            market_id = '{}-{}'.format(base, quote)
+
+        markets[symbol] = {'id': market_id, 'symbol': symbol, 'base': base,
+                           'quote': quote}
+
+    return markets
+
+
+def replay_exchange(exchange_id):
+    """Return an exchange instance served by a synthetic replay, and the
+    replay.
+    """
+    exchange = getattr(libcryptomarket, exchange_id)()
+    replay = CandleReplay(synthetic_responses(exchange),
+                          markets=synthetic_markets(exchange_id))
+    replay.install(exchange)
+    return exchange, replay
+
+
+def fail_requests(replay, failures):
+    """Make the requests of the replay starting at the given times fail.
+
+    :param replay: `CandleReplay` replay.
+    :param failures: `dict` start time of the request to the number of
+                     times it fails, or None to always fail.
+    """
+    responses = replay.responses
+
+    def failing(symbol, start_time, end_time, frequency):
+        start_time = pd.Timestamp(start_time)
+        if start_time in failures:
+            if failures[start_time] is None:
+                raise ccxt.NetworkError('Stand-in failure')
+            elif failures[start_time] > 0:
+                failures[start_time] -= 1
+                raise ccxt.NetworkError('Stand-in failure')
+
+        return responses(symbol, start_time, end_time, frequency)
+
+    replay.responses = failing
+
+
+def assert_same_candles(data, expected):
+    pd.testing.assert_frame_equal(
+        data[list(expected.columns)].reset_index(drop=True),
+        expected.reset_index(drop=True))
+
+
+@pytest.fixture(autouse=True)
+def rate_limiters():
+    """Lift the rate limits, as no request leaves the process.
+    """
+    for exchange_id in ['poloniex', 'gdax']:
+        set_rate_limiter(exchange_id, rate=1000.0)
+
+
+@pytest.fixture(autouse=True)
+def markets_cache(monkeypatch):
+    """Give every test its own process-wide markets cache, so that no
+    markets leak into the other tests.
+    """
+    markets_cache = MarketsCache()
+    monkeypatch.setattr(markets, '_MARKETS_CACHE', markets_cache)
+    return markets_cache
+
+
+@pytest.fixture
+def poloniex():
+    return replay_exchange('poloniex')
+
+
+@pytest.fixture
+def gdax():
+    return replay_exchange('gdax')
+
+
+@pytest.fixture(params=['pickle', 'parquet', 'store'])
+def cache(request, tmpdir):
+    if request.param == 'store':
+        return CandleStore(str(tmpdir))
+    elif request.param == 'parquet':
+        pytest.importorskip('pyarrow')
+
+    return CandleCache(str(tmpdir), file_format=request.param)
@@ -0,0 +1,90 @@
+import json
+import os
+from datetime import timedelta
+
+import pandas as pd
+
+from libcryptomarket.candle.backfill import (
+    BackfillManifest, backfill_units, run_backfill)
+
+from tests.conftest import END_TIME, SYMBOLS, START_TIME
+
+
+def record_requests(replay, failed_units):
+    """Record the requests of the replay, and make the requests within the
+    failed units fail.
+
+    :param replay: `CandleReplay` replay.
+    :param failed_units: `list` list of the market ids, start and end times
+                         of the failed units, which can be changed later.
+    :return: `list` list of the market ids and start times of the requests.
+    """
+    responses = replay.responses
+    requests = []
+
+    def recording(symbol, start_time, end_time, frequency):
+        requests.append((symbol, pd.Timestamp(start_time)))
+        for unit_symbol, unit_start_time, unit_end_time in failed_units:
+            if (symbol == unit_symbol and
+                    unit_start_time <= start_time < unit_end_time):
+                raise ValueError('Stand-in failure')
+
+        return responses(symbol, start_time, end_time, frequency)
+
+    replay.responses = recording
+    return requests
+
+
+def read_manifest(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_restart_only_queries_the_failed_units(gdax, tmpdir):
+    exchange, replay = gdax
+    output = str(tmpdir.join('output'))
+    manifest_path = str(tmpdir.join('manifest.jsonl'))
+    units = backfill_units(['gdax'], SYMBOLS, '5m', START_TIME, END_TIME,
+                           window=timedelta(days=1))
+    assert len(units) == 2 * 3
+
+    failed_unit = units[4]
+    assert (failed_unit.symbol, failed_unit.start_time) == \
+        ('LTC/BTC', pd.Timestamp(START_TIME + timedelta(days=1)))
+
+    failed_units = [
+        ('LTC-BTC', failed_unit.start_time, failed_unit.end_time)]
+    requests = record_requests(replay, failed_units)
+    errors = run_backfill({'gdax': exchange}, units, output,
+                          BackfillManifest(manifest_path), max_workers=2)
+
+    assert list(errors) == [failed_unit]
+    records = read_manifest(manifest_path)
+    assert len(records) == 5
+    assert failed_unit not in [tuple(record['unit']) for record in records]
+
+    # Restart with a new manifest instance reading the same file
+    del failed_units[:]
+    del requests[:]
+    errors = run_backfill({'gdax': exchange}, units, output,
+                          BackfillManifest(manifest_path), max_workers=2)
+
+    assert errors == {}
+    assert requests == [('LTC-BTC', failed_unit.start_time)]
+
+    records = read_manifest(manifest_path)
+    assert sorted(tuple(record['unit']) for record in records) == sorted(
+        ('gdax', unit.symbol, '5m', unit.start_time.isoformat(),
+         unit.end_time.isoformat()) for unit in units)
+    for record in records:
+        assert record['rows'] == 288
+        assert os.path.exists(record['path'])
+        data = pd.read_csv(record['path'])
+        assert len(data) == 288
+        assert (data['symbol'] == record['unit'][1]).all()
+
+    # Nothing is left to query
+    del requests[:]
+    assert run_backfill({'gdax': exchange}, units, output,
+                        BackfillManifest(manifest_path)) == {}
+    assert requests == []
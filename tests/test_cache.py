@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from tests.conftest import END_TIME, START_TIME, assert_same_candles
+
+
+def test_cache_hit_sends_no_request(gdax, cache):
+    exchange, replay = gdax
+    expected = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    request_count = replay.request_count
+
+    data = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m', cache=cache)
+    assert_same_candles(data, expected)
+    assert replay.request_count == 2 * request_count
+    assert cache.missing(exchange.id, 'ETH-BTC', '5m', START_TIME,
+                         END_TIME) == []
+
+    data = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m', cache=cache)
+    assert_same_candles(data, expected)
+    assert replay.request_count == 2 * request_count
+
+
+def test_cache_queries_only_missing_range(gdax, cache):
+    exchange, replay = gdax
+    exchange.fetch_candles('ETH/BTC', START_TIME, START_TIME +
+                           timedelta(days=1), '5m', cache=cache)
+    assert replay.request_count == 1
+
+    # The 2 days left take 2 pages of 300 candles
+    data = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m', cache=cache)
+    assert replay.request_count == 1 + 2
+    assert_same_candles(data, exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m'))
+
+
+def test_cache_extended_by_one_candle(gdax, cache):
+    exchange, replay = gdax
+    end_time = START_TIME + timedelta(days=1)
+    exchange.fetch_candles('ETH/BTC', START_TIME, end_time, '5m',
+                           cache=cache)
+
+    end_time += timedelta(minutes=5)
+    data = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, end_time, '5m', cache=cache)
+
+    assert len(data) == 289
+    assert data['end_time'].iloc[-1] == end_time
+    assert replay.request_count == 2
+    assert cache.missing(exchange.id, 'ETH-BTC', '5m', START_TIME,
+                         end_time) == []
+
+
+def test_latest_candles_advance_every_candle(gdax, cache):
+    exchange, replay = gdax
+    end_time = START_TIME + timedelta(days=1)
+    for i in range(3):
+        data = exchange.fetch_latest_candles(
+            'ETH/BTC', '5m', 10, end_time=end_time, cache=cache)
+
+        assert len(data) == 10
+        assert data.index.get_level_values('end_time')[-1] == end_time
+        end_time += timedelta(minutes=5)
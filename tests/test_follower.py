@@ -0,0 +1,133 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from libcryptomarket.candle.follower import CandleFollower
+
+from tests.conftest import SYMBOLS, price
+
+END_TIME = datetime(2018, 1, 2, 0, 2)
+
+
+def expected_closes(start_times):
+    epochs = pd.DatetimeIndex(start_times).astype(np.int64) // 10 ** 9
+    return np.array([price(epoch) for epoch in epochs])
+
+
+def test_first_tick_fills_the_buffer(gdax):
+    exchange, replay = gdax
+    follower = CandleFollower(exchange, SYMBOLS, '5m', 10)
+
+    assert follower.tick(END_TIME) == 10
+    assert replay.request_count == len(SYMBOLS)
+    assert follower.values.shape == (len(SYMBOLS), 10,
+                                     len(follower.columns))
+    assert follower.start_times[-1] == np.datetime64('2018-01-01T23:55')
+
+    close = follower.columns.index('close')
+    for symbol in SYMBOLS:
+        np.testing.assert_allclose(follower[symbol][:, close],
+                                   expected_closes(follower.start_times))
+
+
+def test_tick_queries_only_new_candles(gdax):
+    exchange, replay = gdax
+    follower = CandleFollower(exchange, SYMBOLS, '5m', 10)
+    follower.tick(END_TIME)
+
+    assert follower.tick(END_TIME + timedelta(minutes=2)) == 0
+    assert replay.request_count == len(SYMBOLS)
+
+    assert follower.tick(END_TIME + timedelta(minutes=15)) == 3
+    assert replay.request_count == 2 * len(SYMBOLS)
+    assert follower.start_times[-1] == np.datetime64('2018-01-02T00:10')
+    assert (np.diff(follower.start_times) ==
+            np.timedelta64(5, 'm')).all()
+
+    close = follower.columns.index('close')
+    np.testing.assert_allclose(follower['ETH/BTC'][:, close],
+                               expected_closes(follower.start_times))
+
+
+def test_tick_of_a_single_candle(gdax):
+    exchange, replay = gdax
+    follower = CandleFollower(exchange, SYMBOLS, '5m', 10)
+    follower.tick(END_TIME)
+
+    end_time = END_TIME
+    for i in range(3):
+        end_time += timedelta(minutes=5)
+        assert follower.tick(end_time) == 1
+        assert replay.request_count == (i + 2) * len(SYMBOLS)
+
+    close = follower.columns.index('close')
+    assert follower.start_times[-1] == np.datetime64('2018-01-02T00:10')
+    np.testing.assert_allclose(follower['ETH/BTC'][:, close],
+                               expected_closes(follower.start_times))
+
+
+def test_ring_buffer_wraps_around(gdax):
+    exchange, replay = gdax
+    follower = CandleFollower(exchange, SYMBOLS, '5m', 10)
+    follower.tick(END_TIME)
+
+    end_time = END_TIME
+    for _ in range(7):
+        end_time += timedelta(minutes=10)
+        assert follower.tick(end_time) == 2
+
+    assert follower.start_times[-1] == np.datetime64('2018-01-02T01:05')
+    close = follower.columns.index('close')
+    np.testing.assert_allclose(follower['LTC/BTC'][:, close],
+                               expected_closes(follower.start_times))
+
+    # The latest candles are a view of the buffer
+    assert np.shares_memory(follower.values, follower._values)
+
+
+def test_long_pause_refills_the_buffer(gdax):
+    exchange, replay = gdax
+    follower = CandleFollower(exchange, SYMBOLS, '5m', 10)
+    follower.tick(END_TIME)
+
+    assert follower.tick(END_TIME + timedelta(days=1)) == 10
+    assert follower.start_times[0] == np.datetime64('2018-01-02T23:10')
+    close = follower.columns.index('close')
+    np.testing.assert_allclose(follower['ETH/BTC'][:, close],
+                               expected_closes(follower.start_times))
+
+
+def test_failed_symbol_is_left_missing(gdax):
+    exchange, replay = gdax
+    follower = CandleFollower(exchange, SYMBOLS, '5m', 10)
+    follower.tick(END_TIME)
+
+    responses = replay.responses
+
+    def failing(symbol, start_time, end_time, frequency):
+        if symbol == 'LTC-BTC':
+            raise ValueError('Stand-in failure')
+        return responses(symbol, start_time, end_time, frequency)
+
+    replay.responses = failing
+    assert follower.tick(END_TIME + timedelta(minutes=10)) == 2
+    assert list(follower.errors) == ['LTC/BTC']
+
+    close = follower.columns.index('close')
+    assert np.isnan(follower['LTC/BTC'][-2:, close]).all()
+    assert not np.isnan(follower['LTC/BTC'][:-2, close]).any()
+    assert not np.isnan(follower['ETH/BTC'][:, close]).any()
+
+
+def test_to_frame(gdax):
+    exchange, replay = gdax
+    follower = CandleFollower(exchange, SYMBOLS, '5m', 10,
+                              max_symbol_workers=2)
+    follower.tick(END_TIME)
+    data = follower.to_frame()
+
+    assert data.shape == (10, len(SYMBOLS) * len(follower.columns))
+    assert list(data.index.names) == ['start_time', 'end_time']
+    np.testing.assert_allclose(data[('ETH/BTC', 'close')],
+                               expected_closes(follower.start_times))
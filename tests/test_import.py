@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+import pytest
+
+
+def run_python(code):
+    """Run the code in a fresh interpreter, as the package is imported only
+    once per process.
+    """
+    return subprocess.check_output(
+        [sys.executable, '-c', code], universal_newlines=True).strip()
+
+
+def test_import_is_lazy():
+    assert run_python(
+        'import sys, libcryptomarket; '
+        'print("ccxt" in sys.modules, "pandas" in sys.modules)') == \
+        'False False'
+
+
+@pytest.mark.parametrize('name', ['candle', 'cli', 'exchange'])
+def test_first_access_of_subpackage(name):
+    assert run_python(
+        'import libcryptomarket; '
+        'print(libcryptomarket.{}.__name__)'.format(name)) == \
+        'libcryptomarket.' + name
+
+
+def test_star_import_exposes_exchanges():
+    assert run_python(
+        'from libcryptomarket import *; '
+        'print(poloniex.__name__, gdax.__name__, callable(candles))') == \
+        'poloniex gdax True'
+
+
+def test_dir_lists_exchanges_and_subpackages():
+    names = run_python('import libcryptomarket; print(dir(libcryptomarket))')
+    for name in ['poloniex', 'gdax', 'candles', 'candle', 'exchange']:
+        assert repr(name) in names
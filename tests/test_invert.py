@@ -0,0 +1,29 @@
+import numpy as np
+
+from tests.conftest import END_TIME, START_TIME
+
+
+def test_invert_quote_currency(gdax):
+    exchange, replay = gdax
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    inverted = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m', quote_currency='ETH')
+
+    np.testing.assert_allclose(inverted['open'], 1.0 / data['open'],
+                               rtol=1e-6)
+    np.testing.assert_allclose(inverted['close'], 1.0 / data['close'],
+                               rtol=1e-6)
+    np.testing.assert_allclose(inverted['high'], 1.0 / data['low'],
+                               rtol=1e-6)
+    np.testing.assert_allclose(inverted['low'], 1.0 / data['high'],
+                               rtol=1e-6)
+    np.testing.assert_allclose(inverted['volume'], data['volume'])
+
+
+def test_quote_currency_of_the_symbol_is_unchanged(gdax):
+    exchange, replay = gdax
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    quoted = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m', quote_currency='BTC')
+
+    np.testing.assert_array_equal(quoted['close'], data['close'])
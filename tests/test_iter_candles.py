@@ -0,0 +1,33 @@
+import pandas as pd
+
+from tests.conftest import END_TIME, START_TIME, assert_same_candles
+
+
+def test_iter_candles_yields_pages(gdax):
+    exchange, replay = gdax
+    pages = list(exchange.iter_candles('ETH/BTC', START_TIME, END_TIME, '5m'))
+
+    assert [len(page) for page in pages] == [300, 300, 264]
+    assert_same_candles(
+        pd.concat(pages),
+        exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m'))
+
+
+def test_iter_candles_rechunks_pages(gdax):
+    exchange, replay = gdax
+    chunks = list(exchange.iter_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m', chunk_size=200))
+
+    assert [len(chunk) for chunk in chunks] == [200, 200, 200, 200, 64]
+    assert replay.request_count == 3
+    assert_same_candles(
+        pd.concat(chunks),
+        exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m'))
+
+
+def test_iter_candles_requests_pages_lazily(gdax):
+    exchange, replay = gdax
+    pages = exchange.iter_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+
+    next(pages)
+    assert replay.request_count == 1
@@ -0,0 +1,88 @@
+import libcryptomarket
+from libcryptomarket.candle import markets
+from libcryptomarket.candle.markets import (
+    MarketsCache, get_markets_cache, set_markets_cache)
+
+from tests.conftest import synthetic_markets
+
+
+def gdax_instance(fetches):
+    """Return a GDAX instance recording its queries of the markets.
+
+    :param fetches: `list` list the queries are appended to.
+    """
+    exchange = libcryptomarket.gdax()
+
+    def fetch_markets():
+        fetches.append(exchange)
+        return list(synthetic_markets('gdax').values())
+
+    exchange.fetch_markets = fetch_markets
+    exchange.fetch_currencies = lambda: {}
+    return exchange
+
+
+def test_instances_share_the_loaded_markets():
+    fetches = []
+    first = gdax_instance(fetches)
+    first.load_markets()
+    second = gdax_instance(fetches)
+    second.load_markets()
+
+    assert fetches == [first]
+    assert second.market_id('ETH/BTC') == 'ETH-BTC'
+    assert get_markets_cache().get('gdax')[0] == first.markets
+
+
+def test_markets_are_shared_on_disk(tmpdir):
+    set_markets_cache(path=str(tmpdir))
+    fetches = []
+    gdax_instance(fetches).load_markets()
+    assert tmpdir.join('gdax.json').check()
+
+    # A fresh cache, e.g. of another process, reads the same path
+    set_markets_cache(path=str(tmpdir))
+    exchange = gdax_instance(fetches)
+    exchange.load_markets()
+
+    assert len(fetches) == 1
+    assert exchange.market_id('LTC/BTC') == 'LTC-BTC'
+
+
+def test_expired_markets_are_queried_again(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(markets, 'time', lambda: now[0])
+    set_markets_cache(ttl=60)
+    fetches = []
+    gdax_instance(fetches).load_markets()
+
+    now[0] += 30
+    gdax_instance(fetches).load_markets()
+    assert len(fetches) == 1
+
+    now[0] += 60
+    gdax_instance(fetches).load_markets()
+    assert len(fetches) == 2
+
+    # The markets queried again are served until they expire
+    gdax_instance(fetches).load_markets()
+    assert len(fetches) == 2
+
+
+def test_reload_queries_the_markets_again():
+    fetches = []
+    exchange = gdax_instance(fetches)
+    exchange.load_markets()
+    exchange.load_markets(reload=True)
+    gdax_instance(fetches).load_markets()
+
+    assert fetches == [exchange, exchange]
+
+
+def test_clear_removes_the_markets(tmpdir):
+    markets_cache = MarketsCache(path=str(tmpdir))
+    markets_cache.put('gdax', synthetic_markets('gdax'))
+    markets_cache.clear()
+
+    assert markets_cache.get('gdax') is None
+    assert MarketsCache(path=str(tmpdir)).get('gdax') is None
@@ -0,0 +1,94 @@
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from libcryptomarket.candle.transform import (
+    candle_gaps, gap_ranges, stitch_candles)
+
+from tests.conftest import END_TIME, START_TIME, assert_same_candles
+
+
+def stop_candles(replay, stop_time):
+    """Make the replay serve no candle from the stop time, e.g. during a
+    downtime of the exchange.
+    """
+    responses = replay.responses
+
+    def stopped(symbol, start_time, end_time, frequency):
+        return responses(symbol, start_time, min(end_time, stop_time),
+                         frequency) if start_time < stop_time else []
+
+    replay.responses = stopped
+
+
+@pytest.mark.parametrize('kwargs', [{'max_workers': 3}, {'prefetch': 2}])
+@pytest.mark.parametrize('stop_time', [None, START_TIME + timedelta(days=2)])
+def test_concurrent_pages_match_serial_pages(gdax, kwargs, stop_time):
+    exchange, replay = gdax
+    if stop_time is not None:
+        # The windows after the stop time are empty
+        stop_candles(replay, stop_time)
+
+    expected = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    data = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m', **kwargs)
+
+    assert_same_candles(data, expected)
+    if stop_time is None:
+        assert replay.request_count == 2 * 3
+    else:
+        assert data['end_time'].iloc[-1] == stop_time
+
+
+def test_pagination_stitches_pages(gdax):
+    exchange, replay = gdax
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+
+    assert replay.request_count == 3
+    assert len(data) == 3 * 288
+    assert data['start_time'].iloc[0] == pd.Timestamp(START_TIME)
+    assert data['end_time'].iloc[-1] == pd.Timestamp(END_TIME)
+    assert (data['start_time'].diff().dropna() ==
+            pd.Timedelta(minutes=5)).all()
+    assert (data['start_time'].iloc[1:].values ==
+            data['end_time'].iloc[:-1].values).all()
+
+
+def test_inclusive_bounds_overlap_is_dropped(gdax):
+    exchange, replay = gdax
+    expected = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    responses = replay.responses
+
+    def inclusive(symbol, start_time, end_time, frequency):
+        # Return the last candle of the previous page again
+        return responses(symbol, start_time - timedelta(minutes=5),
+                         end_time, frequency)
+
+    replay.responses = inclusive
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+
+    assert data['start_time'].is_unique
+    assert_same_candles(data.iloc[1:], expected)
+
+
+def test_stitch_unordered_overlapping_pages(gdax):
+    exchange, replay = gdax
+    expected = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    pages = [expected.iloc[250:600], expected.iloc[:300],
+             expected.iloc[550:]]
+
+    assert_same_candles(stitch_candles(pages), expected)
+
+
+def test_gap_ranges(gdax):
+    exchange, replay = gdax
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    data = data.drop(data.index[[10, 11, 12, 100]])
+
+    gaps = candle_gaps(data, START_TIME, END_TIME, '5m')
+    assert len(gaps) == 4
+    assert gap_ranges(gaps, '5m') == [
+        (pd.Timestamp('2018-01-01 00:50'), pd.Timestamp('2018-01-01 01:05')),
+        (pd.Timestamp('2018-01-01 08:20'), pd.Timestamp('2018-01-01 08:25')),
+    ]
@@ -0,0 +1,105 @@
+import threading
+from time import monotonic
+
+import pytest
+
+import libcryptomarket
+from libcryptomarket.candle import ratelimit
+from libcryptomarket.candle.ratelimit import (
+    TokenBucket, get_rate_limiter, set_rate_limiter, throttle)
+from libcryptomarket.candle.stats import add_hook, remove_hook
+
+
+@pytest.fixture
+def rate_limiters(monkeypatch):
+    """Start from no process-wide rate limiter, and restore them afterwards.
+    """
+    monkeypatch.setattr(ratelimit, '_RATE_LIMITERS', {})
+    monkeypatch.setattr(ratelimit, '_RATE_LIMITS', {})
+
+
+def test_burst_up_to_capacity_without_waiting():
+    bucket = TokenBucket(rate=10.0, capacity=3)
+
+    assert [bucket.acquire() for _ in range(3)] == [0.0, 0.0, 0.0]
+
+    start = monotonic()
+    wait = bucket.acquire()
+    assert wait == pytest.approx(0.1, abs=0.02)
+    assert monotonic() - start >= 0.09
+    assert bucket.acquired_count == 4
+    assert bucket.waited_time == wait
+
+
+def test_threads_share_the_rate():
+    bucket = TokenBucket(rate=50.0, capacity=1)
+    waits = []
+    lock = threading.Lock()
+
+    def acquire():
+        for _ in range(5):
+            wait = bucket.acquire()
+            with lock:
+                waits.append(wait)
+
+    start = monotonic()
+    threads = [threading.Thread(target=acquire) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The 19 tokens after the first one are refilled at 50 per second
+    assert monotonic() - start >= 19 / 50.0 - 0.02
+    assert bucket.acquired_count == 20
+    assert sum(waits) == pytest.approx(bucket.waited_time)
+
+
+def test_defer_holds_the_tokens_back():
+    bucket = TokenBucket(rate=100.0, capacity=5)
+    bucket.defer(0.2)
+
+    wait = bucket.acquire()
+    assert wait == pytest.approx(0.2 + 0.01, abs=0.02)
+
+
+def test_throttle_reports_the_waits(rate_limiters):
+    exchange = libcryptomarket.gdax()
+    set_rate_limiter(exchange.id, rate=20.0, capacity=1)
+    events = []
+
+    def hook(event, exchange_id, seconds=0.0, **kwargs):
+        if event == 'wait':
+            events.append((exchange_id, seconds))
+
+    add_hook(hook)
+    try:
+        waits = [throttle(exchange) for _ in range(3)]
+    finally:
+        remove_hook(hook)
+
+    assert events == [('gdax', wait) for wait in waits]
+    assert waits[0] == 0.0
+    assert waits[2] == pytest.approx(0.05, abs=0.02)
+
+
+def test_rate_follows_the_rate_limit(rate_limiters):
+    exchange = libcryptomarket.gdax()
+    rate_limiter = get_rate_limiter(exchange)
+    assert rate_limiter.rate == 1000.0 / exchange.rateLimit
+
+    # Shared by the instances of the exchange
+    assert get_rate_limiter(libcryptomarket.gdax()) is rate_limiter
+
+    exchange.rateLimit = 250
+    assert get_rate_limiter(exchange) is rate_limiter
+    assert rate_limiter.rate == 4.0
+
+
+def test_replaced_rate_limiter_is_kept(rate_limiters):
+    exchange = libcryptomarket.gdax()
+    rate_limiter = set_rate_limiter(exchange.id, rate=3.0)
+
+    exchange.rateLimit = 250
+    assert get_rate_limiter(exchange) is rate_limiter
+    assert rate_limiter.rate == 3.0
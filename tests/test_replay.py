@@ -0,0 +1,44 @@
+import pytest
+
+import libcryptomarket
+from libcryptomarket.candle.replay import CandleRecorder, CandleReplay
+
+from tests.conftest import END_TIME, START_TIME, assert_same_candles
+
+
+def test_replay_serves_the_requests(gdax):
+    exchange, replay = gdax
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+
+    # GDAX serves 300 candles per page
+    assert len(data) == 3 * 288
+    assert replay.request_count == 3
+
+
+def test_recording_replays_the_same_candles(gdax, tmpdir):
+    exchange, replay = gdax
+    recorder = CandleRecorder(exchange)
+    expected = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    assert len(recorder.responses) == replay.request_count
+
+    path = str(tmpdir.join('recording.json'))
+    recorder.save(path)
+
+    recording = CandleReplay.load(path)
+    exchange = recording.install(libcryptomarket.gdax())
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+
+    assert_same_candles(data, expected)
+    assert recording.request_count == replay.request_count
+
+
+def test_unrecorded_request_raises(gdax, tmpdir):
+    exchange, replay = gdax
+    recorder = CandleRecorder(exchange)
+    exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    path = str(tmpdir.join('recording.json'))
+    recorder.save(path)
+
+    exchange = CandleReplay.load(path).install(libcryptomarket.gdax())
+    with pytest.raises(KeyError):
+        exchange.fetch_candles('LTC/BTC', START_TIME, END_TIME, '5m')
@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+
+from tests.conftest import END_TIME, START_TIME, assert_same_candles
+
+
+def test_resample_unsupported_frequency(poloniex):
+    exchange, replay = poloniex
+    base = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '30m')
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '1h')
+
+    assert len(data) == 3 * 24
+    assert (data['end_time'] - data['start_time'] ==
+            pd.Timedelta(hours=1)).all()
+    np.testing.assert_allclose(data['open'], base['open'].values[::2])
+    np.testing.assert_allclose(data['close'], base['close'].values[1::2])
+    np.testing.assert_allclose(
+        data['high'],
+        np.maximum(base['high'].values[::2], base['high'].values[1::2]))
+    np.testing.assert_allclose(
+        data['low'],
+        np.minimum(base['low'].values[::2], base['low'].values[1::2]))
+    np.testing.assert_allclose(data['volume'], 20.0)
+
+
+def test_resampled_candles_are_cached(poloniex, cache):
+    exchange, replay = poloniex
+    expected = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '1h')
+
+    data = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '1h', cache=cache)
+    assert_same_candles(data, expected)
+    assert cache.missing(exchange.id, 'BTC_ETH', '1h', START_TIME,
+                         END_TIME) == []
+
+    request_count = replay.request_count
+    data = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '1h', cache=cache)
+    assert replay.request_count == request_count
+    assert_same_candles(data, expected)
+
+
+def test_resample_from_cached_base_frequency(gdax, cache):
+    exchange, replay = gdax
+    exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m',
+                           cache=cache)
+    request_count = replay.request_count
+
+    # GDAX supports 15m candles, which are resampled from the cache instead
+    data = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '15m', cache=cache)
+    assert replay.request_count == request_count
+    assert len(data) == 3 * 96
+
+
+def test_invert_resampled_candles(poloniex, cache):
+    exchange, replay = poloniex
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '1h')
+
+    for candle_cache in [None, cache]:
+        inverted = exchange.fetch_candles(
+            'ETH/BTC', START_TIME, END_TIME, '1h', cache=candle_cache,
+            quote_currency='ETH')
+        np.testing.assert_allclose(inverted['close'], 1.0 / data['close'],
+                                   rtol=1e-6)
+        np.testing.assert_allclose(inverted['high'], 1.0 / data['low'],
+                                   rtol=1e-6)
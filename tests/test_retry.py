@@ -0,0 +1,86 @@
+import ccxt
+import pandas as pd
+import pytest
+
+from libcryptomarket.candle.retry import NO_RETRY_POLICY, RetryPolicy
+
+from tests.conftest import (
+    END_TIME, START_TIME, assert_same_candles, fail_requests)
+
+NO_BACKOFF_POLICY = RetryPolicy(max_retries=2, backoff=0.0, max_backoff=0.0)
+
+# GDAX serves 300 candles per page, so the 864 candles of the period take 3
+# pages
+PAGE_COUNT = 3
+
+SECOND_PAGE = pd.Timestamp(START_TIME) + 300 * pd.Timedelta(minutes=5)
+
+
+def test_retry_transient_error(gdax):
+    exchange, replay = gdax
+    expected = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+
+    fail_requests(replay, {SECOND_PAGE: 2})
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m',
+                                  retry=NO_BACKOFF_POLICY)
+
+    assert_same_candles(data, expected)
+    assert replay.request_count == 2 * PAGE_COUNT + 2
+
+
+def test_failed_page_raises_its_error(gdax):
+    exchange, replay = gdax
+    fail_requests(replay, {SECOND_PAGE: None})
+
+    with pytest.raises(ccxt.NetworkError):
+        exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m',
+                               retry=NO_BACKOFF_POLICY)
+
+    assert replay.request_count == 1 + 1 + NO_BACKOFF_POLICY.max_retries
+
+
+def test_return_partial_resumes_from_failed_page(gdax):
+    exchange, replay = gdax
+    expected = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+
+    failures = {SECOND_PAGE: None}
+    fail_requests(replay, failures)
+    data, resume_time = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m', retry=NO_RETRY_POLICY,
+        return_partial=True)
+
+    assert resume_time == SECOND_PAGE
+    assert_same_candles(data, expected.iloc[:300])
+
+    del failures[SECOND_PAGE]
+    rest, resume_time = exchange.fetch_candles(
+        'ETH/BTC', resume_time, END_TIME, '5m', retry=NO_RETRY_POLICY,
+        return_partial=True)
+
+    assert resume_time is None
+    assert_same_candles(pd.concat([data, rest]), expected)
+
+
+def test_return_partial_resumes_from_cache(gdax, cache):
+    exchange, replay = gdax
+    expected = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+
+    failures = {SECOND_PAGE: None}
+    fail_requests(replay, failures)
+    data, resume_time = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m', cache=cache,
+        retry=NO_RETRY_POLICY, return_partial=True)
+
+    assert resume_time == SECOND_PAGE
+    assert len(data) == 300
+
+    # Only the pages from the failed one are queried again
+    del failures[SECOND_PAGE]
+    request_count = replay.request_count
+    data, resume_time = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '5m', cache=cache,
+        retry=NO_RETRY_POLICY, return_partial=True)
+
+    assert resume_time is None
+    assert replay.request_count == request_count + PAGE_COUNT - 1
+    assert_same_candles(data, expected)
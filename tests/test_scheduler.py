@@ -0,0 +1,153 @@
+import json
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from threading import Lock, Thread
+from time import monotonic
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+from libcryptomarket.candle.markets import get_markets_cache
+from libcryptomarket.candle.scheduler import CandleScheduler, candle_jobs
+from libcryptomarket.candle.store import CandleStore
+
+from tests.conftest import SYMBOLS, price, synthetic_markets
+
+PAGE_SIZES = {'poloniex': 10000, 'gdax': 300}
+
+BUDGET = 10.0
+
+
+class StandInServer(ThreadingMixIn, HTTPServer):
+    """Local stand-in of the Poloniex and GDAX public APIs, serving the
+    closed candles of the requested period and frequency.
+    """
+    daemon_threads = True
+
+    def __init__(self, *args, **kwargs):
+        super(StandInServer, self).__init__(*args, **kwargs)
+        self.request_times = defaultdict(list)
+        self.lock = Lock()
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Handler of the candle requests of both venues.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = dict((key, values[0])
+                      for key, values in parse_qs(url.query).items())
+
+        if url.path.startswith('/poloniex'):
+            venue = 'poloniex'
+            period = int(params['period'])
+            start = int(params['start'])
+            end = int(params['end']) + period
+        else:
+            venue = 'gdax'
+            period = int(params['granularity'])
+            start = int(pd.Timestamp(params['start']).value // 10 ** 9)
+            end = int(pd.Timestamp(params['end']).value // 10 ** 9)
+
+        with self.server.lock:
+            self.server.request_times[venue].append(monotonic())
+
+        now = int(datetime.utcnow().timestamp())
+        start_times = range(-(-start // period) * period,
+                            min(end, now - now % period) - period + 1,
+                            period)
+        start_times = start_times[:PAGE_SIZES[venue]]
+
+        if venue == 'poloniex':
+            rows = [{'date': t, 'high': price(t) * 1.01,
+                     'low': price(t) * 0.99, 'open': price(t),
+                     'close': price(t), 'volume': 10.0,
+                     'quoteVolume': 100.0, 'weightedAverage': price(t)}
+                    for t in start_times]
+        else:
+            rows = [[t, price(t) * 0.99, price(t) * 1.01, price(t),
+                     price(t), 100.0] for t in start_times][::-1]
+        body = json.dumps(rows).encode()
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def busiest_second(request_times):
+    """Return the maximum number of requests within any second.
+    """
+    request_times = sorted(request_times)
+    return max([bisect_left(request_times, t + 1.0) - i
+                for i, t in enumerate(request_times)] or [0])
+
+
+@pytest.fixture
+def server():
+    server = StandInServer(('127.0.0.1', 0), StandInHandler)
+    Thread(target=server.serve_forever, daemon=True).start()
+    for exchange_id in ['poloniex', 'gdax']:
+        get_markets_cache().put(exchange_id, synthetic_markets(exchange_id))
+
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def scheduler(server, cache, jobs):
+    url = 'http://127.0.0.1:{}'.format(server.server_address[1])
+    return CandleScheduler(
+        exchanges={
+            'poloniex': {'urls': {'api': {'public': url + '/poloniex'}}},
+            'gdax': {'urls': {'api': url + '/gdax'}},
+        },
+        jobs=jobs,
+        cache=cache,
+        start_time=datetime.utcnow() - timedelta(days=3),
+        budgets={'poloniex': BUDGET, 'gdax': BUDGET},
+        processes=2,
+        window=timedelta(days=1))
+
+
+def test_jobs_complete_within_budget(server, tmpdir):
+    # 1h candles are resampled on Poloniex, which does not support them
+    jobs = candle_jobs(['poloniex', 'gdax'], SYMBOLS, ['5m', '1h'])
+    candle_scheduler = scheduler(server, CandleStore(str(tmpdir)), jobs)
+
+    assert candle_scheduler.run() == {}
+    for job in jobs:
+        assert candle_scheduler.missing(job) is None
+        assert candle_scheduler.staleness(job) == 0.0
+
+    summary = candle_scheduler.report()
+    assert sum(counters['errors'] for counters in summary.values()) == 0
+    for venue, request_times in server.request_times.items():
+        assert busiest_second(request_times) <= BUDGET + 1
+
+
+def test_resampled_job_completes(server, tmpdir):
+    jobs = candle_jobs(['poloniex'], ['ETH/BTC'], ['1h'])
+    cache = CandleStore(str(tmpdir))
+    candle_scheduler = scheduler(server, cache, jobs)
+
+    assert candle_scheduler.run() == {}
+    assert candle_scheduler.missing(jobs[0]) is None
+    assert len(cache.read('poloniex', 'BTC_ETH', '1h',
+                          candle_scheduler.start_time,
+                          datetime.utcnow())) >= 71
+
+    # Up-to-date jobs send no request
+    request_count = len(server.request_times['poloniex'])
+    assert scheduler(server, cache, jobs).run() == {}
+    assert len(server.request_times['poloniex']) == request_count
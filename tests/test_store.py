@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from libcryptomarket.candle.store import RECORD_DTYPE, CandleStore
+
+from tests.conftest import END_TIME, START_TIME, assert_same_candles
+
+
+def test_store_keeps_all_columns(poloniex, tmpdir):
+    exchange, replay = poloniex
+    store = CandleStore(str(tmpdir))
+    expected = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '30m')
+    data = exchange.fetch_candles(
+        'ETH/BTC', START_TIME, END_TIME, '30m', cache=store)
+
+    assert set(data.columns) == set(expected.columns)
+    assert set(store.records(exchange.id, 'BTC_ETH', '30m').dtype.names) \
+        == set(RECORD_DTYPE.names) | {'quote_volume', 'weighted_average'}
+    assert_same_candles(data, expected)
+
+    # A new instance reads the columns from the header of the file
+    data = CandleStore(str(tmpdir)).read(
+        exchange.id, 'BTC_ETH', '30m', START_TIME, END_TIME)
+    assert_same_candles(data, expected)
+
+
+def test_view_is_a_slice_of_the_mapped_records(gdax, tmpdir):
+    exchange, replay = gdax
+    store = CandleStore(str(tmpdir))
+    exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m',
+                           cache=store)
+
+    records = store.records(exchange.id, 'ETH-BTC', '5m')
+    view = store.view(exchange.id, 'ETH-BTC', '5m',
+                      START_TIME + timedelta(hours=1),
+                      START_TIME + timedelta(hours=2))
+
+    assert len(view) == 12
+    assert np.shares_memory(view, records)
+    assert pd.Timestamp(int(view[0]['start_time']), unit='s') == \
+        pd.Timestamp(START_TIME + timedelta(hours=1))
+
+
+def test_missing_candles_are_stored_as_nan(gdax, tmpdir):
+    exchange, replay = gdax
+    store = CandleStore(str(tmpdir))
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    store.write(exchange.id, 'ETH-BTC', '5m', data.drop(data.index[10:20]),
+                START_TIME, END_TIME)
+
+    records = store.records(exchange.id, 'ETH-BTC', '5m')
+    assert len(records) == len(data)
+    assert np.isnan(records['close'][10:20]).all()
+    assert len(store.read(exchange.id, 'ETH-BTC', '5m', START_TIME,
+                          END_TIME)) == len(data) - 10
+    assert store.missing(exchange.id, 'ETH-BTC', '5m', START_TIME,
+                         END_TIME) == []
+
+
+def test_write_apart_from_the_records_raises(gdax, tmpdir):
+    exchange, replay = gdax
+    store = CandleStore(str(tmpdir))
+    data = exchange.fetch_candles('ETH/BTC', START_TIME, END_TIME, '5m')
+    store.write(exchange.id, 'ETH-BTC', '5m', data.iloc[:10], START_TIME,
+                data['end_time'].iloc[9])
+
+    with pytest.raises(ValueError):
+        store.write(exchange.id, 'ETH-BTC', '5m', data.iloc[20:30],
+                    data['start_time'].iloc[20], data['end_time'].iloc[29])
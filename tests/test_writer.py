@@ -0,0 +1,68 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from libcryptomarket.candle.writer import CandleWriter
+
+START_TIME = datetime(2018, 1, 1)
+
+END_TIME = datetime(2018, 1, 3)
+
+
+def read_candles(path, file_format, compression):
+    if file_format == 'csv':
+        return pd.read_csv(path, compression=compression,
+                           parse_dates=['start_time', 'end_time'])
+    elif file_format == 'parquet':
+        return pd.read_parquet(path)
+    else:
+        return pd.read_feather(path)
+
+
+@pytest.mark.parametrize('file_format,compression', [
+    ('csv', None),
+    ('csv', 'gzip'),
+    ('csv', 'bz2'),
+    ('csv', 'xz'),
+    ('parquet', None),
+    ('parquet', 'gzip'),
+    ('feather', None),
+    ('feather', 'lz4'),
+])
+def test_write_pages_in_long_format(gdax, tmpdir, file_format, compression):
+    if file_format != 'csv':
+        pytest.importorskip('pyarrow')
+
+    exchange, replay = gdax
+    path = str(tmpdir.join('candles.' + file_format))
+    expected = []
+    with CandleWriter(path, file_format, compression) as writer:
+        for symbol in ['ETH/BTC', 'LTC/BTC']:
+            for data in exchange.iter_candles(
+                    symbol, START_TIME, END_TIME, '5m'):
+                writer.write(data, symbol)
+                expected.append(data.assign(symbol=symbol))
+
+        writer.write(pd.DataFrame(), 'ETH/BTC')
+
+    expected = pd.concat(expected, ignore_index=True)
+    assert writer.row_count == len(expected) == 2 * 2 * 288
+
+    data = read_candles(path, file_format, compression)
+    assert list(data.columns[:2]) == ['start_time', 'symbol']
+    assert list(data['symbol'].unique()) == ['ETH/BTC', 'LTC/BTC']
+    pd.testing.assert_frame_equal(
+        data[list(expected.columns)], expected, check_dtype=False,
+        check_exact=False)
+
+
+@pytest.mark.parametrize('file_format,compression', [
+    ('json', None),
+    ('csv', 'snappy'),
+    ('feather', 'gzip'),
+])
+def test_unsupported_format_or_compression(tmpdir, file_format,
+                                           compression):
+    with pytest.raises(ValueError):
+        CandleWriter(str(tmpdir.join('candles')), file_format, compression)